@@ -10,10 +10,12 @@ class AssignmentAdmin(admin.ModelAdmin):
     raw_id_fields = ('places', )
     save_on_top = True
     list_per_page = 50
+    list_select_related = ('employee', )
 
     def get_queryset(self, request):
+        # Everything __str__() and bureau_state_list() show, so the changelist doesn't need queries for each row
         qs = super().get_queryset(request)
-        qs = qs.prefetch_related('positions').prefetch_related('places')
+        qs = qs.prefetch_related('positions', 'places', 'bureau_states')
         return qs
 
 
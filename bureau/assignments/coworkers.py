@@ -0,0 +1,47 @@
+import heapq
+
+from collections import Counter
+from itertools import chain
+from operator import itemgetter
+
+
+def get_overlaps(intervals):
+    """
+    Yield (assignment, employee, other assignment, other employee) for each pair of overlapping half-open intervals
+    (start, end, assignment, employee, own) of different employees, where at least one of them is own rather than
+    inherited from a place inside the node. Sweeps over intervals sorted by start, keeping the active ones in heaps
+    by end, so it takes O(n log n + k) instead of comparing every pair
+    """
+    own_active, inherited_active = [], []
+    for start, end, assignment_id, employee_id, own in sorted(intervals, key=itemgetter(0)):
+        for active in (own_active, inherited_active):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+
+        # Assignments both in places inside the node are linked in a node closer to them, if at all
+        others = chain(own_active, inherited_active) if own else own_active
+        for _, other_assignment_id, other_employee_id in others:
+            if other_employee_id != employee_id:
+                yield assignment_id, employee_id, other_assignment_id, other_employee_id
+
+        heapq.heappush(own_active if own else inherited_active, (end, assignment_id, employee_id))
+
+
+def get_coworker_weights(intervals_by_node, employee_ids=None):
+    """
+    Return a Counter of the number of pairs of overlapping assignments by pair of employees (lowest pk first),
+    from the intervals of the assignments in each place hierarchy node (see get_overlaps()),
+    only for pairs including one of employee_ids if given
+    """
+    assignment_pairs = {}
+    for intervals in intervals_by_node.values():
+        for assignment_id, employee_id, other_assignment_id, other_employee_id in get_overlaps(intervals):
+            if employee_ids is not None and employee_id not in employee_ids and other_employee_id not in employee_ids:
+                continue
+            # The same pair of assignments can overlap in more than one node, but is only counted once
+            if employee_id < other_employee_id:
+                assignment_pairs[(assignment_id, other_assignment_id)] = (employee_id, other_employee_id)
+            else:
+                assignment_pairs[(other_assignment_id, assignment_id)] = (other_employee_id, employee_id)
+
+    return Counter(assignment_pairs.values())
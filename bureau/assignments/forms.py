@@ -0,0 +1,17 @@
+from django import forms
+
+
+class ActiveAssignmentsForm(forms.Form):
+    """
+    Form for finding who was posted somewhere on a date, or at some time in a period
+    """
+    date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}),
+                               help_text='Optional, to find everyone posted at some time from date to end date')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date, end_date = cleaned_data.get('date'), cleaned_data.get('end_date')
+        if date and end_date and end_date < date:
+            raise forms.ValidationError('End date should be after date')
+        return cleaned_data
@@ -0,0 +1,455 @@
+import csv
+import datetime
+import multiprocessing
+
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from openpyxl import load_workbook
+from partial_date import PartialDate
+
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.db.models import Q
+
+from assignments.models import (
+    assignment_places_changed, Assignment, EmploymentYear, get_position_titles, Position
+)
+from personnel.models import Employee
+from places.importer import batched
+from places.models import City, County, Place, Region
+from utilities.data_version import bump_data_version
+from utilities.dates import get_date_range, get_partial_date_key
+
+# Columns of roster files. Each row is an assignment of an employee, so employees with several assignments
+# are in several rows, and their fields are taken from the first
+EMPLOYEE_COLUMNS = ['last_name', 'first_name', 'gender', 'date_of_birth', 'place_of_birth', 'vrc', 'colored', 'notes']
+ASSIGNMENT_COLUMNS = ['position', 'place', 'bureau_state', 'start_date', 'end_date', 'description']
+
+# Separates the titles of an assignment's positions, like "Agent; Superintendent of Education"
+POSITION_SEPARATOR = ';'
+
+GENDERS = {
+    '': Employee.Gender.MALE,
+    'm': Employee.Gender.MALE,
+    'male': Employee.Gender.MALE,
+    'f': Employee.Gender.FEMALE,
+    'female': Employee.Gender.FEMALE,
+}
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'x'}
+
+# Most errors in rows of a file that the import command shows
+MAX_REPORTED_ERRORS = 100
+
+
+def get_column_name(header):
+    """
+    Return the column of a header, like "Date of Birth" -> "date_of_birth"
+    """
+    return '_'.join(str(header or '').lower().split())
+
+
+def get_cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def read_roster_file(path):
+    """
+    Yield (line number, dict of column: text) for each row of a CSV file or the first sheet of an Excel (.xlsx) file,
+    with a header row. Excel files are read in read-only mode, so they're streamed too
+    """
+    if path.endswith('.xlsx'):
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            columns = [get_column_name(header) for header in next(rows, [])]
+            for line, row in enumerate(rows, start=2):
+                if any(value is not None for value in row):
+                    yield line, dict(zip(columns, map(get_cell_text, row)))
+        finally:
+            workbook.close()
+    else:
+        with open(path, encoding='utf-8-sig', newline='') as file:
+            reader = csv.reader(file)
+            columns = [get_column_name(header) for header in next(reader, [])]
+            for row in reader:
+                if any(row):
+                    yield reader.line_num, dict(zip(columns, (value.strip() for value in row)))
+
+
+def get_place_key(name):
+    """
+    Return how a place's name is looked up, ignoring case and spacing
+    """
+    return ', '.join(' '.join(part.lower().split()) for part in name.split(','))
+
+
+def build_place_index():
+    """
+    Return a dict of every place by name with and without its country, like "macon, georgia" and
+    "macon, georgia, united states", as (pk, region pk). Names shared by more than one place map to None
+    """
+    index = {}
+    for pk, region_id, display_name, display_name_without_country in Place.objects.values_list(
+            'pk', 'region_id', 'display_name', 'display_name_without_country'):
+        place = (pk, region_id)
+        for key in {get_place_key(display_name), get_place_key(display_name_without_country)} - {''}:
+            index[key] = place if index.get(key, place) == place else None
+    return index
+
+
+class RosterRowParser:
+    """
+    Validates rows of a roster file and resolves their places with a place index (see build_place_index()), without
+    querying the database, so batches of rows can be parsed in other processes
+    """
+
+    def __init__(self, places, bureau_states):
+        self.places = places
+        # Bureau states by pk and name
+        self.bureau_states = bureau_states
+        self.bureau_state_ids = {get_place_key(name): pk for pk, name in bureau_states.items()}
+
+    def get_date(self, row, column, errors):
+        value = row.get(column, '')
+        if not value:
+            return None
+        try:
+            return PartialDate(value)
+        except (ValidationError, ValueError):
+            errors.append(f'{column} "{value}" should be YYYY, YYYY-MM or YYYY-MM-DD')
+            return None
+
+    def get_text(self, row, column, field, errors):
+        """
+        Return the text in a column, which can't be longer than the model field it's imported into
+        """
+        value = row.get(column, '')
+        if len(value) > field.max_length:
+            errors.append(f'{column} is longer than {field.max_length} characters')
+        return value
+
+    def get_place(self, row, column, errors):
+        """
+        Return (pk, region pk) of the place in a column, or (None, None) if it's empty. The pk is None for a place
+        that isn't in the index, which may still be found by name (see find_places())
+        """
+        name = row.get(column, '')
+        if not name:
+            return None, None
+        place = self.places.get(get_place_key(name), ())
+        if place is None:
+            errors.append(f'{column} "{name}" is more than one place')
+        return place or (None, None)
+
+    def parse(self, line, row):
+        """
+        Return a dict of the employee and assignment fields of a row, with the errors found in it
+        """
+        errors = []
+
+        gender = GENDERS.get(row.get('gender', '').lower())
+        if gender is None:
+            errors.append(f'gender "{row["gender"]}" should be M or F')
+        if not row.get('last_name'):
+            errors.append('last_name is missing')
+        place_of_birth = self.get_place(row, 'place_of_birth', errors)[0]
+        place, region_id = self.get_place(row, 'place', errors)
+
+        # The jurisdiction of an assignment is the Bureau state it was in, unless it's given
+        bureau_state = row.get('bureau_state', '')
+        bureau_state_id = self.bureau_state_ids.get(get_place_key(bureau_state)) if bureau_state else region_id
+        if bureau_state and not bureau_state_id:
+            errors.append(f'bureau_state "{bureau_state}" is not a Bureau state')
+        elif bureau_state_id not in self.bureau_states:
+            bureau_state_id = None
+
+        titles = sorted({' '.join(title.split()) for title in row.get('position', '').split(POSITION_SEPARATOR)} - {''})
+        max_title_length = Position._meta.get_field('title').max_length
+        if any(len(title) > max_title_length for title in titles):
+            errors.append(f'position is longer than {max_title_length} characters')
+
+        return {
+            'line': line,
+            'errors': errors,
+            'employee': {
+                'last_name': self.get_text(row, 'last_name', Employee._meta.get_field('last_name'), errors),
+                'first_name': self.get_text(row, 'first_name', Employee._meta.get_field('first_name'), errors),
+                'gender': gender,
+                'date_of_birth': self.get_date(row, 'date_of_birth', errors),
+                'place_of_birth_id': place_of_birth,
+                'vrc': row.get('vrc', '').lower() in TRUE_VALUES,
+                'colored': row.get('colored', '').lower() in TRUE_VALUES,
+                'notes': row.get('notes', ''),
+            },
+            'place_of_birth': row.get('place_of_birth', '') if place_of_birth is None else '',
+            'assignment': {
+                'start_date': self.get_date(row, 'start_date', errors),
+                'end_date': self.get_date(row, 'end_date', errors),
+                'description': self.get_text(row, 'description', Assignment._meta.get_field('description'), errors),
+            },
+            'positions': titles,
+            'place_id': place,
+            'place': row.get('place', '') if place is None else '',
+            'bureau_state_id': bureau_state_id,
+        }
+
+    def __call__(self, batch):
+        return [self.parse(line, row) for line, row in batch]
+
+
+_parser = None  # pylint: disable=invalid-name
+
+
+def set_parser(parser):
+    global _parser  # pylint: disable=global-statement
+    _parser = parser
+
+
+def parse_batch(batch):
+    """
+    Parse a batch of rows in a worker process, with the parser given to it when it started
+    """
+    return _parser(batch)
+
+
+def get_parser_pool(parser, processes):
+    """
+    Return a pool of processes for parsing batches of rows with parse_batch(). It's forked, so workers start with
+    the parser instead of having it pickled for each batch, after closing database connections so workers don't
+    inherit their sockets (except one in a transaction, which can't be closed, but workers don't use the database)
+    """
+    if not transaction.get_connection().in_atomic_block:
+        connections.close_all()
+    return multiprocessing.get_context('fork').Pool(processes, initializer=set_parser, initargs=(parser,))
+
+
+def parse_batches(path, parser, pool=None):
+    """
+    Return an iterator of batches of parsed rows of a roster file, parsed in a pool of processes if given
+    (see get_parser_pool())
+    """
+    batches = batched(read_roster_file(path))
+    if pool is None:
+        return map(parser, batches)
+    return pool.imap(parse_batch, batches)
+
+
+def find_places(names):
+    """
+    Return a dict of place names that aren't in the place index, like "Macon, Georgia" or "Bibb County, Georgia,
+    United States", to the one City or County (in the state, and the country if given) they're the name of
+    """
+    lookups = {}
+    for name in names:
+        parts = get_place_key(name).split(', ')
+        if len(parts) in (2, 3):
+            lookups[name] = parts
+
+    found = defaultdict(list)
+    for model, state_field in ((City, 'region'), (County, 'state')):
+        if not lookups:
+            break
+
+        filters = reduce(or_, (Q(name__iexact=parts[0], **{f'{state_field}__name__iexact': parts[1]})
+                               for parts in lookups.values()))
+        locations = defaultdict(list)
+        for location in model.objects.filter(filters).select_related(state_field, 'country'):
+            locations[(location.name.lower(), getattr(location, state_field).name.lower())].append(location)
+
+        for name, parts in lookups.items():
+            found[name].extend(location for location in locations[tuple(parts[:2])]
+                               if len(parts) == 2 or location.country.name.lower() == parts[2])
+
+    return {name: locations[0] for name, locations in found.items() if len(locations) == 1}
+
+
+class RosterImport:
+    """
+    Import of a roster file: parses and validates rows (see RosterRowParser), resolves their places, matches their
+    employees to existing ones, and creates new employees and assignments in batches.
+    Employees are matched by name and date of birth, or by name alone if the row has no date of birth and only one
+    employee has the name. Assignments already there, with the same employee, dates, positions and place, are skipped
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.bureau_states = dict(Region.objects.bureau_state().values_list('pk', 'name'))
+        self.report = {
+            'rows': 0, 'employees_created': 0, 'employees_matched': 0, 'assignments_created': 0,
+            'duplicate_assignments': 0, 'positions_created': 0, 'places_created': [], 'errors': [],
+        }
+
+        self.places = {}
+        self.employees = {}
+        self.employees_by_name = {}
+        for pk, last_name, first_name, date_of_birth in Employee.objects.order_by().values_list(
+                'pk', 'last_name', 'first_name', 'date_of_birth'):
+            self.add_employee(pk, last_name, first_name, date_of_birth)
+        self.assignments = set(Assignment.objects.order_by().values_list(
+            'employee_id', 'start_date_key', 'end_date_key', 'position_titles', 'places'))
+        self.positions = dict(Position.objects.values_list('title', 'pk'))
+
+        # What was created, for updating what's computed from it
+        self.employee_ids = set()
+        self.place_ids = set()
+        self.position_ids = set()
+
+    def add_employee(self, pk, last_name, first_name, date_of_birth):
+        name = (last_name.lower(), first_name.lower())
+        self.employees[(*name, str(date_of_birth or ''))] = pk
+        self.employees_by_name.setdefault(name, []).append(pk)
+
+    def get_employee_id(self, fields):
+        name = (fields['last_name'].lower(), fields['first_name'].lower())
+        pk = self.employees.get((*name, str(fields['date_of_birth'] or '')))
+        if pk is None and not fields['date_of_birth'] and len(self.employees_by_name.get(name, [])) == 1:
+            pk = self.employees_by_name[name][0]
+        return pk
+
+    def resolve_places(self, rows):
+        """
+        Set the places of rows that weren't in the place index, creating places for cities and counties with
+        their names, or add an error
+        """
+        names = {row[field] for row in rows for field in ('place', 'place_of_birth')} - {''} - set(self.places)
+        for name, location in find_places(names).items():
+            field = location._meta.model_name
+            place, created = Place(**{field: location}), True
+            if not self.dry_run:
+                place, created = Place.objects.get_or_create(**{field: location})
+            self.places[name] = (place.pk, location.region_id if field == 'city' else location.state_id)
+            if created:
+                self.report['places_created'].append(name)
+        self.places.update((name, None) for name in names - set(self.places))
+
+        for row in rows:
+            for field, pk_field in (('place', 'place_id'), ('place_of_birth', None)):
+                if row[field]:
+                    place = self.places[row[field]]
+                    if place is None:
+                        row['errors'].append(f'{field} "{row[field]}" was not found')
+                    elif pk_field:
+                        row['place_id'] = place[0]
+                        if not row['bureau_state_id'] and place[1] in self.bureau_states:
+                            row['bureau_state_id'] = place[1]
+                    else:
+                        row['employee']['place_of_birth_id'] = place[0]
+
+    def add_batch(self, rows):
+        """
+        Create the new employees and assignments of a batch of parsed rows, with their positions, places and states
+        """
+        self.resolve_places([row for row in rows if not row['errors'] and (row['place'] or row['place_of_birth'])])
+
+        employees, assignments, relations = [], [], {'positions': [], 'places': [], 'bureau_states': []}
+        employee_states = set()
+        for row in rows:
+            self.report['rows'] += 1
+            if row['errors']:
+                self.report['errors'].extend((row['line'], error) for error in row['errors'])
+                continue
+
+            employee_id = self.get_employee_id(row['employee'])
+            if employee_id is None:
+                employee = Employee(**row['employee'])
+                employees.append(employee)
+                self.add_employee(employee.pk, employee.last_name, employee.first_name, employee.date_of_birth)
+                employee_id = employee.pk
+            elif employee_id not in self.employee_ids:
+                self.report['employees_matched'] += 1
+            self.employee_ids.add(employee_id)
+
+            assignment = Assignment(employee_id=employee_id, position_titles=get_position_titles(row['positions']),
+                                    **row['assignment'])
+            key = (employee_id, get_partial_date_key(assignment.start_date),
+                   get_partial_date_key(assignment.end_date), assignment.position_titles, row['place_id'])
+            if key in self.assignments:
+                self.report['duplicate_assignments'] += 1
+                continue
+            self.assignments.add(key)
+
+            assignment.date_range = get_date_range(assignment.start_date, assignment.end_date)
+            assignments.append(assignment)
+            relations['positions'].extend((assignment.pk, title) for title in row['positions'])
+            if row['place_id']:
+                relations['places'].append((assignment.pk, row['place_id']))
+                self.place_ids.add(row['place_id'])
+            if row['bureau_state_id']:
+                relations['bureau_states'].append((assignment.pk, row['bureau_state_id']))
+                employee_states.add((employee_id, row['bureau_state_id']))
+
+        self.report['employees_created'] += len(employees)
+        self.report['assignments_created'] += len(assignments)
+        new_titles = {title for _, title in relations['positions']} - set(self.positions)
+        self.report['positions_created'] += len(new_titles)
+        if self.dry_run:
+            self.positions.update((title, None) for title in new_titles)
+            return
+
+        positions = [Position(title=title) for title in sorted(new_titles)]
+        Position.objects.bulk_create(positions)
+        self.positions.update((position.title, position.pk) for position in positions)
+        Employee.objects.bulk_create(employees)
+        Assignment.objects.bulk_create(assignments)
+
+        relations['positions'] = [(pk, self.positions[title]) for pk, title in relations['positions']]
+        self.position_ids.update(position_id for _, position_id in relations['positions'])
+        for relation, pairs in relations.items():
+            through = getattr(Assignment, relation).through
+            related_field = getattr(Assignment, relation).field.m2m_reverse_field_name()
+            through.objects.bulk_create([through(**{'assignment_id': pk, f'{related_field}_id': related_id})
+                                         for pk, related_id in pairs])
+        Employee.bureau_states.through.objects.bulk_create([
+            Employee.bureau_states.through(employee_id=employee_id, region_id=region_id)
+            for employee_id, region_id in employee_states
+        ], ignore_conflicts=True)
+
+    def run(self, path, processes=1):
+        """
+        Import a roster file, parsing its rows in a pool of processes if there's more than one,
+        and return the report of what was (or would be, for a dry run) created.
+        It's all imported in one transaction with what's computed from it, so an import that fails imports nothing
+        """
+        parser = RosterRowParser(build_place_index(), self.bureau_states)
+        # Forked before the transaction starts, so its connection can be closed first
+        pool = get_parser_pool(parser, processes) if processes > 1 else None
+        try:
+            with transaction.atomic():
+                for rows in parse_batches(path, parser, pool):
+                    self.add_batch(rows)
+
+                if not self.dry_run:
+                    update_imported_roster(self.employee_ids, self.place_ids, self.position_ids)
+        finally:
+            if pool is not None:
+                pool.terminate()
+        return self.report
+
+
+def update_imported_roster(employee_ids, place_ids, position_ids):
+    """
+    Bulk inserts don't send signals, so update the employment years, map points, co-workers and post successions
+    of what was imported, and the employees and assignments data versions
+    """
+    if not employee_ids:
+        return
+
+    EmploymentYear.objects.update_for_employees(employee_ids)
+    assignment_places_changed(place_ids, employee_ids, position_ids)
+    bump_data_version('employees')
+
+
+def import_roster(path, dry_run=False, processes=1):
+    """
+    Import employees and assignments from a roster file (see RosterImport), returning its report
+    """
+    return RosterImport(dry_run).run(path, processes)
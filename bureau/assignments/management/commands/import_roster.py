@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assignments.importer import ASSIGNMENT_COLUMNS, EMPLOYEE_COLUMNS, import_roster, MAX_REPORTED_ERRORS
+
+
+class Command(BaseCommand):
+    help = (f"Imports employees and their assignments in bulk from a roster file (CSV, or Excel .xlsx) with a row "
+            f"for each assignment and columns {', '.join(EMPLOYEE_COLUMNS + ASSIGNMENT_COLUMNS)}. Employees already "
+            f"there are matched by name and date of birth, and places by name")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or Excel file of a roster')
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would be imported and the errors in the file without importing it")
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Number of processes to parse and validate rows in (default 1)')
+
+    def handle(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            report = import_roster(kwargs['path'], dry_run=kwargs['dry_run'], processes=kwargs['processes'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error) from error
+        seconds = time.monotonic() - start
+
+        verb = 'would be' if kwargs['dry_run'] else 'were'
+        self.stdout.write(
+            f"{report['rows']} rows read in {seconds:.1f}s: {report['employees_created']} employees and "
+            f"{report['assignments_created']} assignments {verb} created, {report['positions_created']} positions and "
+            f"{len(report['places_created'])} places {verb} added, {report['employees_matched']} employees "
+            f"were already there, and {report['duplicate_assignments']} assignments already there were skipped"
+        )
+        if report['places_created']:
+            self.stdout.write(f"Places {verb} added for: {', '.join(sorted(report['places_created']))}")
+
+        errors = report['errors']
+        if errors:
+            self.stderr.write(f'{len(errors)} errors, in rows that were skipped:')
+            for line, error in errors[:MAX_REPORTED_ERRORS]:
+                self.stderr.write(f'Line {line}: {error}')
+            if len(errors) > MAX_REPORTED_ERRORS:
+                self.stderr.write(f'and {len(errors) - MAX_REPORTED_ERRORS} more')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from assignments.models import AssignmentMapPoint
+from utilities.data_version import bump_data_version
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the precomputed assignment map points, ex. after city or county coordinates have been loaded"
+
+    def handle(self, *args, **kwargs):
+        count = AssignmentMapPoint.objects.rebuild()
+        bump_data_version('assignments')
+        self.stdout.write(f'{count} assignment map points created')
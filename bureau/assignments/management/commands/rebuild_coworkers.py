@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assignments.models import CoworkerLink
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the co-worker links between employees who served alongside each other, ex. after a bulk import"
+
+    def handle(self, *args, **kwargs):
+        count = CoworkerLink.objects.rebuild()
+        self.stdout.write(f'{count} co-worker links created')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assignments.models import EmploymentYear
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the years each employee was employed, used to filter employees by year, ex. after a bulk import"
+
+    def handle(self, *args, **kwargs):
+        count = EmploymentYear.objects.rebuild()
+        self.stdout.write(f'{count} employment years created')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assignments.models import PostSuccession
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the succession chains of who held each post (a position in a place), ex. after a bulk import"
+
+    def handle(self, *args, **kwargs):
+        count = PostSuccession.objects.rebuild()
+        self.stdout.write(f'{count} post succession entries created')
@@ -0,0 +1,107 @@
+import json
+import math
+
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from assignments.models import AssignmentMapPoint
+from utilities.data_version import get_data_version
+
+# Zoom levels (as in Leaflet/OpenStreetMap tiles) that layers are clustered for
+MIN_ZOOM = 3
+MAX_ZOOM = 12
+# Points closer together than about this many pixels on the map are clustered
+CLUSTER_PIXELS = 60
+MAP_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def get_cluster_size(zoom):
+    """
+    Return size in degrees of the grid cells points are clustered in at a zoom level (a 256-pixel tile
+    covers 360 degrees at zoom 0)
+    """
+    return 360 / 2 ** zoom * CLUSTER_PIXELS / 256
+
+
+def get_feature(latitude, longitude, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(longitude, 5), round(latitude, 5)]},
+        'properties': properties,
+    }
+
+
+def cluster_points(points, zoom):
+    """
+    Return GeoJSON features for points clustered on a grid for zoom level. A cluster is at the headcount-weighted
+    center of its points, with their total headcount, overall and by year
+    """
+    size = get_cluster_size(zoom)
+    cells = defaultdict(list)
+    for point in points:
+        cells[(math.floor(point.latitude / size), math.floor(point.longitude / size))].append(point)
+
+    features = []
+    for cell_points in cells.values():
+        if len(cell_points) == 1:
+            point = cell_points[0]
+            features.append(get_feature(point.latitude, point.longitude, {
+                'name': point.place.display_name,
+                'url': reverse('assignments:assignment_list', kwargs={'place': point.place_id}),
+                'headcount': point.headcount,
+                'headcount_by_year': point.headcount_by_year,
+            }))
+            continue
+
+        headcount = sum(point.headcount for point in cell_points)
+        weights = [point.headcount or 1 for point in cell_points]
+        headcount_by_year = Counter()
+        for point in cell_points:
+            headcount_by_year.update(point.headcount_by_year)
+
+        features.append(get_feature(
+            sum(point.latitude * weight for point, weight in zip(cell_points, weights)) / sum(weights),
+            sum(point.longitude * weight for point, weight in zip(cell_points, weights)) / sum(weights),
+            {
+                'point_count': len(cell_points),
+                'headcount': headcount,
+                'headcount_by_year': dict(sorted(headcount_by_year.items())),
+            }
+        ))
+
+    return features
+
+
+def build_assignment_map_layers():
+    """
+    Return a dict of GeoJSON layers (serialized) of assignment map points by zoom level
+    """
+    points = list(AssignmentMapPoint.objects.select_related('place').only(
+        'latitude', 'longitude', 'headcount', 'headcount_by_year', 'place__display_name'))
+    return {
+        zoom: json.dumps({'type': 'FeatureCollection', 'features': cluster_points(points, zoom)})
+        for zoom in range(MIN_ZOOM, MAX_ZOOM + 1)
+    }
+
+
+def get_map_zoom(zoom):
+    try:
+        return min(max(int(zoom), MIN_ZOOM), MAX_ZOOM)
+    except (TypeError, ValueError):
+        return MIN_ZOOM
+
+
+def get_assignment_map_layer(zoom):
+    """
+    Return (GeoJSON layer for zoom level, data version it was built for). Layers for all zoom levels are
+    built together and cached until assignments change
+    """
+    version = get_data_version('assignments')
+    key = f'assignment_map:{version}'
+    layers = cache.get(key)
+    if layers is None:
+        layers = build_assignment_map_layers()
+        cache.set(key, layers, MAP_CACHE_TIMEOUT)
+    return layers[get_map_zoom(zoom)], version
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.6 on 2026-10-19 08:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import defaultdict
+
+
+def create_assignment_map_points(apps, schema_editor):
+    """
+    Precompute map points for places that already have assignments (see AssignmentMapPointManager.update_for_places)
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+    AssignmentMapPoint = apps.get_model('assignments', 'AssignmentMapPoint')
+    Place = apps.get_model('places', 'Place')
+
+    employees = defaultdict(set)
+    employees_by_year = defaultdict(lambda: defaultdict(set))
+    assignment_places = Assignment.places.through.objects.filter(assignment__employee__isnull=False).values_list(
+        'place_id', 'assignment__employee_id', 'assignment__start_date', 'assignment__end_date')
+    for place_id, employee_id, start_date, end_date in assignment_places:
+        employees[place_id].add(employee_id)
+        if start_date or end_date:
+            for year in range((start_date or end_date).date.year, (end_date or start_date).date.year + 1):
+                employees_by_year[place_id][year].add(employee_id)
+
+    points = []
+    for place in Place.objects.filter(pk__in=employees).select_related('city', 'county'):
+        for location in (place.city, place.county):
+            if location and location.latitude is not None and location.longitude is not None:
+                points.append(AssignmentMapPoint(
+                    place=place,
+                    latitude=location.latitude,
+                    longitude=location.longitude,
+                    headcount=len(employees[place.pk]),
+                    headcount_by_year={str(year): len(year_employees)
+                                       for year, year_employees in sorted(employees_by_year[place.pk].items())},
+                ))
+                break
+    AssignmentMapPoint.objects.bulk_create(points)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0013_county_coordinates'),
+        ('assignments', '0013_alter_assignment_bureau_states'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentMapPoint',
+            fields=[
+                ('place', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='assignment_map_point', serialize=False, to='places.place')),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('headcount_by_year', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.RunPython(create_assignment_map_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:08
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations
+from django.db.models import Q
+
+from utilities.dates import get_date_range
+
+
+def set_assignment_date_ranges(apps, schema_editor):
+    """
+    Fill date_range of existing assignments from their start and end dates (see Assignment.save())
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+
+    assignments = list(Assignment.objects.filter(Q(start_date__isnull=False) | Q(end_date__isnull=False)).only(
+        'start_date', 'end_date'))
+    for assignment in assignments:
+        assignment.date_range = get_date_range(assignment.start_date, assignment.end_date)
+    Assignment.objects.bulk_update(assignments, ['date_range'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0014_assignmentmappoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='date_range',
+            field=django.contrib.postgres.fields.ranges.DateRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['date_range'], name='assignment_date_range_gist'),
+        ),
+        migrations.RunPython(set_assignment_date_ranges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:17
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F, Q
+import django.db.models.deletion
+
+from assignments.coworkers import get_coworker_weights
+
+
+def create_coworker_links(apps, schema_editor):
+    """
+    Compute co-workers from existing assignments (see CoworkerLinkManager.rebuild)
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+    CoworkerLink = apps.get_model('assignments', 'CoworkerLink')
+    PlaceHierarchy = apps.get_model('places', 'PlaceHierarchy')
+
+    nodes = defaultdict(list)
+    links = PlaceHierarchy.objects.exclude(~Q(ancestor=F('descendant')), ancestor__region=None,
+                                           ancestor__county=None, ancestor__city=None)
+    for ancestor_id, descendant_id in links.values_list('ancestor_id', 'descendant_id'):
+        nodes[descendant_id].append(ancestor_id)
+
+    intervals = defaultdict(list)
+    rows = Assignment.objects.filter(employee__isnull=False, date_range__isnull=False).values_list(
+        'pk', 'employee_id', 'date_range', 'places')
+    for pk, employee_id, date_range, place_id in rows:
+        start, end = date_range.lower.toordinal(), date_range.upper.toordinal()
+        for node in nodes[place_id]:
+            intervals[node].append((start, end, pk, employee_id, node == place_id))
+
+    coworker_links = []
+    for (employee_id, coworker_id), weight in get_coworker_weights(intervals).items():
+        coworker_links.append(CoworkerLink(employee_id=employee_id, coworker_id=coworker_id, weight=weight))
+        coworker_links.append(CoworkerLink(employee_id=coworker_id, coworker_id=employee_id, weight=weight))
+    CoworkerLink.objects.bulk_create(coworker_links, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personnel', '0014_alter_employee_bureau_states'),
+        ('assignments', '0015_assignment_date_range'),
+        ('places', '0009_place_hierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoworkerLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('coworker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='personnel.employee')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coworker_links', to='personnel.employee')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='coworkerlink',
+            constraint=models.UniqueConstraint(fields=('employee', 'coworker'), name='unique_coworker_link'),
+        ),
+        migrations.RunPython(create_coworker_links, migrations.RunPython.noop),
+    ]
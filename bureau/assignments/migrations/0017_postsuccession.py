@@ -0,0 +1,70 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:21
+
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_post_successions(apps, schema_editor):
+    """
+    Compute the succession chains of posts from existing assignments (see PostSuccessionManager.update_for_posts)
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+    PostSuccession = apps.get_model('assignments', 'PostSuccession')
+
+    rows = Assignment.objects.filter(employee__isnull=False, date_range__isnull=False).values_list(
+        'places', 'positions', 'pk', 'date_range').order_by('places', 'positions', 'date_range', 'pk')
+
+    successions = []
+    for (place_id, position_id), post_rows in groupby(rows, key=itemgetter(0, 1)):
+        if place_id is None or position_id is None:
+            continue
+
+        post_rows = list(post_rows)
+        for index, (_, _, assignment_id, date_range) in enumerate(post_rows):
+            predecessor = post_rows[index - 1] if index else None
+            successor = post_rows[index + 1] if index + 1 < len(post_rows) else None
+            successions.append(PostSuccession(
+                place_id=place_id,
+                position_id=position_id,
+                assignment_id=assignment_id,
+                sequence=index + 1,
+                predecessor_id=predecessor[2] if predecessor else None,
+                successor_id=successor[2] if successor else None,
+                gap=(date_range.lower - predecessor[3].upper).days if predecessor else None,
+            ))
+    PostSuccession.objects.bulk_create(successions, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0013_county_coordinates'),
+        ('assignments', '0016_coworkerlink'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSuccession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('gap', models.IntegerField(null=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='successions', to='assignments.assignment')),
+                ('place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='places.place')),
+                ('position', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='assignments.position')),
+                ('predecessor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='assignments.assignment')),
+                ('successor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='assignments.assignment')),
+            ],
+            options={
+                'ordering': ['place', 'position', 'sequence'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postsuccession',
+            constraint=models.UniqueConstraint(fields=('place', 'position', 'sequence'), name='unique_post_sequence'),
+        ),
+        migrations.RunPython(create_post_successions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:24
+
+from django.db import migrations, models
+from django.db.models import Q
+
+import utilities.fields
+from utilities.dates import get_partial_date_key
+
+
+def set_assignment_date_keys(apps, schema_editor):
+    """
+    Fill the sortable keys of existing assignments' partial dates (see PartialDateKeyField)
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+
+    assignments = list(Assignment.objects.filter(Q(start_date__isnull=False) | Q(end_date__isnull=False)).only(
+        'start_date', 'end_date'))
+    for assignment in assignments:
+        assignment.start_date_key = get_partial_date_key(assignment.start_date)
+        assignment.end_date_key = get_partial_date_key(assignment.end_date)
+    Assignment.objects.bulk_update(assignments, ['start_date_key', 'end_date_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0017_postsuccession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='end_date_key',
+            field=utilities.fields.PartialDateKeyField(source='end_date'),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='start_date_key',
+            field=utilities.fields.PartialDateKeyField(source='start_date'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['employee', 'start_date_key'], name='assignment_employee_start_key'),
+        ),
+        migrations.RunPython(set_assignment_date_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:27
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def set_assignment_position_titles(apps, schema_editor):
+    """
+    Fill position titles of existing assignments (see AssignmentManager.update_position_titles)
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+
+    titles = defaultdict(list)
+    for assignment_id, title in Assignment.positions.through.objects.values_list('assignment_id', 'position__title'):
+        titles[assignment_id].append(title)
+
+    assignments = list(Assignment.objects.filter(pk__in=titles).only('pk'))
+    for assignment in assignments:
+        assignment.position_titles = ' and '.join(sorted(titles[assignment.pk]))
+    Assignment.objects.bulk_update(assignments, ['position_titles'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0018_partial_date_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='position_titles',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['start_date_key', 'position_titles'], name='assignment_start_key_titles'),
+        ),
+        migrations.RunPython(set_assignment_position_titles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from utilities.dates import get_date_range_years
+
+
+def create_employment_years(apps, schema_editor):
+    """
+    Create the years existing employees were employed, from their assignments (see EmploymentYear)
+    """
+    Assignment = apps.get_model('assignments', 'Assignment')
+    EmploymentYear = apps.get_model('assignments', 'EmploymentYear')
+
+    years = set()
+    for employee_id, date_range in Assignment.objects.filter(
+            employee__isnull=False, date_range__isnull=False).values_list('employee_id', 'date_range'):
+        years.update((employee_id, year) for year in get_date_range_years(date_range))
+    EmploymentYear.objects.bulk_create([EmploymentYear(employee_id=employee_id, year=year)
+                                        for employee_id, year in years], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personnel', '0016_regiment_flags'),
+        ('assignments', '0019_assignment_position_titles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmploymentYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='employment_years', to='personnel.employee')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='employmentyear',
+            constraint=models.UniqueConstraint(fields=('year', 'employee'), name='unique_employment_year'),
+        ),
+        migrations.RunPython(create_employment_years, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,28 @@
+import threading
 import uuid
 
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
 from partial_date import PartialDateField
 
 from django.conf import settings
-from django.db import models
-from django.db.models import Q
+from django.contrib.postgres.fields import DateRangeField
+from django.contrib.postgres.indexes import GistIndex
+from django.db import models, transaction
+from django.core.cache import cache
+from django.db.models import Exists, F, Max, Min, OuterRef, Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 
+from assignments.coworkers import get_coworker_weights
 from personnel.models import Employee
-from places.models import Place, Region
+from places.models import Place, PlaceHierarchy, Region
+from utilities.data_version import bump_data_version, get_data_version
+from utilities.dates import get_date_range, get_date_range_years, get_year_range
+from utilities.fields import get_partial_date_key_update_fields, PartialDateKeyField
+
+EMPLOYMENT_YEARS_CACHE_TIMEOUT = 60 * 60 * 24 * 7
 
 
 class Position(models.Model):
@@ -27,12 +42,46 @@ class Position(models.Model):
 
 class AssignmentManager(models.Manager):
 
+    def update_position_titles(self, **kwargs):
+        """
+        Update the denormalized position titles of assignments, for when their positions have changed
+        """
+        titles = defaultdict(list)
+        assignment_positions = Assignment.positions.through.objects.filter(
+            **{f'assignment__{key}': value for key, value in kwargs.items()}
+        ).values_list('assignment_id', 'position__title')
+        for assignment_id, title in assignment_positions:
+            titles[assignment_id].append(title)
+
+        assignments = list(self.filter(**kwargs).only('pk', 'position_titles'))
+        changed = []
+        for assignment in assignments:
+            position_titles = get_position_titles(titles[assignment.pk])
+            if assignment.position_titles != position_titles:
+                assignment.position_titles = position_titles
+                changed.append(assignment)
+        self.bulk_update(changed, ['position_titles'], batch_size=1000)
+
     def during_year(self, year, **kwargs):
-        return self.filter(
-            Q(start_date__lte=str(year), end_date__gte=str(year)) |
-            # PartialDateField.year can't be accessed in query, so an assignment in that year with no end date
-            # has to be queried like this
-            Q(start_date__gte=str(year), start_date__lte=str(year + 1)))
+        return self.overlapping(get_year_range(year), **kwargs)
+
+    def overlapping(self, date_range, **kwargs):
+        """
+        Return assignments at least partly during date_range (a DateRange)
+        """
+        return self.filter(date_range__overlap=date_range).filter(**kwargs)
+
+    def within(self, date_range, **kwargs):
+        """
+        Return assignments entirely within date_range (a DateRange)
+        """
+        return self.filter(date_range__contained_by=date_range).filter(**kwargs)
+
+    def active_on(self, date, **kwargs):
+        """
+        Return assignments that were (or may have been, according to the precision of their dates) active on date
+        """
+        return self.filter(date_range__contains=date).filter(**kwargs)
 
     def in_place(self, place, exact=False, **kwargs):
         """
@@ -43,14 +92,20 @@ class AssignmentManager(models.Manager):
             return self.filter(places=place)
 
         # Return assignments in that place and in all places in that place
-        assignments = self.filter(places__country=place.country)
-        if place.region:
-            assignments = assignments.filter(places__region=place.region)
-        if place.county:
-            assignments = assignments.filter(places__county=place.county)
-        elif place.city:
-            assignments = assignments.filter(places__city=place.city)
-        return assignments
+        return self.filter(places__ancestor_links__ancestor=place).distinct()
+
+    def near(self, place, miles, **kwargs):
+        """
+        Return assignments in a city within miles of a particular place's city
+        """
+        return self.filter(places__in=Place.objects.near(place, miles)).filter(**kwargs).distinct()
+
+
+def get_position_titles(titles):
+    """
+    Return an assignment's position titles as shown and sorted in assignment lists
+    """
+    return ' and '.join(sorted(titles))
 
 
 class Assignment(models.Model):
@@ -65,6 +120,8 @@ class Assignment(models.Model):
         related_query_name='assignment',
         blank=True,
     )
+    # Titles of the positions, kept up to date when they change, so assignment lists can be sorted by them with an index
+    position_titles = models.TextField(blank=True, editable=False)
     description = models.CharField(max_length=150, blank=True)
     places = models.ManyToManyField(
         Place,
@@ -87,11 +144,26 @@ class Assignment(models.Model):
     # Start and end dates use PartialDateField because the entire date isn't usually known
     start_date = PartialDateField(null=True, blank=True)
     end_date = PartialDateField(null=True, blank=True)
+    # Sortable keys of the dates, for ordering and filtering by range with an index
+    start_date_key = PartialDateKeyField(source='start_date')
+    end_date_key = PartialDateKeyField(source='end_date')
+    # Period from the beginning of start_date to the end of end_date, according to their precision,
+    # so date overlap and containment can be queried with a GiST index
+    date_range = DateRangeField(null=True, blank=True, editable=False)
     # This is to distinguish Bureau Headquarters assignments from other assignments in Washington, DC
     bureau_headquarters = models.BooleanField(default=False)
 
     objects = AssignmentManager()
 
+    class Meta:
+        indexes = [
+            GistIndex(fields=['date_range'], name='assignment_date_range_gist'),
+            # For each employee's assignments in order
+            models.Index(fields=['employee', 'start_date_key'], name='assignment_employee_start_key'),
+            # For assignment lists in order
+            models.Index(fields=['start_date_key', 'position_titles'], name='assignment_start_key_titles'),
+        ]
+
     def __str__(self):
 
         # In cases where one of the elements used in __str__() can't be accessed without causing an error
@@ -101,6 +173,16 @@ class Assignment(models.Model):
         except (RecursionError, ValueError):
             return self.description
 
+    def save(self, *args, **kwargs):
+        self.date_range = get_date_range(self.start_date, self.end_date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = get_partial_date_key_update_fields(self, update_fields)
+            if {'start_date', 'end_date'} & update_fields:
+                update_fields.add('date_range')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
     def bureau_state_list(self):
         return ', '.join([state.name for state in self.bureau_states.all()])
 
@@ -115,14 +197,527 @@ class Assignment(models.Model):
 
         return settings.DEFAULT_EMPTY_FIELD_STRING
 
+    # These use all() without checking exists() first, so they don't need any queries if places and positions
+    # have been prefetched, as in lists of assignments
     def place_list(self):
-        if self.places.exists():
-            return ' and '.join([place.name_without_country() for place in self.places.all()])
+        places = self.places.all()
+        if places:
+            return ' and '.join([place.name_without_country() for place in places])
 
         return settings.DEFAULT_EMPTY_FIELD_STRING
 
     def position_list(self):
-        if self.positions.exists():
-            return ' and '.join([str(position) for position in self.positions.all()])
+        positions = self.positions.all()
+        if positions:
+            return ' and '.join([str(position) for position in positions])
 
         return settings.DEFAULT_EMPTY_FIELD_STRING
+
+
+class AssignmentMapPointManager(models.Manager):
+
+    def update_for_places(self, place_ids):
+        """
+        Recalculate the map points of places, for when their assignments have changed
+        """
+        place_ids = set(place_ids)
+        if not place_ids:
+            return
+
+        employees = defaultdict(set)
+        employees_by_year = defaultdict(lambda: defaultdict(set))
+        assignment_places = Assignment.places.through.objects.filter(
+            place_id__in=place_ids, assignment__employee__isnull=False
+        ).values_list('place_id', 'assignment__employee_id', 'assignment__start_date', 'assignment__end_date')
+        for place_id, employee_id, start_date, end_date in assignment_places:
+            employees[place_id].add(employee_id)
+            for year in get_assignment_years(start_date, end_date):
+                employees_by_year[place_id][year].add(employee_id)
+
+        points = []
+        for place in Place.objects.filter(pk__in=employees).select_related('city', 'county'):
+            coordinates = place.get_coordinates()
+            if coordinates:
+                points.append(AssignmentMapPoint(
+                    place=place,
+                    latitude=coordinates[0],
+                    longitude=coordinates[1],
+                    headcount=len(employees[place.pk]),
+                    headcount_by_year={
+                        str(year): len(year_employees)
+                        for year, year_employees in sorted(employees_by_year[place.pk].items())
+                    },
+                ))
+
+        self.filter(place_id__in=place_ids).exclude(place_id__in=[point.place_id for point in points]).delete()
+        self.bulk_create(points, update_conflicts=True, unique_fields=['place'],
+                         update_fields=['latitude', 'longitude', 'headcount', 'headcount_by_year'])
+
+    def rebuild(self):
+        self.all().delete()
+        self.update_for_places(Assignment.places.through.objects.values_list('place_id', flat=True).distinct())
+        return self.count()
+
+
+def get_assignment_years(start_date, end_date):
+    """
+    Return the years an assignment was in, from its partial start and end dates
+    """
+    if not (start_date or end_date):
+        return range(0)
+    return range((start_date or end_date).date.year, (end_date or start_date).date.year + 1)
+
+
+class AssignmentMapPoint(models.Model):
+    """
+    Assignment headcount in a place with coordinates, overall and by year, precomputed for the assignment map
+    """
+
+    place = models.OneToOneField(Place, primary_key=True, on_delete=models.CASCADE, related_name='assignment_map_point')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    headcount = models.PositiveIntegerField(default=0)
+    headcount_by_year = models.JSONField(default=dict)
+
+    objects = AssignmentMapPointManager()
+
+    def __str__(self):
+        return f'{self.place}: {self.headcount}'
+
+
+def get_coworker_hierarchy_links():
+    """
+    Return the place hierarchy links employees can have served alongside each other through: places themselves and
+    the places containing them, except countries, which are too broad
+    """
+    return PlaceHierarchy.objects.exclude(~Q(ancestor=F('descendant')), ancestor__region=None, ancestor__county=None,
+                                          ancestor__city=None)
+
+
+class CoworkerLinkManager(models.Manager):
+
+    def get_intervals_by_node(self, assignments):
+        """
+        Return the intervals of dated assignments with an employee, as (start, end, assignment, employee, own) with
+        ordinal dates, by place hierarchy node: their places (own) and places containing them (not own)
+        """
+        nodes = defaultdict(list)
+        links = get_coworker_hierarchy_links().filter(descendant__assignment__in=assignments)
+        for ancestor_id, descendant_id in links.values_list('ancestor_id', 'descendant_id'):
+            nodes[descendant_id].append(ancestor_id)
+
+        intervals = defaultdict(list)
+        rows = assignments.filter(employee__isnull=False, date_range__isnull=False).values_list(
+            'pk', 'employee_id', 'date_range', 'places')
+        for pk, employee_id, date_range, place_id in rows:
+            start, end = date_range.lower.toordinal(), date_range.upper.toordinal()
+            for node in nodes[place_id]:
+                intervals[node].append((start, end, pk, employee_id, node == place_id))
+
+        return intervals
+
+    def get_links(self, weights):
+        # Links go both ways, so each employee's co-workers can be looked up by employee
+        for (employee_id, coworker_id), weight in weights.items():
+            yield self.model(employee_id=employee_id, coworker_id=coworker_id, weight=weight)
+            yield self.model(employee_id=coworker_id, coworker_id=employee_id, weight=weight)
+
+    def update_for_employees(self, employee_ids):
+        """
+        Recompute the co-workers of employees, from their assignments and those that could overlap them:
+        at the same time, in places in or containing their places
+        """
+        employee_ids = set(employee_ids) - {None}
+        if not employee_ids:
+            return
+
+        assignments = Assignment.objects.filter(employee__in=employee_ids)
+        links = get_coworker_hierarchy_links()
+        nearby = (Q(places__in=links.filter(ancestor__assignment__in=assignments).values('descendant')) |
+                  Q(places__in=links.filter(descendant__assignment__in=assignments).values('ancestor')))
+        overlapping = Exists(assignments.filter(date_range__overlap=OuterRef('date_range')))
+        candidates = Assignment.objects.filter(Q(employee__in=employee_ids) | nearby & overlapping).values('pk')
+        weights = get_coworker_weights(self.get_intervals_by_node(Assignment.objects.filter(pk__in=candidates)),
+                                       employee_ids)
+
+        with transaction.atomic():
+            self.filter(Q(employee__in=employee_ids) | Q(coworker__in=employee_ids)).delete()
+            self.bulk_create(self.get_links(weights), batch_size=5000)
+
+    def rebuild(self):
+        """
+        Recompute all co-workers, returning the number of links created
+        """
+        weights = get_coworker_weights(self.get_intervals_by_node(Assignment.objects.all()))
+
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(self.get_links(weights), batch_size=5000)
+
+        return self.count()
+
+
+class CoworkerLink(models.Model):
+    """
+    Employees who served alongside each other: in the same place, or one in a place containing the other's,
+    at the same time. Weighted by the number of pairs of their assignments that overlapped
+    """
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='coworker_links')
+    coworker = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='+')
+    weight = models.PositiveIntegerField(default=1)
+
+    objects = CoworkerLinkManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'coworker'], name='unique_coworker_link'),
+        ]
+
+    def __str__(self):
+        return f'{self.employee} - {self.coworker}: {self.weight}'
+
+
+class PostSuccessionManager(models.Manager):
+
+    def update_for_posts(self, place_ids=None, position_ids=None):
+        """
+        Recompute the succession chains of posts with one of place_ids and one of position_ids (any if None)
+        """
+        assignment_filters, post_filters = {}, {}
+        for field, ids in (('place', place_ids), ('position', position_ids)):
+            if ids is not None:
+                ids = set(ids) - {None}
+                if not ids:
+                    return
+                assignment_filters[f'{field}s__in'] = ids
+                post_filters[f'{field}__in'] = ids
+
+        rows = Assignment.objects.filter(
+            employee__isnull=False, date_range__isnull=False, **assignment_filters
+        ).values_list(
+            'places', 'positions', 'pk', 'date_range').order_by('places', 'positions', 'date_range', 'pk')
+
+        successions = []
+        for (place_id, position_id), post_rows in groupby(rows, key=itemgetter(0, 1)):
+            if place_id is not None and position_id is not None:
+                successions.extend(self.model(place_id=place_id, position_id=position_id, **succession)
+                                   for succession in get_successions([row[2:] for row in post_rows]))
+
+        with transaction.atomic():
+            self.filter(**post_filters).delete()
+            self.bulk_create(successions, batch_size=5000)
+
+    def rebuild(self):
+        """
+        Recompute the succession chains of all posts, returning the number of entries created
+        """
+        self.update_for_posts()
+        return self.count()
+
+
+def get_successions(post_rows):
+    """
+    Yield the fields of each succession in a post, from its (assignment pk, date range) in order
+    """
+    for index, (assignment_id, date_range) in enumerate(post_rows):
+        predecessor = post_rows[index - 1] if index else None
+        successor = post_rows[index + 1] if index + 1 < len(post_rows) else None
+        yield {
+            'assignment_id': assignment_id,
+            'sequence': index + 1,
+            'predecessor_id': predecessor[0] if predecessor else None,
+            'successor_id': successor[0] if successor else None,
+            'gap': (date_range.lower - predecessor[1].upper).days if predecessor else None,
+        }
+
+
+class PostSuccession(models.Model):
+    """
+    An assignment's place in the chain of employees who held a post (a position in a place), in order of their dates
+    """
+
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='+')
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='+')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='successions')
+    # Position in the chain, starting at 1
+    sequence = models.PositiveIntegerField()
+    predecessor = models.ForeignKey(Assignment, null=True, on_delete=models.SET_NULL, related_name='+')
+    successor = models.ForeignKey(Assignment, null=True, on_delete=models.SET_NULL, related_name='+')
+    # Days between the end of the predecessor's assignment and the start of this one, negative if they overlapped
+    gap = models.IntegerField(null=True)
+
+    objects = PostSuccessionManager()
+
+    class Meta:
+        ordering = ['place', 'position', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['place', 'position', 'sequence'], name='unique_post_sequence'),
+        ]
+
+    def __str__(self):
+        return f'{self.position}, {self.place.name_without_country()} #{self.sequence}'
+
+    def gap_description(self):
+        """
+        Return how this assignment started relative to the end of the predecessor's
+        """
+        if self.gap is None:
+            return ''
+        if self.gap > 0:
+            return f'{self.gap} day{"s" if self.gap > 1 else ""} after the predecessor'
+        if self.gap < 0:
+            return f'overlapping the predecessor by {abs(self.gap)} day{"s" if self.gap < -1 else ""}'
+        return 'as the predecessor left'
+
+
+class EmploymentYearManager(models.Manager):
+
+    def get_employment_years(self, assignments):
+        """
+        Return unsaved EmploymentYears of the employees of assignments, for the years their date ranges are during
+        """
+        years = set()
+        for employee_id, date_range in assignments.filter(employee__isnull=False, date_range__isnull=False).values_list(
+                'employee_id', 'date_range'):
+            years.update((employee_id, year) for year in get_date_range_years(date_range))
+
+        return [self.model(employee_id=employee_id, year=year) for employee_id, year in years]
+
+    def update_for_employees(self, employee_ids):
+        """
+        Recompute the years employees were employed, from their assignments
+        """
+        employee_ids = set(employee_ids) - {None}
+        if not employee_ids:
+            return
+
+        years = self.get_employment_years(Assignment.objects.filter(employee__in=employee_ids))
+        with transaction.atomic():
+            self.filter(employee__in=employee_ids).delete()
+            self.bulk_create(years, batch_size=5000)
+
+    def rebuild(self):
+        """
+        Recompute the years all employees were employed, returning the number of employee years created
+        """
+        years = self.get_employment_years(Assignment.objects.all())
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(years, batch_size=5000)
+
+        return len(years)
+
+    def get_year_range(self):
+        """
+        Return the first and last years anyone was employed, or None if no one was,
+        cached until assignments change
+        """
+        key = f'employment_year_range:{get_data_version("assignments")}'
+        year_range = cache.get(key)
+        if year_range is None:
+            years = self.aggregate(first=Min('year'), last=Max('year'))
+            # Cache that there are none too
+            year_range = (years['first'], years['last']) if years['first'] else ()
+            cache.set(key, year_range, EMPLOYMENT_YEARS_CACHE_TIMEOUT)
+        return year_range or None
+
+
+class EmploymentYear(models.Model):
+    """
+    A year an employee had an assignment during, so employees can be filtered by year with an indexed semi-join
+    instead of overlapping their assignments' date ranges with the year
+    """
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='employment_years')
+    year = models.PositiveSmallIntegerField()
+
+    objects = EmploymentYearManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'employee'], name='unique_employment_year'),
+        ]
+
+    def __str__(self):
+        return f'{self.employee}: {self.year}'
+
+
+def assignment_places_changed(place_ids, employee_ids, position_ids=None):
+    """
+    Update the map points, co-workers and post successions of assignments that were changed in bulk,
+    and the assignments data version
+    """
+    place_ids = list(place_ids)
+    AssignmentMapPoint.objects.update_for_places(place_ids)
+    CoworkerLink.objects.update_for_employees(employee_ids)
+    PostSuccession.objects.update_for_posts(place_ids, position_ids)
+    bump_data_version('assignments')
+
+
+class PendingAssignmentUpdates(threading.local):
+    """
+    What's computed from assignments that has to be updated for the changes in this thread's transaction: the
+    employment years and co-workers of employees, the map points of places, and the successions of posts. Signals
+    add to it, and it's all updated once when the transaction commits (at once if there isn't one). Anything left
+    from a transaction that was rolled back is just updated with the next one
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.year_employee_ids = set()
+        self.employee_ids = set()
+        self.place_ids = set()
+        # Posts with one of post_place_ids and one of post_position_ids, and posts in places or of positions
+        self.post_place_ids = set()
+        self.post_position_ids = set()
+        self.posts_in_place_ids = set()
+        self.posts_of_position_ids = set()
+        self.changed = False
+
+    def add(self, year_employee_ids=(), employee_ids=(), place_ids=(), post_place_ids=(), post_position_ids=()):
+        """
+        Add what has to be updated: post_place_ids or post_position_ids can be None for posts with any of them
+        """
+        self.year_employee_ids.update(year_employee_ids)
+        self.employee_ids.update(employee_ids)
+        self.place_ids.update(place_ids)
+        if post_place_ids is None:
+            self.posts_of_position_ids.update(post_position_ids)
+        elif post_position_ids is None:
+            self.posts_in_place_ids.update(post_place_ids)
+        else:
+            self.post_place_ids.update(post_place_ids)
+            self.post_position_ids.update(post_position_ids)
+
+        self.changed = True
+        # Registered each time, since the callback of a rolled back savepoint is discarded
+        transaction.on_commit(self.update)
+
+    def add_places(self, place_ids, employee_ids, position_ids=None):
+        """
+        Add the places of assignments that changed, with their employees and positions (None for any)
+        """
+        place_ids = set(place_ids)
+        self.add(employee_ids=employee_ids, place_ids=place_ids, post_place_ids=place_ids,
+                 post_position_ids=position_ids)
+
+    def update(self):
+        if not self.changed:
+            return
+
+        pending = vars(self).copy()
+        self.clear()
+
+        EmploymentYear.objects.update_for_employees(pending['year_employee_ids'])
+        AssignmentMapPoint.objects.update_for_places(pending['place_ids'])
+        CoworkerLink.objects.update_for_employees(pending['employee_ids'])
+        PostSuccession.objects.update_for_posts(pending['post_place_ids'], pending['post_position_ids'])
+        PostSuccession.objects.update_for_posts(place_ids=pending['posts_in_place_ids'])
+        PostSuccession.objects.update_for_posts(position_ids=pending['posts_of_position_ids'])
+        # Once what's computed from assignments is up to date, so nothing older is cached under the new version
+        bump_data_version('assignments')
+
+
+pending_assignment_updates = PendingAssignmentUpdates()
+
+
+# Signals to keep assignment map points, co-workers, post successions, employment years,
+# and the assignments data version up to date, once for each transaction
+def update_assignment_places(sender, instance, action, reverse, pk_set, **kwargs):  # pylint: disable=unused-argument
+    if reverse:
+        # instance is a Place
+        if action == 'pre_clear':
+            instance.cleared_employee_ids = list(instance.assignments.values_list('employee_id', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            pending_assignment_updates.add_places(
+                [instance.pk], Assignment.objects.filter(pk__in=pk_set).values_list('employee_id', flat=True))
+        elif action == 'post_clear':
+            pending_assignment_updates.add_places([instance.pk], getattr(instance, 'cleared_employee_ids', []))
+    elif action == 'pre_clear':
+        instance.cleared_place_ids = list(instance.places.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        pending_assignment_updates.add_places(pk_set, [instance.employee_id],
+                                              instance.positions.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        pending_assignment_updates.add_places(getattr(instance, 'cleared_place_ids', []), [instance.employee_id],
+                                              instance.positions.values_list('pk', flat=True))
+
+
+def update_assignment_positions(sender, instance, action, reverse, pk_set, **kwargs):  # pylint: disable=unused-argument
+    if reverse:
+        # instance is a Position
+        if action == 'pre_clear':
+            instance.cleared_assignment_ids = list(instance.assignments.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove', 'post_clear'):
+            assignment_ids = pk_set if action != 'post_clear' else getattr(instance, 'cleared_assignment_ids', [])
+            Assignment.objects.update_position_titles(pk__in=assignment_ids)
+            pending_assignment_updates.add(post_place_ids=None, post_position_ids=[instance.pk])
+    elif action == 'pre_clear':
+        instance.cleared_position_ids = list(instance.positions.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        Assignment.objects.update_position_titles(pk=instance.pk)
+        pending_assignment_updates.add(post_place_ids=instance.places.values_list('pk', flat=True),
+                                       post_position_ids=pk_set)
+    elif action == 'post_clear':
+        Assignment.objects.update_position_titles(pk=instance.pk)
+        pending_assignment_updates.add(post_place_ids=instance.places.values_list('pk', flat=True),
+                                       post_position_ids=getattr(instance, 'cleared_position_ids', []))
+
+
+def update_position(sender, instance, created=False, raw=False, **kwargs):  # pylint: disable=unused-argument
+    # A renamed position's assignments sort differently
+    if not (raw or created):
+        Assignment.objects.update_position_titles(positions=instance)
+
+
+def remember_position_assignments(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    instance.deleted_assignment_ids = list(instance.assignments.values_list('pk', flat=True))
+
+
+def update_deleted_position(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    Assignment.objects.update_position_titles(pk__in=getattr(instance, 'deleted_assignment_ids', []))
+
+
+def remember_assignment_employee(sender, instance, raw=False, **kwargs):  # pylint: disable=unused-argument
+    # An assignment moved to another employee changes the previous employee's years and co-workers too
+    if not (raw or instance._state.adding):  # pylint: disable=protected-access
+        instance.previous_employee_id = Assignment.objects.filter(pk=instance.pk).values_list(
+            'employee_id', flat=True).first()
+
+
+def update_assignment(sender, instance, created=False, raw=False, **kwargs):  # pylint: disable=unused-argument
+    if raw:
+        return
+
+    employee_ids = [instance.employee_id, getattr(instance, 'previous_employee_id', None)]
+    pending_assignment_updates.add(year_employee_ids=employee_ids)
+    # A new assignment can't have any places yet
+    if not created:
+        pending_assignment_updates.add_places(instance.places.values_list('pk', flat=True), employee_ids,
+                                              instance.positions.values_list('pk', flat=True))
+
+
+def remember_assignment_places(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    instance.deleted_place_ids = list(instance.places.values_list('pk', flat=True))
+    instance.deleted_position_ids = list(instance.positions.values_list('pk', flat=True))
+
+
+def update_deleted_assignment(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    pending_assignment_updates.add(year_employee_ids=[instance.employee_id])
+    pending_assignment_updates.add_places(getattr(instance, 'deleted_place_ids', []), [instance.employee_id],
+                                          getattr(instance, 'deleted_position_ids', []))
+
+
+m2m_changed.connect(update_assignment_places, sender=Assignment.places.through)
+m2m_changed.connect(update_assignment_positions, sender=Assignment.positions.through)
+pre_save.connect(remember_assignment_employee, sender=Assignment)
+post_save.connect(update_assignment, sender=Assignment)
+post_save.connect(update_position, sender=Position)
+pre_delete.connect(remember_position_assignments, sender=Position)
+post_delete.connect(update_deleted_position, sender=Position)
+pre_delete.connect(remember_assignment_places, sender=Assignment)
+post_delete.connect(update_deleted_assignment, sender=Assignment)
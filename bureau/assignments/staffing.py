@@ -0,0 +1,127 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from assignments.models import Assignment
+from places.models import PlaceHierarchy
+from utilities.data_version import get_data_version
+
+# Data the staffing index is built from, so it's rebuilt when any of them change
+STAFFING_DATA = ('assignments', 'places')
+
+
+class IntervalTree:
+    """
+    Static centered interval tree of half-open intervals (start, end, value), with integer endpoints.
+    Finds the k intervals containing a point or overlapping a range in O(log n + k)
+    """
+
+    __slots__ = ('center', 'by_start', 'by_end', 'starts', 'ends', 'left', 'right')
+
+    def __init__(self, intervals):
+        # The median start is in at least one interval, so no node is empty
+        starts = sorted(start for start, _, _ in intervals)
+        self.center = starts[len(starts) // 2]
+
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] <= self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+
+        self.by_start = sorted(here, key=lambda interval: interval[0])
+        self.by_end = sorted(here, key=lambda interval: -interval[1])
+        self.starts = [interval[0] for interval in self.by_start]
+        self.ends = [-interval[1] for interval in self.by_end]
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, start, end):
+        """
+        Yield values of intervals overlapping [start, end). For a single point, that's [point, point + 1)
+        """
+        node = self
+        stack = []
+        while node or stack:
+            if node is None:
+                node = stack.pop()
+
+            if end <= node.center:
+                # Intervals here end after the center, so only their starts matter
+                for interval in node.by_start[:bisect_right(node.starts, end - 1)]:
+                    yield interval[2]
+                node = node.left
+            elif start > node.center:
+                # Intervals here start at or before the center, so only their ends matter
+                for interval in node.by_end[:bisect_right(node.ends, -start - 1)]:
+                    yield interval[2]
+                node = node.right
+            else:
+                # The range contains the center, which every interval here contains
+                for interval in node.by_start:
+                    yield interval[2]
+                if node.right:
+                    stack.append(node.right)
+                node = node.left
+
+
+class StaffingIndex:
+    """
+    Interval trees of the date ranges of all assignments with an employee, one for each place in the hierarchy
+    (with the assignments in it and in places in it), and one for all of them
+    """
+
+    def __init__(self, version):
+        self.version = version
+
+        ancestors = defaultdict(list)
+        for ancestor_id, descendant_id in PlaceHierarchy.objects.values_list('ancestor_id', 'descendant_id'):
+            ancestors[descendant_id].append(ancestor_id)
+
+        intervals = defaultdict(list)
+        assignments = Assignment.objects.filter(employee__isnull=False, date_range__isnull=False).values_list(
+            'pk', 'date_range', 'places')
+        for pk, date_range, place_id in assignments:
+            interval = (date_range.lower.toordinal(), date_range.upper.toordinal(), pk)
+            # An assignment in several places in the same state is only in the state's tree once
+            for node in {None, *ancestors[place_id]} if place_id else {None}:
+                intervals[node].append(interval)
+
+        self.trees = {node: IntervalTree(list(set(node_intervals))) for node, node_intervals in intervals.items()}
+
+    def get_assignment_ids(self, start_date, end_date=None, place=None):
+        """
+        Return the IDs of assignments in place (anywhere if None) that were active on start_date,
+        or at some time from start_date to end_date (inclusive)
+        """
+        tree = self.trees.get(place.pk if place else None)
+        if tree is None:
+            return set()
+
+        end_date = end_date or start_date
+        return set(tree.overlapping(start_date.toordinal(), end_date.toordinal() + 1))
+
+
+_index = None  # pylint: disable=invalid-name
+
+
+def get_staffing_index():
+    """
+    Return this process's staffing index, rebuilt if assignments or places have changed since it was built
+    """
+    global _index  # pylint: disable=global-statement
+
+    version = ':'.join(get_data_version(name) for name in STAFFING_DATA)
+    if _index is None or _index.version != version:
+        _index = StaffingIndex(version)
+    return _index
+
+
+def get_assignments_active(start_date, end_date=None, place=None):
+    """
+    Return assignments in place (anywhere if None, and including places in it) that were active on start_date,
+    or at some time from start_date to end_date, looked up in the staffing index
+    """
+    return Assignment.objects.filter(pk__in=get_staffing_index().get_assignment_ids(start_date, end_date, place))
@@ -1,10 +1,14 @@
 from django.contrib.admin import site
+from django.contrib.auth import get_user_model
 from django.test import RequestFactory, TestCase
+from django.urls import reverse
 
 from assignments.admin import AssignmentAdmin
 from assignments.models import Assignment
 from assignments.tests.factories import AssignmentFactory, PositionFactory
-from places.tests.factories import PlaceFactory
+from personnel.tests.factories import EmployeeFactory
+from places.tests.factories import BureauStateFactory, CityFactory, PlaceFactory
+from utilities.tests.mixins import ChangelistQueriesMixin
 
 
 class AssignmentAdminTestCase(TestCase):
@@ -33,3 +37,23 @@ class AssignmentAdminTestCase(TestCase):
         # Queryset has been retrieved with prefetch_related, so instances should have _prefetched_objects_cache
         instance = qs.first()
         self.assertTrue(hasattr(instance, '_prefetched_objects_cache'))
+
+
+class AssignmentChangelistTestCase(ChangelistQueriesMixin, TestCase):
+    """
+    Test the number of queries for the Assignment changelist
+    """
+
+    def test_changelist_queries(self):
+        get_user_model().objects.create_superuser('admin', 'admin@example.com', 'Password123')
+        self.client.login(username='admin', password='Password123')
+
+        def add_rows():
+            for _ in range(3):
+                city = CityFactory()
+                assignment = AssignmentFactory(employee=EmployeeFactory(), start_date='1866')
+                assignment.places.add(PlaceFactory(city=city, region=city.region, country=city.country))
+                assignment.positions.add(PositionFactory(title=f'Clerk {assignment.pk}'))
+                assignment.bureau_states.add(BureauStateFactory())
+
+        self.assertChangelistQueries(reverse('admin:assignments_assignment_changelist'), 12, add_rows)
@@ -0,0 +1,141 @@
+import random
+
+from partial_date import PartialDate
+
+from django.test import TestCase
+
+from assignments.coworkers import get_coworker_weights, get_overlaps
+from assignments.models import CoworkerLink
+from assignments.tests.factories import AssignmentFactory
+from personnel.tests.factories import EmployeeFactory
+from places.tests.factories import CityFactory, CountryFactory, PlaceFactory, RegionFactory
+
+
+class CoworkersTestCase(TestCase):
+    """
+    Test the sweep-line join of overlapping assignments
+    """
+
+    def test_get_overlaps(self):
+        """
+        get_overlaps() should return the same pairs as comparing every pair of intervals
+        """
+
+        randomizer = random.Random(1866)
+        intervals = []
+        for assignment in range(300):
+            start = randomizer.randint(0, 2000)
+            intervals.append((start, start + randomizer.randint(1, 100), assignment, randomizer.randint(0, 50),
+                              randomizer.random() < 0.5))
+
+        expected = set()
+        for index, interval in enumerate(intervals):
+            for other in intervals[index + 1:]:
+                if interval[0] < other[1] and other[0] < interval[1] and interval[3] != other[3] and \
+                        (interval[4] or other[4]):
+                    expected.add(frozenset((interval[2], other[2])))
+
+        overlaps = [frozenset((assignment, other_assignment))
+                    for assignment, _, other_assignment, _ in get_overlaps(intervals)]
+        self.assertEqual(len(overlaps), len(expected), "get_overlaps() shouldn't return any pair more than once")
+        self.assertSetEqual(set(overlaps), expected, 'get_overlaps() should return pairs of overlapping intervals')
+
+    def test_get_coworker_weights(self):
+        """
+        get_coworker_weights() should count each pair of assignments once, even if it overlaps in several nodes
+        """
+
+        intervals_by_node = {
+            'city': [(0, 10, 'a1', 1, True), (5, 15, 'b1', 2, True)],
+            'state': [(0, 10, 'a1', 1, False), (5, 15, 'b1', 2, False), (8, 20, 'b2', 2, True),
+                      (30, 40, 'c1', 3, True)],
+        }
+        self.assertEqual(get_coworker_weights(intervals_by_node), {(1, 2): 2})
+        self.assertEqual(get_coworker_weights(intervals_by_node, employee_ids={3}), {})
+
+
+class CoworkerLinkTestCase(TestCase):
+    """
+    Test CoworkerLink and how it's kept up to date
+    """
+
+    def setUp(self):
+        country = CountryFactory(name='United States')
+        self.country = PlaceFactory(city=None, county=None, region=None, country=country)
+        self.state = PlaceFactory(city=None, county=None, region=RegionFactory(name='Alabama', country=country))
+        self.city = PlaceFactory(county=None, region=self.state.region,
+                                 city=CityFactory(name='Mobile', region=self.state.region, country=country))
+        self.other_city = PlaceFactory(county=None, region=self.state.region,
+                                       city=CityFactory(name='Selma', region=self.state.region, country=country))
+
+        self.employee = EmployeeFactory()
+        self.assignment = self.create_assignment(self.employee, self.city, '1865-06', '1866-06')
+
+    def create_assignment(self, employee, place, start_date, end_date):
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = AssignmentFactory(employee=employee, start_date=PartialDate(start_date),
+                                           end_date=PartialDate(end_date))
+            assignment.places.add(place)
+        return assignment
+
+    def get_coworkers(self, employee):
+        return dict(CoworkerLink.objects.filter(employee=employee).values_list('coworker', 'weight'))
+
+    def test_coworkers(self):
+        """
+        Employees should be linked when they were in the same place, or one in a place containing the other's,
+        at the same time, but not just in the same state or country
+        """
+
+        same_place = EmployeeFactory()
+        self.create_assignment(same_place, self.city, '1866-01', '1867')
+        self.create_assignment(same_place, self.city, '1866-05', '1866-05')
+        containing_place = EmployeeFactory()
+        self.create_assignment(containing_place, self.state, '1864', '1865-06')
+        other_time = EmployeeFactory()
+        self.create_assignment(other_time, self.city, '1867', '1868')
+        other_city = EmployeeFactory()
+        self.create_assignment(other_city, self.other_city, '1865', '1866')
+        country = EmployeeFactory()
+        self.create_assignment(country, self.country, '1865', '1866')
+
+        expected = {same_place.pk: 2, containing_place.pk: 1}
+        self.assertDictEqual(self.get_coworkers(self.employee), expected,
+                             'Co-workers should be kept up to date as assignments are added')
+        self.assertDictEqual(self.get_coworkers(same_place), {self.employee.pk: 2, other_time.pk: 1},
+                             'Co-worker links should go both ways')
+
+        links = set(CoworkerLink.objects.values_list('employee', 'coworker', 'weight'))
+        self.assertEqual(CoworkerLink.objects.rebuild(), len(links))
+        self.assertSetEqual(set(CoworkerLink.objects.values_list('employee', 'coworker', 'weight')), links,
+                            'CoworkerLink.objects.rebuild() should create the same links that are kept up to date')
+
+    def test_update(self):
+        """
+        Co-workers should be updated when assignments' dates or places change, or they're deleted
+        """
+
+        coworker = EmployeeFactory()
+        assignment = self.create_assignment(coworker, self.city, '1866', '1866')
+        self.assertIn(coworker.pk, self.get_coworkers(self.employee))
+
+        assignment.start_date = assignment.end_date = PartialDate('1867')
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.save()
+        self.assertNotIn(coworker.pk, self.get_coworkers(self.employee),
+                         'Co-workers should be updated when dates change')
+
+        assignment.start_date = PartialDate('1866')
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.save()
+            assignment.places.set([self.other_city])
+        self.assertNotIn(coworker.pk, self.get_coworkers(self.employee),
+                         'Co-workers should be updated when places change')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.places.set([self.state])
+        self.assertIn(coworker.pk, self.get_coworkers(self.employee))
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.delete()
+        self.assertNotIn(coworker.pk, self.get_coworkers(self.employee),
+                         'Co-workers should be updated when assignments are deleted')
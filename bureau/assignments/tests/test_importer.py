@@ -0,0 +1,205 @@
+import csv
+import os
+import tempfile
+
+from io import StringIO
+from unittest.mock import patch
+
+from openpyxl import Workbook
+from partial_date import PartialDate
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from assignments.importer import build_place_index, import_roster
+from assignments.models import Assignment, CoworkerLink, EmploymentYear, PostSuccession
+from assignments.tests.factories import AssignmentFactory, PositionFactory
+from personnel.models import Employee
+from personnel.tests.factories import EmployeeFactory
+from places.tests.factories import CityFactory, CountryFactory, CountyFactory, PlaceFactory, RegionFactory
+from utilities.data_version import get_data_version
+
+COLUMNS = ['Last Name', 'First Name', 'Gender', 'Date of Birth', 'Place of Birth', 'VRC', 'Position', 'Place',
+           'Bureau State', 'Start Date', 'End Date']
+
+ROWS = [
+    ['Sprague', 'John W.', '', '1817', 'Ireland', '', 'Agent', 'Macon, Georgia', '', '1866-03', '1866-10'],
+    ['Sprague', 'John W.', '', '1817', 'Ireland', '', 'Agent; Clerk', 'Georgia', '', '1867', ''],
+    ['Dodge', 'Emily', 'F', '', '', 'yes', 'Teacher', 'Bibb County, Georgia', '', '1866-05', '1866-12'],
+    ['Howard', 'Charles', 'M', '', '', '', 'Agent', 'Macon, Georgia', 'Georgia', '1866-06-15', '1866-09'],
+    ['Nobody', '', 'X', '1866-13', 'Atlantis', '', 'Agent', 'Atlantis', 'Ruritania', '', ''],
+]
+
+
+class ImportRosterTestCase(TestCase):
+    """
+    Test bulk import of rosters of employees and assignments
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+
+        united_states = CountryFactory(name='United States', code2='US')
+        self.georgia = RegionFactory(name='Georgia', country=united_states, bureau_operations=True)
+        self.state = PlaceFactory(region=self.georgia)
+        self.macon = PlaceFactory(city=CityFactory(name='Macon', region=self.georgia, country=united_states))
+        self.bibb = CountyFactory(name='Bibb County', state=self.georgia, country=united_states)
+        self.ireland = PlaceFactory(country=CountryFactory(name='Ireland', code2='IE'))
+
+        # Already there, with the first assignment in the file
+        self.howard = EmployeeFactory(last_name='Howard', first_name='Charles')
+        assignment = AssignmentFactory(employee=self.howard, start_date=PartialDate('1866-06-15'),
+                                       end_date=PartialDate('1866-09'))
+        assignment.positions.add(PositionFactory(title='Agent'))
+        assignment.places.add(self.macon)
+
+    def write_file(self, name, rows, columns=None):
+        path = os.path.join(self.directory.name, name)
+        if name.endswith('.xlsx'):
+            workbook = Workbook()
+            for row in [columns or COLUMNS] + rows:
+                workbook.active.append(row)
+            workbook.save(path)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as file:
+                csv.writer(file).writerows([columns or COLUMNS] + rows)
+        return path
+
+    def test_build_place_index(self):
+        """
+        Places should be indexed by name with and without their country, as (pk, region pk)
+        """
+        index = build_place_index()
+        self.assertEqual(index['macon, georgia'], (self.macon.pk, self.georgia.pk))
+        self.assertEqual(index['macon, georgia, united states'], (self.macon.pk, self.georgia.pk))
+        self.assertEqual(index['ireland'], (self.ireland.pk, None))
+
+    def test_import(self):
+        """
+        New employees and assignments should be created with their positions, places and states, matching employees
+        and skipping assignments already there, and what's computed from assignments should be updated
+        """
+        for name in ['roster.csv', 'roster.xlsx']:
+            with self.subTest(name=name):
+                Assignment.objects.exclude(employee=self.howard).delete()
+                Employee.objects.exclude(pk=self.howard.pk).delete()
+                version = get_data_version('assignments')
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    report = import_roster(self.write_file(name, ROWS))
+
+                self.assertEqual((report['rows'], report['employees_created'], report['employees_matched'],
+                                  report['assignments_created'], report['duplicate_assignments']), (5, 2, 1, 3, 1))
+                self.assertListEqual([line for line, _ in report['errors']], [6] * 3,
+                                     'Each error in a row should be reported, with its line')
+                self.assertFalse(Employee.objects.filter(last_name='Nobody').exists(),
+                                 "Rows with errors shouldn't be imported")
+
+                sprague = Employee.objects.get(last_name='Sprague')
+                self.assertEqual((str(sprague.date_of_birth), sprague.place_of_birth), ('1817', self.ireland))
+                self.assertQuerysetEqual(sprague.bureau_states.all(), [self.georgia],
+                                         msg="Employees should get the Bureau states of their assignments' places")
+                self.assertListEqual([(str(assignment.start_date), assignment.position_titles,
+                                       assignment.date_range.lower.month, list(assignment.places.all()),
+                                       list(assignment.bureau_states.all()))
+                                      for assignment in sprague.assignments_in_order()], [
+                    ('1866-03', 'Agent', 3, [self.macon], [self.georgia]),
+                    ('1867', 'Agent and Clerk', 1, [self.state], [self.georgia]),
+                ], 'Assignments should be created with their dates, positions, places and Bureau states')
+
+                dodge = Employee.objects.get(last_name='Dodge')
+                self.assertTupleEqual((dodge.gender, dodge.vrc), (Employee.Gender.FEMALE, True))
+                self.assertEqual(dodge.assignments.get().places.get().county, self.bibb,
+                                 'A place should be created for a county with the name')
+
+                self.assertQuerysetEqual(EmploymentYear.objects.filter(employee=sprague).values_list('year', flat=True),
+                                         [1866, 1867], ordered=False, msg='Employment years should be updated')
+                self.assertTrue(CoworkerLink.objects.filter(employee=sprague, coworker=self.howard).exists(),
+                                'Co-workers should be updated')
+                self.assertEqual(PostSuccession.objects.filter(place=self.macon).count(), 2,
+                                 'Post successions should be updated')
+                self.assertNotEqual(get_data_version('assignments'), version,
+                                    'Assignments data version should be bumped')
+
+    def test_reimport(self):
+        """
+        Importing the same file again shouldn't create anything
+        """
+        path = self.write_file('roster.csv', ROWS)
+        import_roster(path)
+        counts = (Employee.objects.count(), Assignment.objects.count())
+
+        report = import_roster(path)
+        self.assertTupleEqual((report['employees_created'], report['assignments_created'],
+                               report['duplicate_assignments']), (0, 0, 4))
+        self.assertTupleEqual((Employee.objects.count(), Assignment.objects.count()), counts,
+                              "Employees and assignments already there shouldn't be created again")
+
+    def test_dry_run(self):
+        """
+        A dry run should report what would be imported without changing anything
+        """
+        report = import_roster(self.write_file('roster.csv', ROWS), dry_run=True)
+
+        self.assertTupleEqual((report['employees_created'], report['assignments_created'], report['places_created']),
+                              (2, 3, ['Bibb County, Georgia']))
+        self.assertEqual(Employee.objects.count(), 1, "A dry run shouldn't create employees")
+        self.assertEqual(Assignment.objects.count(), 1, "A dry run shouldn't create assignments")
+        self.assertFalse(self.bibb.places.exists(), "A dry run shouldn't create places")
+
+    def test_too_long(self):
+        """
+        Text longer than the field it's imported into should be an error in its row, in a dry run too, rather than
+        failing the import
+        """
+        row = ROWS[2] + ['']
+        path = self.write_file('roster.csv', [
+            ['L' * 101] + row[1:],
+            row[:1] + ['F' * 101] + row[2:],
+            row[:6] + ['P' * 101] + row[7:],
+            row[:-1] + ['D' * 151],
+            row[:-1] + ['D' * 150],
+        ], columns=COLUMNS + ['Description'])
+
+        for dry_run in [True, False]:
+            with self.subTest(dry_run=dry_run):
+                report = import_roster(path, dry_run=dry_run)
+                self.assertListEqual(report['errors'], [
+                    (2, 'last_name is longer than 100 characters'),
+                    (3, 'first_name is longer than 100 characters'),
+                    (4, 'position is longer than 100 characters'),
+                    (5, 'description is longer than 150 characters'),
+                ], 'Text that is too long should be reported with its row')
+                self.assertEqual(report['assignments_created'], 1, 'Rows without errors should still be imported')
+
+        self.assertEqual(Assignment.objects.get(employee__last_name='Dodge').description, 'D' * 150)
+
+    def test_failure(self):
+        """
+        An import that fails partway through shouldn't import anything
+        """
+        with patch('assignments.importer.update_imported_roster', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            import_roster(self.write_file('roster.csv', ROWS))
+
+        self.assertEqual(Employee.objects.count(), 1, "A failed import shouldn't create employees")
+        self.assertEqual(Assignment.objects.count(), 1, "A failed import shouldn't create assignments")
+        self.assertFalse(self.bibb.places.exists(), "A failed import shouldn't create places")
+
+    def test_processes(self):
+        """
+        Rows parsed in a pool of processes should be imported the same
+        """
+        report = import_roster(self.write_file('roster.csv', ROWS * 3), processes=2)
+        self.assertTupleEqual((report['rows'], report['assignments_created'], report['duplicate_assignments']),
+                              (15, 3, 9))
+
+    def test_command(self):
+        """
+        The command should report what was imported, and the errors
+        """
+        out, err = StringIO(), StringIO()
+        call_command('import_roster', self.write_file('roster.csv', ROWS), '--dry-run', stdout=out, stderr=err)
+        self.assertIn('2 employees and 3 assignments would be created', out.getvalue())
+        self.assertIn('Line 6: gender "X" should be M or F', err.getvalue())
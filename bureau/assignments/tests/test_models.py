@@ -1,13 +1,19 @@
+import datetime
+
 from unittest.mock import patch
 
 from partial_date import PartialDate
 
 from django.conf import settings
+from django.db.backends.postgresql.psycopg_any import DateRange
 from django.test import TestCase
 
-from assignments.models import Assignment
+from assignments.models import Assignment, AssignmentMapPoint, CoworkerLink, EmploymentYear, PostSuccession
 from assignments.tests.factories import AssignmentFactory, PositionFactory
+from personnel.tests.factories import EmployeeFactory
 from places.tests.factories import CityFactory, CountyFactory, CountryFactory, PlaceFactory, RegionFactory
+from utilities.data_version import get_data_version
+from utilities.dates import get_year_range
 
 
 class AssignmentTestCase(TestCase):
@@ -183,6 +189,38 @@ class AssignmentManagerTestCase(TestCase):
             "Assignment that starts in and ends after year should be in Assignment.objects.during_year()"
         )
 
+    def test_date_range_queries(self):
+        """
+        overlapping(), within(), and active_on() should query assignments by date range, which should be
+        kept up to date from start and end dates according to their precision
+        """
+
+        assignment = AssignmentFactory(start_date=PartialDate('1865-08'), end_date=PartialDate('1866'))
+        self.assertEqual(assignment.date_range, DateRange(datetime.date(1865, 8, 1), datetime.date(1867, 1, 1)),
+                         "Assignment.date_range should go from the start of start_date to the end of end_date")
+        undated_assignment = AssignmentFactory()
+        self.assertIsNone(undated_assignment.date_range, "Assignment.date_range should be empty without dates")
+
+        self.assertIn(assignment, Assignment.objects.active_on(datetime.date(1866, 12, 31)),
+                      'Assignment.objects.active_on() should return assignments active on date')
+        self.assertNotIn(assignment, Assignment.objects.active_on(datetime.date(1865, 7, 31)),
+                         "Assignment.objects.active_on() shouldn't return assignments not yet active on date")
+        self.assertIn(assignment, Assignment.objects.overlapping(
+            DateRange(datetime.date(1864, 1, 1), datetime.date(1865, 8, 2))),
+            'Assignment.objects.overlapping() should return assignments partly in date range')
+        self.assertNotIn(assignment, Assignment.objects.within(
+            DateRange(datetime.date(1866, 1, 1), datetime.date(1870, 1, 1))),
+            "Assignment.objects.within() shouldn't return assignments only partly in date range")
+        self.assertNotIn(undated_assignment, Assignment.objects.overlapping(get_year_range(1866)),
+                         "Assignments without dates shouldn't be in any date range")
+
+        # Changing dates with update_fields should update date_range too
+        assignment.end_date = PartialDate('1865-09')
+        assignment.save(update_fields=['end_date'])
+        assignment.refresh_from_db()
+        self.assertNotIn(assignment, Assignment.objects.during_year(1866),
+                         'Assignment.date_range should be updated when end_date changes')
+
     def test_in_place(self):
         """
         in_place() should return assignments in a particular place, according to how specific the place is
@@ -264,12 +302,319 @@ class AssignmentManagerTestCase(TestCase):
                 'Assignment.objects.in_place(exact=False) for county should only return assignments in county'
             )
 
+    def test_near(self):
+        """
+        near() should return assignments in cities within radius of a place's city
+        """
+        vicksburg = PlaceFactory(city=CityFactory(name='Vicksburg', latitude='32.35265', longitude='-90.87788'))
+        jackson = PlaceFactory(city=CityFactory(name='Jackson', latitude='32.29876', longitude='-90.18481'))
+        natchez = PlaceFactory(city=CityFactory(name='Natchez', latitude='31.56044', longitude='-91.40320'))
+
+        assignment_in_jackson = AssignmentFactory()
+        assignment_in_jackson.places.add(jackson, natchez)
+        assignment_in_natchez = AssignmentFactory()
+        assignment_in_natchez.places.add(natchez)
+
+        self.assertEqual(list(Assignment.objects.near(vicksburg, 50)), [assignment_in_jackson],
+                         'near() should return assignments within radius of place, once')
+        self.assertEqual(Assignment.objects.near(vicksburg, 100).count(), 2)
+
+
+class AssignmentMapPointTestCase(TestCase):
+    """
+    Test that assignment map points are kept up to date when assignments change
+    """
+
+    def setUp(self):
+        self.vicksburg = PlaceFactory(city=CityFactory(name='Vicksburg', latitude='32.35265', longitude='-90.87788'))
+        self.warren_county = PlaceFactory(county=CountyFactory(name='Warren', latitude='32.35', longitude='-90.85'))
+        self.mississippi = PlaceFactory(region=RegionFactory(name='Mississippi'))
+
+    def test_update(self):
+        """
+        Map points should get the headcount of places with coordinates, overall and by year
+        """
+        employee = EmployeeFactory()
+        assignment = AssignmentFactory(employee=employee, start_date=PartialDate('1865-06'),
+                                       end_date=PartialDate('1866-02'))
+        version = get_data_version('assignments')
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.places.add(self.vicksburg, self.warren_county, self.mississippi)
+        self.assertNotEqual(get_data_version('assignments'), version, 'Assignments data version should be bumped')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AssignmentFactory(employee=employee, start_date=PartialDate('1866')).places.add(self.vicksburg)
+            AssignmentFactory(employee=EmployeeFactory(), start_date=PartialDate('1866')).places.add(self.vicksburg)
+
+        point = AssignmentMapPoint.objects.get(place=self.vicksburg)
+        self.assertEqual(point.headcount, 2, 'Headcount should be the number of employees assigned to place')
+        self.assertEqual(point.headcount_by_year, {'1865': 1, '1866': 2})
+        self.assertAlmostEqual(point.latitude, 32.35265)
+        self.assertTrue(AssignmentMapPoint.objects.filter(place=self.warren_county).exists(),
+                        'County with coordinates should get a map point')
+        self.assertFalse(AssignmentMapPoint.objects.filter(place=self.mississippi).exists(),
+                         "Place without coordinates shouldn't get a map point")
+
+        # Changing dates should update map points
+        assignment.start_date = PartialDate('1867')
+        assignment.end_date = None
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.save()
+        self.assertEqual(AssignmentMapPoint.objects.get(place=self.warren_county).headcount_by_year, {'1867': 1})
+
+        # Removing places should update map points
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.places.remove(self.warren_county)
+        self.assertFalse(AssignmentMapPoint.objects.filter(place=self.warren_county).exists(),
+                         'Place with no assignments left should lose its map point')
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.places.clear()
+        self.assertEqual(AssignmentMapPoint.objects.get(place=self.vicksburg).headcount_by_year, {'1866': 2})
+
+        # Deleting assignments should update map points
+        with self.captureOnCommitCallbacks(execute=True):
+            for assignment in Assignment.objects.all():
+                assignment.delete()
+        self.assertFalse(AssignmentMapPoint.objects.exists())
+
+    def test_rebuild(self):
+        """
+        rebuild() should recreate all map points
+        """
+        AssignmentFactory(employee=EmployeeFactory()).places.add(self.vicksburg, self.warren_county)
+        AssignmentMapPoint.objects.all().delete()
+
+        self.assertEqual(AssignmentMapPoint.objects.rebuild(), 2)
+        self.assertEqual(AssignmentMapPoint.objects.get(place=self.vicksburg).headcount, 1)
+
+
+class PostSuccessionTestCase(TestCase):
+    """
+    Test PostSuccession and how it's kept up to date
+    """
+
+    def setUp(self):
+        self.place = PlaceFactory(city=None, county=None, region=RegionFactory(name='Mississippi'))
+        self.other_place = PlaceFactory(city=None, county=None, region=RegionFactory(name='Louisiana'))
+        self.agent = PositionFactory(title='Agent')
+        self.clerk = PositionFactory(title='Clerk')
+
+    def create_assignment(self, start_date, end_date, places=None, positions=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = AssignmentFactory(employee=EmployeeFactory(), start_date=PartialDate(start_date),
+                                           end_date=PartialDate(end_date))
+            assignment.places.add(*(places or [self.place]))
+            assignment.positions.add(*(positions or [self.agent]))
+        return assignment
+
+    def get_chain(self, place=None, position=None):
+        successions = PostSuccession.objects.filter(place=place or self.place, position=position or self.agent)
+        return list(successions.values_list('assignment', 'predecessor', 'successor', 'gap'))
+
+    def test_chain(self):
+        """
+        Assignments in a post should be chained in order of dates, with the gaps and overlaps between them
+        """
+
+        second = self.create_assignment('1866-03-01', '1866-12-31')
+        first = self.create_assignment('1865-06-01', '1866-02-28', positions=[self.agent, self.clerk])
+        third = self.create_assignment('1866-12-01', '1867-12-31', places=[self.place, self.other_place])
+        fourth = self.create_assignment('1868-01-11', '1868-06-30')
+        with self.captureOnCommitCallbacks(execute=True):
+            AssignmentFactory(employee=EmployeeFactory()).places.add(self.place)
+
+        expected = [
+            (first.pk, None, second.pk, None),
+            (second.pk, first.pk, third.pk, 0),
+            (third.pk, second.pk, fourth.pk, -31),
+            (fourth.pk, third.pk, None, 10),
+        ]
+        self.assertListEqual(self.get_chain(), expected,
+                             'Assignments in a post should be chained in order, without undated assignments')
+        self.assertListEqual(self.get_chain(position=self.clerk), [(first.pk, None, None, None)],
+                             'Assignments should be chained separately for each of their positions')
+        self.assertListEqual(self.get_chain(place=self.other_place), [(third.pk, None, None, None)],
+                             'Assignments should be chained separately for each of their places')
+
+        successions = list(PostSuccession.objects.values_list('place', 'position', 'assignment', 'sequence'))
+        self.assertEqual(PostSuccession.objects.rebuild(), len(successions))
+        self.assertListEqual(list(PostSuccession.objects.values_list('place', 'position', 'assignment', 'sequence')),
+                             successions, 'rebuild() should create the same chains that are kept up to date')
+
+    def test_update(self):
+        """
+        Chains should be updated when assignments' dates, places or positions change, or they're deleted
+        """
+
+        first = self.create_assignment('1865', '1865')
+        second = self.create_assignment('1866', '1866')
+
+        second.start_date = second.end_date = PartialDate('1864')
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        self.assertListEqual([row[0] for row in self.get_chain()], [second.pk, first.pk],
+                             'Chains should be updated when dates change')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.positions.set([self.clerk])
+        self.assertListEqual([row[0] for row in self.get_chain()], [first.pk],
+                             'Chains should be updated when positions change')
+        self.assertListEqual([row[0] for row in self.get_chain(position=self.clerk)], [second.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.places.set([self.other_place])
+        self.assertListEqual(self.get_chain(), [], 'Chains should be updated when places change')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertFalse(PostSuccession.objects.filter(place=self.other_place).exists(),
+                         'Chains should be updated when assignments are deleted')
+
+    def test_gap_description(self):
+        """
+        gap_description() should describe how the assignment started relative to the predecessor's end
+        """
+
+        for gap, description in [(None, ''), (0, 'as the predecessor left'), (1, '1 day after the predecessor'),
+                                 (-3, 'overlapping the predecessor by 3 days')]:
+            self.assertEqual(PostSuccession(gap=gap).gap_description(), description)
+
+
+class EmploymentYearTestCase(TestCase):
+    """
+    Test EmploymentYear, the years employees had assignments during
+    """
+
+    def get_years(self, employee):
+        return list(employee.employment_years.order_by('year').values_list('year', flat=True))
+
+    def test_employment_years(self):
+        """
+        Employment years should be kept up to date as assignments are created, changed, moved and deleted
+        """
+        employee = EmployeeFactory()
+        other_employee = EmployeeFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = AssignmentFactory(employee=employee, start_date=PartialDate('1865-10'),
+                                           end_date=PartialDate('1867-01'))
+            AssignmentFactory(employee=employee, start_date=PartialDate('1866-03'))
+        self.assertListEqual(self.get_years(employee), [1865, 1866, 1867],
+                             "Employment years should be the years of the employee's assignments")
+
+        assignment.end_date = PartialDate('1865-12')
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.save()
+        self.assertListEqual(self.get_years(employee), [1865, 1866], 'Employment years should follow date changes')
+
+        assignment.employee = other_employee
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.save()
+        self.assertListEqual(self.get_years(employee), [1866],
+                             "An assignment moved to another employee should be removed from the previous one's years")
+        self.assertListEqual(self.get_years(other_employee), [1865])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.delete()
+        self.assertListEqual(self.get_years(other_employee), [],
+                             "A deleted assignment should be removed from the employee's years")
+
+    def test_rebuild(self):
+        employee = EmployeeFactory()
+        AssignmentFactory(employee=employee, start_date=PartialDate('1865'), end_date=PartialDate('1866'))
+        AssignmentFactory(employee=employee, start_date=PartialDate('1866-05'))
+        AssignmentFactory(start_date=PartialDate('1870'))
+        EmploymentYear.objects.all().delete()
+
+        self.assertEqual(EmploymentYear.objects.rebuild(), 2, 'rebuild() should create each employee year once')
+        self.assertListEqual(self.get_years(employee), [1865, 1866])
+
+    def test_get_year_range(self):
+        """
+        get_year_range() should return the first and last years anyone was employed, cached until assignments change
+        """
+        self.assertIsNone(EmploymentYear.objects.get_year_range())
+
+        employee = EmployeeFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            AssignmentFactory(employee=employee, start_date=PartialDate('1865-06'), end_date=PartialDate('1866-02'))
+        self.assertTupleEqual(EmploymentYear.objects.get_year_range(), (1865, 1866))
+        with self.assertNumQueries(0):
+            EmploymentYear.objects.get_year_range()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AssignmentFactory(employee=employee, start_date=PartialDate('1868'))
+        self.assertTupleEqual(EmploymentYear.objects.get_year_range(), (1865, 1868),
+                              'get_year_range() should be recomputed when assignments change')
+
+
+class PendingAssignmentUpdatesTestCase(TestCase):
+    """
+    Test that what's computed from assignments is updated once for each transaction, when it commits
+    """
+
+    def test_update_on_commit(self):
+        employee = EmployeeFactory()
+        vicksburg = PlaceFactory(city=CityFactory(name='Vicksburg', latitude='32.35265', longitude='-90.87788'))
+        version = get_data_version('assignments')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            assignment = AssignmentFactory(employee=employee, start_date=PartialDate('1866'))
+            assignment.places.add(vicksburg)
+            assignment.end_date = PartialDate('1867')
+            assignment.save()
+            self.assertFalse(employee.employment_years.exists(),
+                             "Employment years shouldn't be updated before the transaction commits")
+            self.assertFalse(AssignmentMapPoint.objects.exists(),
+                             "Map points shouldn't be updated before the transaction commits")
+
+        # Run as if committed, along with the callbacks they add
+        with patch.object(CoworkerLink.objects, 'update_for_employees',
+                          wraps=CoworkerLink.objects.update_for_employees) as mock_update, \
+                self.captureOnCommitCallbacks(execute=True):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(mock_update.call_count, 1, 'Co-workers should be updated once for the transaction')
+        self.assertListEqual(list(employee.employment_years.order_by('year').values_list('year', flat=True)),
+                             [1866, 1867], 'Employment years should be updated when the transaction commits')
+        self.assertEqual(AssignmentMapPoint.objects.get(place=vicksburg).headcount_by_year, {'1866': 1, '1867': 1},
+                         'Map points should be updated when the transaction commits')
+        self.assertNotEqual(get_data_version('assignments'), version, 'Assignments data version should be bumped')
+
 
 class PositionTestCase(TestCase):
     """
     Test Position model
     """
 
+    def test_position_titles(self):
+        """
+        Assignments' position titles should be kept up to date when their positions change, or are renamed or deleted
+        """
+
+        agent = PositionFactory(title='Agent')
+        clerk = PositionFactory(title='Clerk')
+        assignment = AssignmentFactory()
+
+        def get_position_titles():
+            assignment.refresh_from_db()
+            return assignment.position_titles
+
+        assignment.positions.add(clerk, agent)
+        self.assertEqual(get_position_titles(), 'Agent and Clerk',
+                         "Position titles should be updated when positions are added, in order of title")
+        assignment.positions.remove(agent)
+        self.assertEqual(get_position_titles(), 'Clerk', 'Position titles should be updated when positions are removed')
+        clerk.assignments.add(AssignmentFactory())
+        clerk.title = 'Chief Clerk'
+        clerk.save()
+        self.assertEqual(get_position_titles(), 'Chief Clerk', 'Position titles should be updated when renamed')
+        self.assertFalse(Assignment.objects.exclude(position_titles='Chief Clerk').exists())
+        clerk.delete()
+        self.assertEqual(get_position_titles(), '', 'Position titles should be updated when positions are deleted')
+        agent.assignments.add(assignment)
+        agent.assignments.clear()
+        self.assertEqual(get_position_titles(), '', 'Position titles should be updated when positions are cleared')
+
     def test_str(self):
         """
         __str__ should return Position.title
@@ -0,0 +1,108 @@
+import datetime
+import random
+
+from partial_date import PartialDate
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from assignments.staffing import get_assignments_active, get_staffing_index, IntervalTree
+from assignments.tests.factories import AssignmentFactory
+from personnel.tests.factories import EmployeeFactory
+from places.tests.factories import CityFactory, PlaceFactory, RegionFactory
+
+
+class IntervalTreeTestCase(TestCase):
+    """
+    Test IntervalTree
+    """
+
+    def test_overlapping(self):
+        """
+        overlapping() should return the same intervals as checking every one of them
+        """
+
+        randomizer = random.Random(1865)
+        intervals = []
+        for value in range(300):
+            start = randomizer.randint(0, 1000)
+            intervals.append((start, start + randomizer.randint(1, 200), value))
+        tree = IntervalTree(intervals)
+
+        for start in range(-10, 1250, 7):
+            for length in (1, 5, 100):
+                expected = {value for interval_start, interval_end, value in intervals
+                            if interval_start < start + length and interval_end > start}
+                self.assertEqual(set(tree.overlapping(start, start + length)), expected,
+                                 f'IntervalTree.overlapping({start}, {start + length}) should return intervals '
+                                 f'overlapping the range')
+
+
+class StaffingIndexTestCase(TestCase):
+    """
+    Test the staffing index and get_assignments_active()
+    """
+
+    def setUp(self):
+        cache.clear()
+
+        self.state = PlaceFactory(city=None, county=None, region=RegionFactory(name='Alabama'))
+        mobile = CityFactory(name='Mobile', region=self.state.region, country=self.state.country)
+        self.city = PlaceFactory(city=mobile, county=None, region=self.state.region)
+        self.other_state = PlaceFactory(city=None, county=None, region=RegionFactory(name='Georgia'))
+
+        self.city_assignment = AssignmentFactory(employee=EmployeeFactory(), start_date=PartialDate('1865-08'),
+                                                 end_date=PartialDate('1866-03-15'))
+        self.city_assignment.places.add(self.city)
+        self.state_assignment = AssignmentFactory(employee=EmployeeFactory(), start_date=PartialDate('1866-06'),
+                                                  end_date=PartialDate('1867'))
+        self.state_assignment.places.add(self.state)
+
+    def test_get_assignments_active(self):
+        """
+        get_assignments_active() should return assignments active on a date, or at some time in a period,
+        in a place and the places in it
+        """
+
+        self.assertSetEqual(set(get_assignments_active(datetime.date(1866, 3, 15))), {self.city_assignment},
+                            'get_assignments_active() should return assignments active anywhere on the date')
+        self.assertSetEqual(set(get_assignments_active(datetime.date(1866, 3, 16))), set(),
+                            "get_assignments_active() shouldn't return assignments after they end")
+        self.assertSetEqual(
+            set(get_assignments_active(datetime.date(1866, 1, 1), datetime.date(1866, 6, 1))),
+            {self.city_assignment, self.state_assignment},
+            'get_assignments_active() should return assignments active at some time in the period'
+        )
+        self.assertSetEqual(
+            set(get_assignments_active(datetime.date(1866, 1, 1), datetime.date(1866, 12, 31), self.state)),
+            {self.city_assignment, self.state_assignment},
+            'get_assignments_active() should return assignments in the place and places in it'
+        )
+        self.assertSetEqual(
+            set(get_assignments_active(datetime.date(1866, 1, 1), datetime.date(1866, 12, 31), self.city)),
+            {self.city_assignment},
+            "get_assignments_active() shouldn't return assignments in places containing the place"
+        )
+        self.assertFalse(get_assignments_active(datetime.date(1866, 1, 1), place=self.other_state).exists(),
+                         "get_assignments_active() shouldn't return assignments in other places")
+
+    def test_rebuild(self):
+        """
+        The staffing index should be rebuilt when assignments or places change, and not otherwise
+        """
+
+        index = get_staffing_index()
+        self.assertIs(get_staffing_index(), index, 'The staffing index should be kept while nothing changes')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = AssignmentFactory(employee=EmployeeFactory(), start_date=PartialDate('1868-01-01'))
+            assignment.places.add(self.other_state)
+        self.assertIsNot(get_staffing_index(), index, 'The staffing index should be rebuilt when assignments change')
+        self.assertSetEqual(set(get_assignments_active(datetime.date(1868, 1, 1), place=self.other_state)),
+                            {assignment}, 'The staffing index should include new assignments')
+
+        index = get_staffing_index()
+        savannah = CityFactory(name='Savannah', region=self.other_state.region, country=self.other_state.country)
+        with self.captureOnCommitCallbacks(execute=True):
+            PlaceFactory(city=savannah, county=None, region=self.other_state.region)
+        self.assertIsNot(get_staffing_index(), index, 'The staffing index should be rebuilt when places change')
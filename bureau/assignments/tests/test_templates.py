@@ -1,5 +1,6 @@
 from django.template.loader import render_to_string
 from django.test import TestCase
+from django.urls import reverse
 
 from assignments.tests.factories import AssignmentFactory
 from personnel.tests.factories import EmployeeFactory
@@ -33,3 +34,16 @@ class AssignmentListViewTemplateTestCase(TestCase):
         self.assertTrue(str(assignment) in rendered, f'Assignments should be listed in {self.template}')
         self.assertTrue(str(assignment.employee) in rendered,
                         f'Assignment employees should be listed in {self.template}')
+
+
+class AssignmentMapViewTemplateTestCase(TestCase):
+    """
+    Test template of assignments.views.AssignmentMapView
+    """
+
+    def test_template(self):
+        rendered = render_to_string('assignments/assignment_map.html',
+                                    {'map_version': 'abc123', 'min_zoom': 3, 'max_zoom': 12})
+        self.assertIn(reverse('assignments:assignment_map_geojson'), rendered,
+                      'GeoJSON URL should be in assignment map template')
+        self.assertIn('abc123', rendered, 'Data version should be in assignment map template')
@@ -1,13 +1,20 @@
+import json
+
 from unittest.mock import patch
 
+from partial_date import PartialDate
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from assignments.models import Assignment
 from assignments.tests.factories import AssignmentFactory, PositionFactory
 from assignments.views import AssignmentListView, BureauHeadquartersAssignmentListView
 from personnel.tests.factories import EmployeeFactory
 from places.tests.factories import CityFactory, CountyFactory, PlaceFactory, RegionFactory
+from utilities.data_version import get_data_version
 
 
 class AssignmentListViewTestCase(TestCase):
@@ -134,34 +141,27 @@ class AssignmentListViewTestCase(TestCase):
         self.assertNotIn(assignment_in_franklin, queryset,
                          "AssignmentListView.get_queryset() shouldn't return assignment in city if county specified")
 
-    def test_annotate_titles(self):
+    def test_ordering(self):
         """
-        annotate_titles() should annotate the assignments queryset with 'concatenated_titles' containing the titles of
-        all of an assignment's positions
+        Assignments should be ordered by start date, then position titles, without duplicate entries when an
+        assignment has multiple positions
         """
 
         agent_position = PositionFactory(title='Agent')
         clerk_position = PositionFactory(title='Clerk')
         d_o_position = PositionFactory(title='Disbursing Officer')
 
-        agent_and_d_o_assignment = AssignmentFactory()
-        agent_and_d_o_assignment.positions.add(agent_position, d_o_position)
-
-        clerk_assignment = AssignmentFactory()
+        clerk_assignment = AssignmentFactory(start_date=PartialDate('1866'), employee=EmployeeFactory())
         clerk_assignment.positions.add(clerk_position)
+        agent_and_d_o_assignment = AssignmentFactory(start_date=PartialDate('1866'), employee=EmployeeFactory())
+        agent_and_d_o_assignment.positions.add(agent_position, d_o_position)
+        earlier_assignment = AssignmentFactory(start_date=PartialDate('1865'), employee=EmployeeFactory())
+        earlier_assignment.positions.add(d_o_position)
 
-        annotated_assignments = self.view.annotate_titles(Assignment.objects.all())
-
-        # Make sure all the position titles can be found in 'concatenated_titles' that was added as an annotation
-        annotated_agent_and_d_o_assignment = annotated_assignments.get(pk=agent_and_d_o_assignment.pk)
-        self.assertTrue('Agent' in annotated_agent_and_d_o_assignment.concatenated_titles,
-                        "'Agent' should be included in 'concatenated_titles' for assignment")
-        self.assertTrue('Disbursing Officer' in annotated_agent_and_d_o_assignment.concatenated_titles,
-                        "'Disbursing Officer' should be included in 'concatenated_titles' for assignment")
-
-        annotated_clerk_assignment = annotated_assignments.get(pk=clerk_assignment.pk)
-        self.assertTrue('Clerk' in annotated_clerk_assignment.concatenated_titles,
-                        "'Clerk' should be included in 'concatenated_titles' for assignment")
+        self.view.kwargs = {}
+        self.assertListEqual(list(self.view.get_queryset()),
+                             [earlier_assignment, agent_and_d_o_assignment, clerk_assignment],
+                             'AssignmentListView should order assignments by start date, then position titles')
 
 
 class BureauHeadquartersAssignmentListViewTestCase(TestCase):
@@ -188,3 +188,151 @@ class BureauHeadquartersAssignmentListViewTestCase(TestCase):
             other_assignment, queryset,
             "BureauHeadquartersAssignmentListView.get_queryset() shouldn't return non-Bureau Headquarters assignment"
         )
+
+
+class PostSuccessionViewTestCase(TestCase):
+    """
+    Test PostSuccessionView and the successions shown with assignments
+    """
+
+    def setUp(self):
+        self.place = PlaceFactory(city=None, county=None, region=RegionFactory(name='Mississippi'))
+        self.position = PositionFactory(title='Agent')
+        self.assignments = []
+        for employee, start_date in [(EmployeeFactory(last_name='Thomas'), '1865'),
+                                     (EmployeeFactory(last_name='Wood'), '1866')]:
+            with self.captureOnCommitCallbacks(execute=True):
+                assignment = AssignmentFactory(employee=employee, start_date=PartialDate(start_date))
+                assignment.places.add(self.place)
+                assignment.positions.add(self.position)
+            self.assignments.append(assignment)
+
+    def test_get(self):
+        """
+        PostSuccessionView should list who held the post in order, and 404 for a place or position that doesn't exist
+        """
+
+        response = self.client.get(reverse('assignments:post_succession', kwargs={
+            'place': self.place.pk, 'position': self.position.pk}))
+        self.assertListEqual([succession.assignment for succession in response.context['postsuccession_list']],
+                             self.assignments, 'PostSuccessionView should list who held the post in order')
+
+        response = self.client.get(reverse('assignments:post_succession', kwargs={
+            'place': self.place.pk, 'position': self.place.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_assignment_list(self):
+        """
+        Assignment lists should link predecessors and successors without a query per assignment
+        """
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('assignments:assignment_list', kwargs={'place': self.place.pk}))
+        self.assertEqual(len([query for query in queries if 'assignments_postsuccession' in query['sql']]), 1,
+                         'Successions should be prefetched for all assignments in one query')
+        self.assertContains(response, reverse('personnel:employee_detail', kwargs={
+            'pk': self.assignments[1].employee.pk}), count=2)
+
+
+class AssignmentMapGeoJSONViewTestCase(TestCase):
+    """
+    Test AssignmentMapGeoJSONView
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('assignments:assignment_map_geojson')
+        # Vicksburg and Jackson are about 40 miles apart, New Orleans is much farther
+        for name, latitude, longitude, employees in [('Vicksburg', '32.35265', '-90.87788', 2),
+                                                     ('Jackson', '32.29876', '-90.18481', 1),
+                                                     ('New Orleans', '29.95465', '-90.07507', 3)]:
+            place = PlaceFactory(city=CityFactory(name=name, latitude=latitude, longitude=longitude))
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(employees):
+                    AssignmentFactory(employee=EmployeeFactory()).places.add(place)
+
+    def get_features(self, zoom):
+        return json.loads(self.client.get(self.url, {'zoom': zoom}).content)['features']
+
+    def test_clusters(self):
+        """
+        Nearby places should be clustered when zoomed out, and separate when zoomed in
+        """
+        features = self.get_features(3)
+        self.assertEqual(sum(feature['properties']['headcount'] for feature in features), 6)
+        self.assertTrue(any(feature['properties'].get('point_count') for feature in features),
+                        'Nearby places should be clustered when zoomed out')
+
+        features = self.get_features(12)
+        self.assertEqual(len(features), 3, 'Places should be separate when zoomed in')
+        self.assertEqual({feature['properties']['name'].split(',')[0] for feature in features},
+                         {'Vicksburg', 'Jackson', 'New Orleans'})
+
+        self.assertEqual(self.get_features('x'), self.get_features(3), 'Invalid zoom should be the minimum zoom')
+
+    def test_caching(self):
+        """
+        Layer requested with current data version should be cached for good, and revalidated by ETag otherwise
+        """
+        version = get_data_version('assignments')
+        response = self.client.get(self.url, {'zoom': 5, 'v': version})
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.url, {'zoom': 5})
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url, {'zoom': 5}, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         304)
+
+        # Changing assignments should change the data version, and the layer
+        with self.captureOnCommitCallbacks(execute=True):
+            AssignmentFactory(employee=EmployeeFactory()).places.add(PlaceFactory(
+                city=CityFactory(name='Natchez', latitude='31.56044', longitude='-91.40320')))
+        self.assertEqual(self.client.get(self.url, {'zoom': 5}, HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         200)
+        self.assertEqual(sum(feature['properties']['headcount'] for feature in self.get_features(5)), 7)
+
+
+class ActiveAssignmentsViewTestCase(TestCase):
+    """
+    Test ActiveAssignmentsView
+    """
+
+    def setUp(self):
+        cache.clear()
+
+        self.place = PlaceFactory(city=None, county=None, region=RegionFactory(name='Alabama'))
+        self.assignment = AssignmentFactory(employee=EmployeeFactory(last_name='Howard'),
+                                            start_date=PartialDate('1865-05'), end_date=PartialDate('1866'))
+        self.assignment.places.add(self.place)
+        self.other_assignment = AssignmentFactory(employee=EmployeeFactory(last_name='Alvord'),
+                                                  start_date=PartialDate('1865-05'), end_date=PartialDate('1866'))
+        other_place = PlaceFactory(city=None, county=None, region=RegionFactory(name='Georgia'))
+        self.other_assignment.places.add(other_place)
+
+    def test_get(self):
+        """
+        Assignments active on the date in the place (anywhere if not specified) should be listed,
+        and nothing without a valid date
+        """
+
+        response = self.client.get(reverse('assignments:active_assignments'))
+        self.assertEqual(response.status_code, 200)
+        self.assertQuerysetEqual(response.context['assignment_list'], [],
+                                 msg='ActiveAssignmentsView should list no assignments without a date')
+
+        response = self.client.get(reverse('assignments:active_assignments'), {'date': '1865-06-01'})
+        self.assertQuerysetEqual(response.context['assignment_list'], [self.other_assignment, self.assignment],
+                                 msg='ActiveAssignmentsView should list assignments active on the date by name')
+
+        response = self.client.get(reverse('assignments:active_assignments', kwargs={'place': self.place.pk}),
+                                   {'date': '1865-06-01'})
+        self.assertEqual(response.context['place'], self.place)
+        self.assertQuerysetEqual(response.context['assignment_list'], [self.assignment],
+                                 msg='ActiveAssignmentsView should list assignments active on the date in the place')
+
+        response = self.client.get(reverse('assignments:active_assignments'),
+                                   {'date': '1865-04-01', 'end_date': '1865-01-01'})
+        self.assertFalse(response.context['form'].is_valid(),
+                         "ActiveAssignmentsView's form shouldn't be valid with an end date before the date")
+        self.assertQuerysetEqual(response.context['assignment_list'], [],
+                                 msg='ActiveAssignmentsView should list no assignments without a valid date')
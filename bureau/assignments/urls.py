@@ -1,8 +1,12 @@
 from django.urls import path
 
 from bureau.assignments.views import (
+    active_assignments_view,
     assignment_list_view,
+    assignment_map_geojson_view,
+    assignment_map_view,
     bureau_headquarters_assignment_list_view,
+    post_succession_view,
 )
 
 app_name = "assignments"
@@ -11,4 +15,9 @@ urlpatterns = [
     path("place/bureau_headquarters/", view=bureau_headquarters_assignment_list_view,
          name="bureau_headquarters_assignment_list"),
     path("place/<uuid:place>/", view=assignment_list_view, name="assignment_list"),
+    path("post/<uuid:place>/<uuid:position>/", view=post_succession_view, name="post_succession"),
+    path("active/", view=active_assignments_view, name="active_assignments"),
+    path("active/place/<uuid:place>/", view=active_assignments_view, name="active_assignments"),
+    path("map/", view=assignment_map_view, name="assignment_map"),
+    path("map/geojson/", view=assignment_map_geojson_view, name="assignment_map_geojson"),
 ]
@@ -1,15 +1,25 @@
-from django.contrib.postgres.aggregates import StringAgg
-from django.views.generic import ListView
-
-from assignments.models import Assignment
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.generic import ListView, TemplateView, View
+
+from assignments.forms import ActiveAssignmentsForm
+from assignments.map import get_assignment_map_layer, get_map_zoom, MAX_ZOOM, MIN_ZOOM
+from assignments.models import Assignment, Position, PostSuccession
+from assignments.staffing import get_assignments_active
+from places.models import Place
 from places.utils import get_place_or_none
+from utilities.data_version import get_data_version
 
 
 class AssignmentListView(ListView):
 
     model = Assignment
     queryset = Assignment.objects.all()
-    ordering = ['start_date', 'concatenated_titles', 'employee__last_name', 'employee__first_name']
+    ordering = ['start_date_key', 'position_titles', 'employee__last_name', 'employee__first_name']
     template_name = "assignments/assignment_list.html"
 
     def get_place(self):
@@ -32,16 +42,17 @@ class AssignmentListView(ListView):
         else:
             queryset = self.queryset
 
-        # Annotate to order by position titles without duplicate entries when assignment has multiple positions
-        return self.annotate_titles(queryset).order_by(*self.ordering)
+        return self.prefetch_successions(queryset.order_by(*self.ordering), place)
 
-    def annotate_titles(self, queryset):
+    def prefetch_successions(self, queryset, place=None):
         """
-        Annotate to order by position titles without duplicate entries when assignment has multiple positions
+        Prefetch the predecessors and successors of assignments in their posts (in place only, if given)
         """
-
-        # StringAgg is Postgres-only
-        return queryset.annotate(concatenated_titles=StringAgg('positions__title', delimiter='', default=None))
+        successions = PostSuccession.objects.select_related(
+            'place', 'position', 'predecessor__employee', 'successor__employee').order_by('position__title')
+        if place:
+            successions = successions.filter(place=place)
+        return queryset.prefetch_related(Prefetch('successions', queryset=successions))
 
 
 assignment_list_view = AssignmentListView.as_view()
@@ -51,8 +62,109 @@ class BureauHeadquartersAssignmentListView(AssignmentListView):
 
     def get_queryset(self):
         # Return Bureau Headquarters assignments only
-        # Annotate to order by position titles without duplicate entries when assignment has multiple positions
-        return self.annotate_titles(Assignment.objects.filter(bureau_headquarters=True)).order_by(*self.ordering)
+        return self.prefetch_successions(Assignment.objects.filter(bureau_headquarters=True).order_by(*self.ordering))
 
 
 bureau_headquarters_assignment_list_view = BureauHeadquartersAssignmentListView.as_view()
+
+
+class PostSuccessionView(ListView):
+    """
+    List who held a post (a position in a place) in order, with gaps and overlaps between them
+    """
+
+    model = PostSuccession
+    template_name = "assignments/post_succession.html"
+    place = None
+    position = None
+
+    def get_queryset(self):
+        self.place = get_object_or_404(Place, pk=self.kwargs['place'])
+        self.position = get_object_or_404(Position, pk=self.kwargs['position'])
+
+        return PostSuccession.objects.filter(place=self.place, position=self.position).select_related(
+            'assignment__employee').order_by('sequence')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['place'] = self.place
+        context['position'] = self.position
+        return context
+
+
+post_succession_view = PostSuccessionView.as_view()
+
+
+class ActiveAssignmentsView(ListView):
+    """
+    List assignments that were active on a date, or at some time in a period, in a place (anywhere if not specified)
+    and the places in it
+    """
+
+    model = Assignment
+    paginate_by = 25
+    template_name = "assignments/active_assignments.html"
+
+    def get_place(self):
+        # If place is in kwargs, try to return the Place
+        place_pk = self.kwargs.get('place')
+        return get_place_or_none(place_pk) if place_pk else None
+
+    def get_form(self):
+        return ActiveAssignmentsForm(self.request.GET or None)
+
+    def get_queryset(self):
+        form = self.get_form()
+        if not form.is_valid():
+            return Assignment.objects.none()
+
+        return get_assignments_active(form.cleaned_data['date'], form.cleaned_data['end_date'],
+                                      self.get_place()).select_related('employee').prefetch_related(
+            'positions', 'places').order_by('employee__last_name', 'employee__first_name', 'start_date_key')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = self.get_form()
+        context['place'] = self.get_place()
+        return context
+
+
+active_assignments_view = ActiveAssignmentsView.as_view()
+
+
+class AssignmentMapView(TemplateView):
+    template_name = "assignments/assignment_map.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['map_version'] = get_data_version('assignments')
+        context['min_zoom'] = MIN_ZOOM
+        context['max_zoom'] = MAX_ZOOM
+        return context
+
+
+assignment_map_view = AssignmentMapView.as_view()
+
+
+def get_assignment_map_etag(request, *args, **kwargs):
+    return f'{get_data_version("assignments")}-{get_map_zoom(request.GET.get("zoom"))}'
+
+
+@method_decorator(condition(etag_func=get_assignment_map_etag), name='get')
+class AssignmentMapGeoJSONView(View):
+    """
+    Clustered GeoJSON layer of assignment headcounts for a zoom level. Requested with the current data version (v),
+    it can be cached for good, because a new version means a new URL
+    """
+
+    def get(self, request, *args, **kwargs):
+        layer, version = get_assignment_map_layer(request.GET.get('zoom'))
+        response = HttpResponse(layer, content_type='application/geo+json')
+        if request.GET.get('v') == version:
+            patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+        return response
+
+
+assignment_map_geojson_view = AssignmentMapGeoJSONView.as_view()
@@ -0,0 +1,134 @@
+import csv
+import json
+
+from django.db import transaction
+
+from military.models import Regiment
+from personnel.models import Employee
+from places.importer import batched
+from places.models import Region
+
+# Fields of imported regiments that aren't part of what identifies them, so they're updated if changed
+UPDATE_FIELDS = ['us', 'usct', 'vrc', 'confederate', 'notes']
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+
+
+def read_regiment_file(path):
+    """
+    Yield a dict for each regiment in a CSV file with a header row, or a JSON lines file (ending in .jsonl)
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.jsonl'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def get_boolean(value):
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_VALUES
+    return bool(value)
+
+
+def get_branch(value):
+    """
+    Return the Regiment.Branch for a code ("CAV") or label ("Cavalry"), infantry if it's empty
+    """
+    value = (value or '').strip().lower()
+    for branch in Regiment.Branch:
+        if value in (branch.value.lower(), branch.label.lower()):
+            return branch
+    if value:
+        raise ValueError(f'Unknown branch: {value}')
+    return Regiment.Branch.INFANTRY
+
+
+def get_regiment_key(regiment):
+    """
+    Return what identifies a regiment when importing: (state, branch, number, name)
+    """
+    return regiment.state_id, regiment.branch, regiment.number, regiment.name
+
+
+def get_regiment(row, state_id):
+    """
+    Return an unsaved Regiment for a row of a regiment file, or raise ValueError if it isn't valid
+    """
+    number = row.get('number')
+    name = (row.get('name') or '').strip()
+    if len(name) > Regiment._meta.get_field('name').max_length:
+        raise ValueError(f'Name too long: {name}')
+
+    return Regiment(
+        number=int(number) if number not in (None, '') else None,
+        branch=get_branch(row.get('branch')),
+        name=name,
+        notes=row.get('notes') or '',
+        state_id=state_id,
+        us=get_boolean(row.get('us')),
+        usct=get_boolean(row.get('usct')),
+        vrc=get_boolean(row.get('vrc')),
+        confederate=get_boolean(row.get('confederate')),
+    )
+
+
+def import_regiments(path):
+    """
+    Import regiments from a file (see read_regiment_file()) in batches, resolving states by name from US regions.
+    Regiments are matched to existing ones by (state, branch, number, name), so only new or changed ones are written.
+    Each batch is written along with what's computed from it, so a batch that fails leaves nothing half imported.
+    Return the numbers of rows read, regiments created and updated, the state names that couldn't be resolved,
+    and a list of (row number, error) for rows that weren't valid
+    """
+    states = {name.lower(): pk for pk, name in Region.objects.filter(country__code2='US').values_list('pk', 'name')}
+    existing = {get_regiment_key(regiment): regiment for regiment in Regiment.objects.order_by()}
+
+    rows = 0
+    created_ids = []
+    updated_ids = []
+    unknown_states = set()
+    errors = []
+    for batch in batched(read_regiment_file(path)):
+        created = {}
+        updated = {}
+        for row in batch:
+            rows += 1
+            state_name = (row.get('state') or '').strip()
+            if state_name and state_name.lower() not in states:
+                unknown_states.add(state_name)
+                continue
+
+            try:
+                regiment = get_regiment(row, states.get(state_name.lower()))
+            except ValueError as error:
+                errors.append((rows, str(error)))
+                continue
+            current = existing.setdefault(get_regiment_key(regiment), regiment)
+            if current is regiment:
+                created[regiment.pk] = regiment
+            elif any(getattr(current, field) != getattr(regiment, field) for field in UPDATE_FIELDS):
+                for field in UPDATE_FIELDS:
+                    setattr(current, field, getattr(regiment, field))
+                # A regiment repeated in the same batch is only written once
+                if current.pk not in created:
+                    updated[current.pk] = current
+
+        with transaction.atomic():
+            Regiment.objects.bulk_create(created.values())
+            Regiment.objects.bulk_update(updated.values(), UPDATE_FIELDS)
+            update_imported_regiments(updated)
+        created_ids.extend(created)
+        updated_ids.extend(updated)
+
+    return rows, len(created_ids), len(set(updated_ids)), unknown_states, errors
+
+
+def update_imported_regiments(updated_ids):
+    """
+    Bulk upserts don't send signals, so update the VRC and USCT flags of members of updated regiments
+    """
+    if updated_ids:
+        Employee.objects.update_regiment_flags(regiments__in=set(updated_ids))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from military.importer import import_regiments
+
+
+class Command(BaseCommand):
+    help = ("Imports regiments in bulk from a CSV or JSON lines (.jsonl) file with fields name, number, branch, "
+            "state, us, usct, vrc, confederate and notes, creating new regiments and updating changed ones")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON lines file of regiments')
+
+    def handle(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            rows, created, updated, unknown_states, errors = import_regiments(kwargs['path'])
+        except (OSError, ValueError) as error:
+            raise CommandError(error) from error
+        seconds = time.monotonic() - start
+
+        self.stdout.write(f'{created} regiments created and {updated} updated from {rows} rows in {seconds:.1f}s')
+        if unknown_states:
+            self.stderr.write(f'Rows skipped for unknown states: {", ".join(sorted(unknown_states))}')
+        for row, error in errors:
+            self.stderr.write(f'Row {row} skipped: {error}')
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:37
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('military', '0007_auto_20210120_0249'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='regiment',
+            index=models.Index(fields=['number', 'branch'], name='regiment_number_branch'),
+        ),
+        migrations.AddIndex(
+            model_name='regiment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='regiment_name_trigram', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 from places.models import Region
@@ -35,6 +36,11 @@ class Regiment(models.Model):
 
     class Meta:
         ordering = ['state', 'vrc', 'us', 'usct', 'number', 'name']
+        indexes = [
+            models.Index(fields=['number', 'branch'], name='regiment_number_branch'),
+            # For finding regiments with names similar to a search (see military.search)
+            GinIndex(fields=['name'], name='regiment_name_trigram', opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,121 @@
+import re
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db.models import Case, FloatField, Q, Value, When
+
+from military.models import Regiment
+from places.models import Region
+
+# Words in regiment searches for a branch, like "5th Mass Cav"
+BRANCH_WORDS = {
+    'inf': Regiment.Branch.INFANTRY,
+    'infantry': Regiment.Branch.INFANTRY,
+    'cav': Regiment.Branch.CAVALRY,
+    'cavalry': Regiment.Branch.CAVALRY,
+    'art': Regiment.Branch.ARTILLERY,
+    'arty': Regiment.Branch.ARTILLERY,
+    'artillery': Regiment.Branch.ARTILLERY,
+    'eng': Regiment.Branch.ENGINEERS,
+    'engineer': Regiment.Branch.ENGINEERS,
+    'engineers': Regiment.Branch.ENGINEERS,
+    'ss': Regiment.Branch.SHARPSHOOTERS,
+    'sharpshooter': Regiment.Branch.SHARPSHOOTERS,
+    'sharpshooters': Regiment.Branch.SHARPSHOOTERS,
+}
+
+# Words in regiment searches for a kind of regiment
+FLAG_WORDS = {
+    'vrc': 'vrc',
+    'usct': 'usct',
+    'colored': 'usct',
+    'confederate': 'confederate',
+    'csa': 'confederate',
+}
+
+# Words in regiment searches that don't say which regiment
+FILLER_WORDS = {'regiment', 'regt', 'reg', 'vol', 'vols', 'volunteer', 'volunteers', 'of', 'the'}
+
+# Longest state name in words, like "District of Columbia"
+MAX_STATE_WORDS = 3
+
+NUMBER_PATTERN = re.compile(r'^(\d+)(st|nd|rd|th|d)?$')
+
+# Abbreviations of states must be at least this long, so "in" isn't Indiana
+MIN_STATE_PREFIX = 3
+
+
+def get_search_words(search_text):
+    """
+    Return the lowercase words of a search, with periods removed so "N.Y." is "ny"
+    """
+    return re.findall(r'[a-z0-9]+', search_text.lower().replace('.', ''))
+
+
+def match_state(words, states):
+    """
+    Return the pk of the state words stand for, by name, postal code, or abbreviation if only one state's name
+    starts with it, or None. states is a list of (pk, name, code)
+    """
+    text = ' '.join(words)
+    for pk, name, code in states:
+        if text in (name.lower(), (code or '').lower()):
+            return pk
+
+    if len(words) == 1 and len(text) >= MIN_STATE_PREFIX:
+        prefixed = [pk for pk, name, _ in states if name.lower().startswith(text)]
+        if len(prefixed) == 1:
+            return prefixed[0]
+
+    return None
+
+
+def parse_regiment_search(search_text, states):
+    """
+    Return a dict of Regiment fields a search stands for: number (from "5" or "5th"), branch, state
+    (from the list of (pk, name, code) states), and vrc, usct or confederate, for the words it recognizes
+    """
+    fields = {}
+    words = [word for word in get_search_words(search_text) if word not in FILLER_WORDS]
+
+    index = 0
+    while index < len(words):
+        word = words[index]
+        number = NUMBER_PATTERN.match(word)
+        if number and 'number' not in fields:
+            fields['number'] = int(number.group(1))
+        elif word in BRANCH_WORDS and 'branch' not in fields:
+            fields['branch'] = BRANCH_WORDS[word]
+        elif word in FLAG_WORDS:
+            fields[FLAG_WORDS[word]] = True
+        elif 'state' not in fields:
+            # Match the longest run of words that's a state, so "new york" isn't "new"
+            for length in range(min(MAX_STATE_WORDS, len(words) - index), 0, -1):
+                state = match_state(words[index:index + length], states)
+                if state:
+                    fields['state'] = state
+                    index += length - 1
+                    break
+        index += 1
+
+    return fields
+
+
+def search_regiments(queryset, search_text):
+    """
+    Return regiments in queryset matching a search, ranked by how many of the fields parsed from it they have
+    (see parse_regiment_search()), then by pg_trgm's word similarity of the search to their name.
+    A regiment matches if it has all the parsed fields, or its name contains the search or is similar to it
+    (by pg_trgm.word_similarity_threshold), found with the trigram index of names
+    """
+    states = list(Region.objects.filter(regiment__isnull=False).distinct().values_list('pk', 'name', 'geoname_code'))
+    fields = parse_regiment_search(search_text, states)
+
+    matches = Q(name__icontains=search_text) | Q(name__trigram_word_similar=search_text)
+    rank = TrigramWordSimilarity(search_text, 'name')
+
+    if fields:
+        matches |= Q(**fields)
+        for field, value in fields.items():
+            rank += Case(When(Q(**{field: value}), then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+    return queryset.filter(matches).annotate(rank=rank).order_by('-rank', 'number', 'name')
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+
+from django.test import TestCase
+
+from military.importer import import_regiments
+from military.models import Regiment
+from military.search import search_regiments
+from personnel.tests.factories import EmployeeFactory
+from places.tests.factories import CountryFactory, RegionFactory
+
+REGIMENTS = [
+    {'name': '5th Massachusetts Cavalry', 'number': '5', 'branch': 'Cavalry', 'state': 'Massachusetts',
+     'usct': 'true'},
+    {'name': '54th Massachusetts Infantry', 'number': '54', 'branch': '', 'state': 'massachusetts', 'usct': 'yes'},
+    {'name': '7th Regiment, Veteran Reserve Corps', 'number': '7', 'branch': 'INF', 'state': '', 'vrc': '1'},
+    {'name': '1st Ruritania Infantry', 'number': '1', 'branch': 'Infantry', 'state': 'Ruritania'},
+]
+
+
+class ImportRegimentsTestCase(TestCase):
+    """
+    Test bulk import of regiments
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+        self.massachusetts = RegionFactory(name='Massachusetts', country=CountryFactory(code2='US'))
+
+    def write_file(self, name, regiments):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            if name.endswith('.jsonl'):
+                file.writelines(json.dumps(regiment) + '\n' for regiment in regiments)
+            else:
+                fields = ['name', 'number', 'branch', 'state', 'us', 'usct', 'vrc', 'confederate', 'notes']
+                file.write(','.join(fields) + '\n')
+                file.writelines(','.join(f'"{regiment.get(field, "")}"' for field in fields) + '\n'
+                                for regiment in regiments)
+        return path
+
+    def test_import(self):
+        """
+        Regiments should be imported with states resolved by name, skipping those with unknown states
+        """
+        for name in ['regiments.csv', 'regiments.jsonl']:
+            Regiment.objects.all().delete()
+            self.assertEqual(import_regiments(self.write_file(name, REGIMENTS)), (4, 3, 0, {'Ruritania'}, []))
+
+            cavalry = Regiment.objects.get(number=5)
+            self.assertTupleEqual((cavalry.branch, cavalry.state, cavalry.usct, cavalry.vrc),
+                                  (Regiment.Branch.CAVALRY, self.massachusetts, True, False))
+            self.assertEqual(Regiment.objects.get(number=54).branch, Regiment.Branch.INFANTRY)
+            self.assertTrue(Regiment.objects.get(number=7, state=None).vrc)
+            self.assertIn(cavalry, search_regiments(Regiment.objects.all(), 'Massachusets'),
+                          'Imported regiments should be found by names similar to a search')
+
+    def test_reimport(self):
+        """
+        Importing again should only write changed regiments, matched by state, branch, number and name
+        """
+        import_regiments(self.write_file('regiments.jsonl', REGIMENTS))
+        employee = EmployeeFactory()
+        employee.regiments.add(Regiment.objects.get(number=5))
+
+        changed = [{**REGIMENTS[0], 'usct': 'false', 'notes': 'Not USCT after all'}] + REGIMENTS[1:] + [
+            {**REGIMENTS[0], 'usct': 'false', 'notes': 'Not USCT after all'}]
+        with self.assertNumQueries(6):
+            self.assertEqual(import_regiments(self.write_file('regiments.jsonl', changed)),
+                             (5, 0, 1, {'Ruritania'}, []))
+
+        self.assertEqual(Regiment.objects.count(), 3, 'Existing regiments should be matched, not duplicated')
+        self.assertEqual(Regiment.objects.get(number=5).notes, 'Not USCT after all')
+        employee.refresh_from_db()
+        self.assertFalse(employee.usct, "Members of a regiment that's no longer USCT should have 'usct' unset")
+
+    def test_invalid_rows(self):
+        """
+        Rows that aren't valid should be reported with their row numbers and skipped, importing the others
+        """
+        invalid = [{**REGIMENTS[0], 'branch': 'Navy'}, {**REGIMENTS[1], 'number': 'LIV'}]
+        rows, created, _, _, errors = import_regiments(self.write_file('regiments.jsonl', invalid + REGIMENTS[2:]))
+
+        self.assertTupleEqual((rows, created), (4, 1))
+        self.assertListEqual([row for row, _ in errors], [1, 2], 'Invalid rows should be reported by row number')
+        self.assertIn('Unknown branch', errors[0][1])
+        self.assertTrue(Regiment.objects.filter(number=7, vrc=True).exists(), 'Valid rows should be imported')
@@ -0,0 +1,56 @@
+from django.test import TestCase
+
+from military.models import Regiment
+from military.search import parse_regiment_search, search_regiments
+from military.tests.factories import RegimentFactory
+from places.tests.factories import RegionFactory
+
+
+class ParseRegimentSearchTestCase(TestCase):
+    """
+    Test parse_regiment_search()
+    """
+
+    states = [(1, 'Massachusetts', 'MA'), (2, 'New York', 'NY'), (3, 'New Jersey', 'NJ'), (4, 'Mississippi', 'MS'),
+              (5, 'Missouri', 'MO')]
+
+    def test_parse_regiment_search(self):
+        for search_text, fields in [
+            ('5th Mass Cav', {'number': 5, 'state': 1, 'branch': Regiment.Branch.CAVALRY}),
+            ('5 MA cavalry', {'number': 5, 'state': 1, 'branch': Regiment.Branch.CAVALRY}),
+            ('14th N.Y. Heavy Artillery', {'number': 14, 'state': 2, 'branch': Regiment.Branch.ARTILLERY}),
+            ('New Jersey Volunteers', {'state': 3}),
+            ('2nd Regiment VRC', {'number': 2, 'vrc': True}),
+            ('Miss Infantry', {'branch': Regiment.Branch.INFANTRY}),
+            ('Veteran Reserve Corps', {}),
+        ]:
+            self.assertDictEqual(parse_regiment_search(search_text, self.states), fields,
+                                 f'parse_regiment_search() should parse the number, state and branch of {search_text}')
+
+
+class SearchRegimentsTestCase(TestCase):
+    """
+    Test search_regiments()
+    """
+
+    def setUp(self):
+        massachusetts = RegionFactory(name='Massachusetts', geoname_code='MA')
+        self.mass_5th_cavalry = RegimentFactory(name='5th Massachusetts Cavalry', number=5,
+                                                branch=Regiment.Branch.CAVALRY, state=massachusetts)
+        self.mass_5th_infantry = RegimentFactory(name='5th Massachusetts Infantry', number=5, state=massachusetts)
+        self.maine_5th_cavalry = RegimentFactory(name='5th Maine Cavalry', number=5, branch=Regiment.Branch.CAVALRY,
+                                                 state=RegionFactory(name='Maine', geoname_code='ME'))
+        self.vrc_7th = RegimentFactory(name='7th Regiment, Veteran Reserve Corps', number=7, vrc=True)
+
+    def test_search_regiments(self):
+        for search_text in ['5th Mass Cav', '5 MA cavalry', '5th Massachusetts Cavalry']:
+            regiments = list(search_regiments(Regiment.objects.all(), search_text))
+            self.assertEqual(regiments[0], self.mass_5th_cavalry,
+                             f'search_regiments() should rank the regiment best matching {search_text} first')
+            self.assertNotIn(self.vrc_7th, regiments,
+                             f"search_regiments() shouldn't return regiments not matching {search_text}")
+
+        self.assertListEqual(list(search_regiments(Regiment.objects.all(), 'Veteren Reserve')), [self.vrc_7th],
+                             'search_regiments() should find regiments with names similar to the search')
+        self.assertListEqual(list(search_regiments(Regiment.objects.filter(vrc=False), 'Reserve')), [],
+                             'search_regiments() should only search the queryset')
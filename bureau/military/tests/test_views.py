@@ -5,9 +5,35 @@ from military.models import Regiment
 from military.tests.factories import RegimentFactory
 from military.views import ConfederateRegimentListView, RegimentListView, RegularArmyRegimentListView, \
     StateRegimentListView, USCTRegimentListView, VRCRegimentListView
+from personnel.tests.factories import EmployeeFactory
 from places.tests.factories import RegionFactory
 
 
+class RegimentDetailViewTestCase(TestCase):
+    """
+    Test RegimentDetailView
+    """
+
+    def test_roster(self):
+        """
+        Members should be listed by name a page at a time, with the regiment's statistics
+        """
+
+        regiment = RegimentFactory(name='9th Regiment, Veteran Reserve Corps', vrc=True)
+        for number in range(30):
+            EmployeeFactory(last_name=f'Member {number:02}').regiments.add(regiment)
+
+        url = reverse('military:regiment_detail', kwargs={'pk': regiment.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.context['stats']['employees'], 30)
+        self.assertListEqual([employee.last_name for employee in response.context['employees']],
+                             [f'Member {number:02}' for number in range(25)],
+                             'RegimentDetailView should list the first page of members by name')
+
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(len(response.context['employees']), 5, 'RegimentDetailView should paginate members')
+
+
 class RegimentListViewTestCase(TestCase):
     """
     Test RegimentListView
@@ -49,6 +75,19 @@ class RegimentListViewTestCase(TestCase):
         self.assertEqual(response.context['search_text'], '',
                          "If 'search_text' wasn't supplied, it should be empty in context of RegimentListView")
 
+    def test_employee_count(self):
+        """
+        Regiments should be annotated with their number of members
+        """
+
+        for _ in range(2):
+            EmployeeFactory().regiments.add(self.vrc_7th_regt)
+
+        response = self.client.get(reverse('military:vrc_regiment_list'))
+        self.assertDictEqual({regiment.pk: regiment.employee_count for regiment in response.context['regiment_list']},
+                             {self.vrc_7th_regt.pk: 2, self.vrc_24th_regt.pk: 0},
+                             'Regiments should be annotated with their number of members')
+
     def test_get_queryset(self):
         """
         If GET parameter 'search_text' is supplied, get_queryset() should filter the default queryset (all Regiments)
@@ -1,11 +1,33 @@
+from django.core.paginator import Paginator
+from django.db.models import OuterRef
 from django.views.generic import DetailView, ListView
 
 from military.models import Regiment
+from military.search import search_regiments
+from personnel.models import Employee
+from stats.utils import get_count_subquery, get_regiment_stats
 
 
 class RegimentDetailView(DetailView):
 
     model = Regiment
+    # Number of members per page of the roster
+    paginate_by = 25
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        stats = get_regiment_stats(self.object)
+        context['stats'] = stats
+
+        # The paginator already knows the number of members from the stats
+        paginator = Paginator(self.object.employees.order_by('last_name', 'first_name'), self.paginate_by)
+        paginator.count = stats['employees']
+        page = paginator.get_page(self.request.GET.get('page'))
+        context.update({'paginator': paginator, 'page_obj': page, 'is_paginated': page.has_other_pages(),
+                        'employees': page.object_list})
+
+        return context
 
 
 regiment_detail_view = RegimentDetailView.as_view()
@@ -28,11 +50,15 @@ class RegimentListView(ListView):
         return context
 
     def get_queryset(self):
+        # Count members in the same query as the regiments, with a subquery so they keep their default ordering
+        queryset = self.queryset.annotate(employee_count=get_count_subquery(
+            Employee.regiments.through.objects.filter(regiment=OuterRef('pk')), 'regiment', 'employee'))
+
         search_text = self.request.GET.get('search_text')
         if search_text:
-            return self.queryset.filter(name__icontains=search_text)
+            return search_regiments(queryset, search_text)
 
-        return self.queryset
+        return queryset
 
 
 regiment_list_view = RegimentListView.as_view()
@@ -1,9 +1,13 @@
 import string
 
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db.models import Exists, OuterRef
+from django.template.response import TemplateResponse
 
-from assignments.models import Assignment
+from assignments.models import Assignment, EmploymentYear
 
+from .forms import EmployeeBulkChangeForm
 from .models import Employee
 
 
@@ -50,16 +54,16 @@ class EmploymentYearListFilter(admin.SimpleListFilter):
     parameter_name = 'employment_year'
 
     def lookups(self, request, model_admin):
-        if Assignment.objects.exists():
-            min_year = Assignment.objects.filter(
-                    start_date__isnull=False).order_by('start_date').first().start_date.date.year
-            max_year = Assignment.objects.filter(end_date__isnull=False).order_by('end_date').last().end_date.date.year
-            return [(year, year) for year in range(min_year, max_year + 1)]
+        # Years from the earliest anyone was employed to the latest
+        year_range = EmploymentYear.objects.get_year_range()
+        if year_range:
+            return [(year, year) for year in range(year_range[0], year_range[1] + 1)]
         return []
 
     def queryset(self, request, queryset):
         if self.value():
-            return queryset.filter(pk__in=Employee.objects.employed_during_year(int(self.value())).values('pk'))
+            employment_years = EmploymentYear.objects.filter(year=int(self.value()), employee=OuterRef('pk'))
+            return queryset.filter(Exists(employment_years))
         return queryset
 
 
@@ -86,15 +90,15 @@ class USCTListFilter(admin.SimpleListFilter):
     def queryset(self, request, queryset):
         if self.value():
             if self.value() == 'Yes':
-                return queryset.filter(regiments__usct__exact=True).distinct()
+                return queryset.filter(usct=True)
             if self.value() == 'No':
-                return queryset.filter(regiments__usct__exact=False).distinct()
+                return queryset.filter(usct=False)
         return queryset
 
 
 class AssignmentInline(admin.TabularInline):
     model = Assignment
-    ordering = ('start_date',)
+    ordering = ('start_date_key', 'end_date_key')
     extra = 0
     raw_id_fields = ('places',)
 
@@ -111,13 +115,56 @@ class EmployeeAdmin(admin.ModelAdmin):
     inlines = [AssignmentInline, ]
     list_per_page = 75
     save_on_top = True
-
-    def save_model(self, request, obj, form, change):
-        # Make sure someone who's a member of a VRC regiment has VRC set to true
-        if form.cleaned_data['regiments'].filter(vrc=True):
-            obj.vrc = True
-
-        super().save_model(request, obj, form, change)
+    list_select_related = ('place_of_birth', )
+    actions = ['bulk_change', 'clear_needs_backfilling']
+
+    def get_queryset(self, request):
+        # Prefetch the states bureau_state() shows, so the changelist doesn't need a query for each row
+        return super().get_queryset(request).prefetch_related('bureau_states')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Regiments left unchanged don't send m2m_changed, so make sure someone who's a member of a VRC regiment
+        # has VRC set to true even if it was unchecked
+        Employee.objects.update_regiment_flags(pk=form.instance.pk)
+
+    @admin.action(description='Change flags, states, ailments or regiments of selected employees')
+    def bulk_change(self, request, queryset):
+        """
+        Show a form of changes to make to all selected employees, and make them in one transaction when it's applied
+        """
+        form = EmployeeBulkChangeForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            if form.has_changes():
+                employee_ids = list(queryset.values_list('pk', flat=True))
+                Employee.objects.bulk_change(employee_ids, flags=form.get_flags(), add=form.get_related('add'),
+                                             remove=form.get_related('remove'))
+                self.message_user(request, f'Changed {len(employee_ids)} employees.', messages.SUCCESS)
+            else:
+                self.message_user(request, 'No changes were chosen.', messages.WARNING)
+            return None
+
+        # Post the selection back as the changelist did, with its filters in the URL, rather than every employee's pk,
+        # so selecting all of thousands of employees stays under DATA_UPLOAD_MAX_NUMBER_FIELDS
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Change selected employees',
+            'opts': self.model._meta,
+            'form': form,
+            'form_url': request.get_full_path(),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'employee_count': queryset.count(),
+            'action': 'bulk_change',
+        }
+        return TemplateResponse(request, 'admin/personnel/employee/bulk_change.html', context)
+
+    @admin.action(description='Mark selected employees as not needing backfilling')
+    def clear_needs_backfilling(self, request, queryset):
+        # Only employees that need backfilling are changed, so they're the ones counted
+        count = Employee.objects.bulk_change(queryset.filter(needs_backfilling=True).values_list('pk', flat=True),
+                                             flags={'needs_backfilling': False})
+        self.message_user(request, f'Marked {count} employees as not needing backfilling.', messages.SUCCESS)
 
     def bureau_state(self, obj):
         return obj.bureau_state_list()
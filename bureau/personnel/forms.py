@@ -0,0 +1,48 @@
+from django import forms
+
+from medical.models import Ailment
+from military.models import Regiment
+from places.models import Region
+
+# Flags of employees that can be set for many of them at once
+BULK_FLAGS = ['needs_backfilling', 'vrc', 'colored', 'former_slave', 'union_veteran', 'confederate_veteran',
+              'slaveholder', 'died_during_assignment', 'penmanship_contest']
+
+# Many-to-many relations of employees that can be added to or removed from many of them at once,
+# with the related objects that can be chosen
+BULK_RELATIONS = [
+    ('bureau_states', Region.objects.bureau_state()),
+    ('ailments', Ailment.objects.all()),
+    ('regiments', Regiment.objects.all()),
+]
+
+FLAG_CHOICES = [('', 'Leave unchanged'), ('yes', 'Yes'), ('no', 'No')]
+
+
+class EmployeeBulkChangeForm(forms.Form):
+    """
+    Intermediate admin form for changing the flags and related objects of selected employees at once
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for flag in BULK_FLAGS:
+            self.fields[flag] = forms.TypedChoiceField(choices=FLAG_CHOICES, required=False,
+                                                       coerce=lambda value: value == 'yes', empty_value=None)
+        for relation, queryset in BULK_RELATIONS:
+            for change in ('add', 'remove'):
+                self.fields[f'{change}_{relation}'] = forms.ModelMultipleChoiceField(
+                    queryset=queryset, required=False, label=f'{change} {relation.replace("_", " ")}'.capitalize())
+
+    def get_flags(self):
+        return {flag: self.cleaned_data[flag] for flag in BULK_FLAGS if self.cleaned_data[flag] is not None}
+
+    def get_related(self, change):
+        """
+        Return a dict of relation name to the objects to add or remove (change)
+        """
+        return {relation: list(self.cleaned_data[f'{change}_{relation}']) for relation, _ in BULK_RELATIONS
+                if self.cleaned_data[f'{change}_{relation}']}
+
+    def has_changes(self):
+        return bool(self.get_flags() or self.get_related('add') or self.get_related('remove'))
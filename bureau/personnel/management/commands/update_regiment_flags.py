@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from personnel.models import Employee
+
+
+class Command(BaseCommand):
+    help = "Sets the 'vrc' and 'usct' flags of all Employees from their regiments, ex. after a bulk import"
+
+    def handle(self, *args, **kwargs):
+        count = Employee.objects.update_regiment_flags()
+        self.stdout.write(f'{count} employees updated')
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:24
+
+from django.db import migrations
+from django.db.models import Q
+
+import utilities.fields
+from utilities.dates import get_partial_date_key
+
+
+def set_employee_date_keys(apps, schema_editor):
+    """
+    Fill the sortable keys of existing employees' partial dates (see PartialDateKeyField)
+    """
+    Employee = apps.get_model('personnel', 'Employee')
+
+    employees = list(Employee.objects.filter(Q(date_of_birth__isnull=False) | Q(date_of_death__isnull=False)).only(
+        'date_of_birth', 'date_of_death'))
+    for employee in employees:
+        employee.date_of_birth_key = get_partial_date_key(employee.date_of_birth)
+        employee.date_of_death_key = get_partial_date_key(employee.date_of_death)
+    Employee.objects.bulk_update(employees, ['date_of_birth_key', 'date_of_death_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personnel', '0014_alter_employee_bureau_states'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='date_of_birth_key',
+            field=utilities.fields.PartialDateKeyField(source='date_of_birth'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='date_of_death_key',
+            field=utilities.fields.PartialDateKeyField(source='date_of_death'),
+        ),
+        migrations.RunPython(set_employee_date_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.6 on 2026-10-19 09:32
+
+from django.db import migrations, models
+from django.db.models import Case, Exists, F, OuterRef, Value, When
+
+
+def set_regiment_flags(apps, schema_editor):
+    """
+    Set the vrc and usct flags of existing employees from their regiments (see EmployeeManager.update_regiment_flags())
+    """
+    Employee = apps.get_model('personnel', 'Employee')
+
+    regiments = Employee.regiments.through.objects.filter(employee=OuterRef('pk'))
+    Employee.objects.update(
+        vrc=Case(When(Exists(regiments.filter(regiment__vrc=True)), then=Value(True)), default=F('vrc')),
+        usct=Exists(regiments.filter(regiment__usct=True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personnel', '0015_partial_date_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='usct',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(set_regiment_flags, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,23 @@ import uuid
 
 from partial_date import PartialDateField
 
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Value, When
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 
 from medical.models import Ailment
 from military.models import Regiment
-from places.models import Place, Region
-from places.settings import GERMANY_COUNTRY_NAME, GERMANY_COUNTRY_NAMES, VIRGINIA_REGION_NAME, VIRGINIA_REGION_NAMES
+from places.models import Place, PlaceHierarchy, Region
+from utilities.data_version import bump_data_version
+from utilities.fields import get_partial_date_key_update_fields, PartialDateKeyField
+
+
+# Roles employees can have for a place: (role, place field, PlaceGroup context)
+PLACE_ROLES = (
+    ('born', 'place_of_birth', 'birth'),
+    ('died', 'place_of_death', 'death'),
+    ('resided', 'place_of_residence', 'residence'),
+)
 
 
 class EmployeeManager(models.Manager):
@@ -22,7 +32,7 @@ class EmployeeManager(models.Manager):
     def born_in_place(self, place, **kwargs):
         """
         Return employees who were born in a particular place,
-        according to how specific the place is
+        according to how specific the place is, and including the rest of its PlaceGroup, if any
 
         If it's Germany, include Prussia, Bavaria, and Saxony, etc. because of inconsistencies in
         reporting of German places in the sources
@@ -30,31 +40,12 @@ class EmployeeManager(models.Manager):
         If it's Virginia, include West Virginia because of inconsistencies in
         reporting places in the sources, and because it was all Virginia when they were born
         """
-
-        # Return employees born in that place and in all places in that place
-        # If it's Germany with no city specified, include Prussia, Bavaria, and Saxony, etc.
-        if place.country.name == GERMANY_COUNTRY_NAME and not (place.region or place.county or place.city):
-            employees = self.filter(place_of_birth__country__name__in=GERMANY_COUNTRY_NAMES)
-        else:
-            employees = self.filter(place_of_birth__country=place.country)
-
-        if place.region:
-            # If it's Virginia with no city or county specified, include West Virginia
-            if place.region.name == VIRGINIA_REGION_NAME and not (place.county or place.city):
-                employees = employees.filter(place_of_birth__region__name__in=VIRGINIA_REGION_NAMES)
-            else:
-                employees = employees.filter(place_of_birth__region=place.region)
-        if place.county:
-            employees = employees.filter(place_of_birth__county=place.county)
-        elif place.city:
-            employees = employees.filter(place_of_birth__city=place.city)
-
-        return employees
+        return self.in_place('place_of_birth', place, context='birth').filter(**kwargs)
 
     def died_in_place(self, place, **kwargs):
         """
         Return employees who died in a particular place,
-        according to how specific the place is
+        according to how specific the place is, and including the rest of its PlaceGroup, if any
 
         If it's Germany, include Prussia, Bavaria, and Saxony, etc. because of inconsistencies in
         reporting of German places in the sources
@@ -62,27 +53,12 @@ class EmployeeManager(models.Manager):
         If it's Virginia, don't include West Virginia because it's unlikely that anyone who worked for the Bureau,
         even pre-Bureau organizations like the Contraband Dept., died before West Virginia became a state in 1863
         """
-
-        # Return employees who died in that place and in all places in that place
-        # If it's Germany with no city specified, include Prussia, Bavaria, and Saxony, etc.
-        if place.country.name == GERMANY_COUNTRY_NAME and not (place.region or place.county or place.city):
-            employees = self.filter(place_of_death__country__name__in=GERMANY_COUNTRY_NAMES)
-        else:
-            employees = self.filter(place_of_death__country=place.country)
-
-        if place.region:
-            employees = employees.filter(place_of_death__region=place.region)
-        if place.county:
-            employees = employees.filter(place_of_death__county=place.county)
-        elif place.city:
-            employees = employees.filter(place_of_death__city=place.city)
-
-        return employees
+        return self.in_place('place_of_death', place, context='death').filter(**kwargs)
 
     def resided_in_place(self, place, **kwargs):
         """
         Return employees who resided in a particular place,
-        according to how specific the place is
+        according to how specific the place is, and including the rest of its PlaceGroup, if any
 
         If it's Germany, include Prussia, Bavaria, and Saxony, etc. because of inconsistencies in
         reporting of German places in the sources
@@ -90,26 +66,35 @@ class EmployeeManager(models.Manager):
         If it's Virginia, include West Virginia of inconsistencies in
         reporting places in the sources, and because it was all Virginia when the war started
         """
+        return self.in_place('place_of_residence', place, context='residence').filter(**kwargs)
 
-        # Return employees who resided in that place and in all places in that place
-        # If it's Germany with no city specified, include Prussia, Bavaria, and Saxony, etc.
-        if place.country.name == GERMANY_COUNTRY_NAME and not (place.region or place.county or place.city):
-            employees = self.filter(place_of_residence__country__name__in=GERMANY_COUNTRY_NAMES)
-        else:
-            employees = self.filter(place_of_residence__country=place.country)
+    def in_place(self, place_field, place, context):
+        """
+        Return employees whose place_field is in place, using the Place hierarchy,
+        or in the whole group if the place stands for a PlaceGroup in context ('birth', 'residence', or 'death')
+        """
+        group = place.get_group(context)
+        if group:
+            return self.filter(group.get_filter(place_field))
 
-        if place.region:
-            # If it's Virginia with no city or county specified, include West Virginia
-            if place.region.name == VIRGINIA_REGION_NAME and not (place.county or place.city):
-                employees = employees.filter(place_of_residence__region__name__in=VIRGINIA_REGION_NAMES)
-            else:
-                employees = employees.filter(place_of_residence__region=place.region)
-        if place.county:
-            employees = employees.filter(place_of_residence__county=place.county)
-        elif place.city:
-            employees = employees.filter(place_of_residence__city=place.city)
+        # Return employees in that place and in all places in that place
+        return self.filter(**{f'{place_field}__ancestor_links__ancestor': place})
 
-        return employees
+    def count_place_roles(self, place, **kwargs):
+        """
+        Return a dict of the numbers of employees who were born, died, and resided in a particular place,
+        counted in one query
+        """
+        return self.filter(**kwargs).aggregate(**{
+            role: Count('pk', filter=get_in_place_filter(place_field, place, context))
+            for role, place_field, context in PLACE_ROLES
+        })
+
+    def born_near(self, place, miles, **kwargs):
+        """
+        Return employees who were born in a city within miles of a particular place's city
+        """
+        return self.filter(place_of_birth__in=Place.objects.near(place, miles)).filter(**kwargs)
 
     def vrc(self, **kwargs):
         return self.filter(vrc=True).filter(**kwargs)
@@ -118,13 +103,89 @@ class EmployeeManager(models.Manager):
         return self.filter(vrc=False).filter(**kwargs)
 
     def usct(self, **kwargs):
-        return self.filter(regiments__usct__exact=True).distinct().filter(**kwargs)
+        return self.filter(usct=True).filter(**kwargs)
+
+    def update_regiment_flags(self, **kwargs):
+        """
+        Set the denormalized vrc and usct flags of employees from their regiments, in one UPDATE for all of them:
+        vrc is set for members of a VRC regiment (and kept for others, who may be known to be VRC without a
+        regiment), usct is set for members of a USCT regiment and cleared for everyone else.
+        Return the number of employees updated
+        """
+        count = self.filter(**kwargs).update(**get_regiment_flags())
+        bump_data_version('employees')
+        return count
+
+    def bulk_change(self, employee_ids, flags=None, add=None, remove=None):
+        """
+        Change many employees at once in one transaction, without sending signals for each of them:
+        set flags (a dict of field: value) with one UPDATE, and add or remove related objects (dicts of relation
+        name, like 'regiments', to objects) with one bulk insert or delete per relation.
+        The employees data version is bumped once at the end.
+        Return the number of employees whose flags were set
+        """
+        employee_ids = list(employee_ids)
+        add, remove = add or {}, remove or {}
+        count = 0
+
+        with transaction.atomic():
+            if flags:
+                count = self.filter(pk__in=employee_ids).update(**flags)
+
+            for relation, objs in add.items():
+                through, related_field = get_bulk_relation(relation)
+                through.objects.bulk_create([
+                    through(**{'employee_id': employee_id, f'{related_field}_id': obj.pk})
+                    for employee_id in employee_ids for obj in objs
+                ], batch_size=5000, ignore_conflicts=True)
+
+            for relation, objs in remove.items():
+                through, related_field = get_bulk_relation(relation)
+                through.objects.filter(employee__in=employee_ids, **{f'{related_field}__in': objs}).delete()
+
+            # Members of a VRC regiment stay VRC even if the flag was cleared
+            if 'regiments' in add or 'regiments' in remove or 'vrc' in (flags or {}):
+                self.filter(pk__in=employee_ids).update(**get_regiment_flags())
+
+        bump_data_version('employees')
+        return count
 
     def employed_during_year(self, year, **kwargs):
-        return self.filter(
-            Q(assignments__start_date__lte=f'{year}', assignments__end_date__gte=f'{year}') |
-            Q(assignments__start_date__gte=f'{year}'),
-            assignments__start_date__lt=f'{year + 1}').distinct().filter(**kwargs)
+        # Employment years are unique per employee, so this doesn't need distinct()
+        return self.filter(employment_years__year=year).filter(**kwargs)
+
+
+def get_regiment_flags():
+    """
+    Return expressions for updating the vrc and usct flags of employees from their regiments
+    (see EmployeeManager.update_regiment_flags())
+    """
+    regiments = Employee.regiments.through.objects.filter(employee=OuterRef('pk'))
+    return {
+        'vrc': Case(When(Exists(regiments.filter(regiment__vrc=True)), then=Value(True)), default=F('vrc')),
+        'usct': Exists(regiments.filter(regiment__usct=True)),
+    }
+
+
+def get_bulk_relation(relation):
+    """
+    Return the through model of a many-to-many relation of Employee, and the name of its field for the related model
+    """
+    field = Employee._meta.get_field(relation)
+    return field.remote_field.through, field.m2m_reverse_field_name()
+
+
+def get_in_place_filter(place_field, place, context):
+    """
+    Return a Q object for finding employees whose place_field is in place, or in the whole group if the place
+    stands for a PlaceGroup in context, like EmployeeManager.in_place(). Uses a subquery instead of a join,
+    so it can be combined with filters on other place fields without duplicating employees
+    """
+    group = place.get_group(context)
+    if group:
+        return group.get_filter(place_field)
+
+    return Q(**{f'{place_field}__in': PlaceHierarchy.objects.filter(ancestor=place).values('descendant')})
 
 
 class Employee(models.Model):
@@ -145,6 +206,8 @@ class Employee(models.Model):
 
     # Dates of birth and death use PartialDateField because often only the year is known
     date_of_birth = PartialDateField(null=True, blank=True)
+    # Sortable keys of the dates, for ordering and filtering by range with an index
+    date_of_birth_key = PartialDateKeyField(source='date_of_birth')
     place_of_birth = models.ForeignKey(
         Place, null=True, blank=True, on_delete=models.PROTECT, related_name='employees_born_in'
     )
@@ -156,6 +219,7 @@ class Employee(models.Model):
     )
 
     date_of_death = PartialDateField(null=True, blank=True)
+    date_of_death_key = PartialDateKeyField(source='date_of_death')
     place_of_death = models.ForeignKey(Place, null=True, blank=True, on_delete=models.PROTECT,
                                        related_name='employees_died_in')
     # Some employees died during their Bureau assignment
@@ -202,6 +266,8 @@ class Employee(models.Model):
 
     # A large number were members of the Veteran Reserve Corps
     vrc = models.BooleanField(default=False)
+    # Whether the employee was a member of a USCT regiment, kept up to date from regiments
+    usct = models.BooleanField(default=False, editable=False)
     # Several employees entered William Oland Bourne's Left-Handed Penmanship Contest
     penmanship_contest = models.BooleanField(default=False)
 
@@ -217,9 +283,8 @@ class Employee(models.Model):
         return f'{self.last_name}, {self.first_name}'
 
     def save(self, *args, **kwargs):
-        # Make sure someone who's a member of a VRC regiment has VRC set to true
-        if self.regiments.filter(vrc=True):
-            self.vrc = True
+        if 'update_fields' in kwargs:
+            kwargs['update_fields'] = get_partial_date_key_update_fields(self, kwargs['update_fields'])
         super().save(*args, **kwargs)  # Call the "real" save() method.
 
     def age_at_death(self):
@@ -234,7 +299,7 @@ class Employee(models.Model):
         """
         Return assignments in the order they should be shown in employee details
         """
-        return self.assignments.order_by('start_date')
+        return self.assignments.order_by('start_date_key', 'end_date_key')
 
     def bureau_state_list(self):
         return ', '.join([state.name for state in self.bureau_states.all()])
@@ -243,3 +308,54 @@ class Employee(models.Model):
         if self.date_of_birth:
             return year - self.date_of_birth.date.year  # pylint: disable=no-member
         return None
+
+
+# Signals to keep the employees data version up to date, for caches of stats computed from employees
+def update_employees_data_version(sender, action='post_save', **kwargs):  # pylint: disable=unused-argument
+    # m2m_changed is sent before and after the change
+    if action.startswith('post_'):
+        bump_data_version('employees')
+
+
+post_save.connect(update_employees_data_version, sender=Employee)
+post_delete.connect(update_employees_data_version, sender=Employee)
+m2m_changed.connect(update_employees_data_version, sender=Employee.bureau_states.through)
+m2m_changed.connect(update_employees_data_version, sender=Employee.regiments.through)
+m2m_changed.connect(update_employees_data_version, sender=Employee.ailments.through)
+# Whether a regiment is USCT or VRC is part of its employees' stats
+post_save.connect(update_employees_data_version, sender=Regiment)
+post_delete.connect(update_employees_data_version, sender=Regiment)
+
+
+# Signals to keep the vrc and usct flags of employees up to date with their regiments
+def update_employee_regiments(sender, instance, action, reverse, pk_set, **kwargs):  # pylint: disable=unused-argument
+    if reverse:
+        # instance is a Regiment
+        if action == 'pre_clear':
+            instance.cleared_employee_ids = list(instance.employees.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove'):
+            Employee.objects.update_regiment_flags(pk__in=pk_set)
+        elif action == 'post_clear':
+            Employee.objects.update_regiment_flags(pk__in=getattr(instance, 'cleared_employee_ids', []))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        Employee.objects.update_regiment_flags(pk=instance.pk)
+
+
+def update_regiment(sender, instance, created=False, raw=False, **kwargs):  # pylint: disable=unused-argument
+    # A new regiment can't have any members yet
+    if not (raw or created):
+        Employee.objects.update_regiment_flags(regiments=instance)
+
+
+def remember_regiment_employees(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    instance.deleted_employee_ids = list(instance.employees.values_list('pk', flat=True))
+
+
+def update_deleted_regiment(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    Employee.objects.update_regiment_flags(pk__in=getattr(instance, 'deleted_employee_ids', []))
+
+
+m2m_changed.connect(update_employee_regiments, sender=Employee.regiments.through)
+post_save.connect(update_regiment, sender=Regiment)
+pre_delete.connect(remember_regiment_employees, sender=Regiment)
+post_delete.connect(update_deleted_regiment, sender=Regiment)
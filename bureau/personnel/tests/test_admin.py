@@ -18,6 +18,7 @@ from personnel.admin import (
 )
 from personnel.models import Employee
 from personnel.tests.factories import EmployeeFactory
+from utilities.tests.mixins import ChangelistQueriesMixin
 
 
 User = get_user_model()
@@ -95,6 +96,106 @@ class EmployeeAdminTestCase(TestCase):
                          "Employee not in VRC unit shouldn't have 'vrc' set to true after saving")
 
 
+class EmployeeAdminActionsTestCase(TestCase):
+    """
+    Test EmployeeAdmin bulk actions
+    """
+
+    def setUp(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'Password123')
+        self.client.login(username='admin', password='Password123')
+        self.url = reverse('admin:personnel_employee_changelist')
+        self.employees = [EmployeeFactory(needs_backfilling=True), EmployeeFactory(needs_backfilling=True)]
+        self.other = EmployeeFactory(needs_backfilling=True)
+        self.selected = [employee.pk for employee in self.employees]
+
+    def test_bulk_change(self):
+        """
+        Should show a form of changes for the selected employees, then make them
+        """
+        state = RegionFactory(name='Georgia', bureau_operations=True)
+        regiment = RegimentFactory(usct=True)
+
+        response = self.client.post(self.url, {'action': 'bulk_change', '_selected_action': self.selected})
+        self.assertTemplateUsed(response, 'admin/personnel/employee/bulk_change.html')
+        self.assertContains(response, 'all 2 selected employees', msg_prefix='Form should show selected employees')
+
+        response = self.client.post(self.url, {
+            'action': 'bulk_change', '_selected_action': self.selected, 'apply': '1', 'needs_backfilling': 'no',
+            'add_bureau_states': [state.pk], 'add_regiments': [regiment.pk],
+        }, follow=True)
+        self.assertContains(response, 'Changed 2 employees', msg_prefix='Changes should be confirmed')
+        for employee in self.employees:
+            employee.refresh_from_db()
+            self.assertFalse(employee.needs_backfilling, "Selected employees' flags should be set")
+            self.assertTrue(employee.usct, 'Selected employees added to a USCT regiment should be USCT')
+            self.assertQuerysetEqual(employee.bureau_states.all(), [state],
+                                     msg='Bureau states should be added to selected employees')
+        self.other.refresh_from_db()
+        self.assertTrue(self.other.needs_backfilling, "Employees not selected shouldn't be changed")
+
+    def test_bulk_change_select_across(self):
+        """
+        With every employee in the changelist selected, the form should post back the selection and the changelist's
+        filters instead of every employee, and make the changes to all employees the filters match
+        """
+        state = RegionFactory(name='Georgia', bureau_operations=True)
+        not_filtered = EmployeeFactory(needs_backfilling=False)
+        url = f'{self.url}?needs_backfilling__exact=1'
+        data = {'action': 'bulk_change', '_selected_action': self.selected[:1], 'select_across': '1'}
+
+        response = self.client.post(url, data)
+        self.assertContains(response, 'all 3 selected employees',
+                            msg_prefix='Form should count every employee in the filtered changelist')
+        self.assertNotContains(response, self.other.pk, msg_prefix="Form shouldn't post back every employee")
+
+        response = self.client.post(url, {**data, 'apply': '1', 'add_bureau_states': [state.pk]}, follow=True)
+        self.assertContains(response, 'Changed 3 employees', msg_prefix='Changes should be confirmed')
+        self.assertQuerysetEqual(Employee.objects.filter(bureau_states=state), [*self.employees, self.other],
+                                 ordered=False, msg='Every employee in the filtered changelist should be changed')
+        self.assertFalse(not_filtered.bureau_states.exists(), "Employees filtered out shouldn't be changed")
+
+    def test_bulk_change_no_changes(self):
+        """
+        Should change nothing if no changes were chosen
+        """
+        response = self.client.post(self.url, {'action': 'bulk_change', '_selected_action': self.selected,
+                                               'apply': '1'}, follow=True)
+        self.assertContains(response, 'No changes were chosen', msg_prefix='Should say nothing was changed')
+        self.assertEqual(Employee.objects.filter(needs_backfilling=True).count(), 3, "Employees shouldn't be changed")
+
+    def test_clear_needs_backfilling(self):
+        """
+        Should clear 'needs_backfilling' of the selected employees
+        """
+        already_cleared = EmployeeFactory(needs_backfilling=False)
+        response = self.client.post(self.url, {'action': 'clear_needs_backfilling',
+                                               '_selected_action': [*self.selected, already_cleared.pk]}, follow=True)
+        self.assertContains(response, f'Marked {len(self.selected)} employees as not needing backfilling',
+                            msg_prefix="Should say how many employees were changed, not counting ones that already "
+                                       "didn't need backfilling")
+        self.assertQuerysetEqual(Employee.objects.filter(needs_backfilling=True), [self.other],
+                                 msg="Only the selected employees' 'needs_backfilling' should be cleared")
+
+
+class EmployeeChangelistTestCase(ChangelistQueriesMixin, TestCase):
+    """
+    Test the number of queries for the Employee changelist
+    """
+
+    def test_changelist_queries(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'Password123')
+        self.client.login(username='admin', password='Password123')
+
+        def add_rows():
+            for _ in range(3):
+                employee = EmployeeFactory(place_of_birth=PlaceFactory(region=RegionFactory()),
+                                           date_of_birth=PartialDate('1840'))
+                employee.bureau_states.add(RegionFactory(), RegionFactory())
+
+        self.assertChangelistQueries(reverse('admin:personnel_employee_changelist'), 10, add_rows)
+
+
 class EmployeeAdminFilterTestCase(TestCase):
     """
     Base class for testing EmployeeAdmin filters
@@ -162,10 +263,11 @@ class EmploymentYearListFilterTestCase(EmployeeAdminFilterTestCase):
         employee_1865_1866 = EmployeeFactory()
         employee_1867_1868 = EmployeeFactory()
 
-        AssignmentFactory(start_date=PartialDate('1865-10'), end_date=PartialDate('1866-01'),
-                          employee=employee_1865_1866)
-        AssignmentFactory(start_date=PartialDate('1867-06'), end_date=PartialDate('1868-03'),
-                          employee=employee_1867_1868)
+        with self.captureOnCommitCallbacks(execute=True):
+            AssignmentFactory(start_date=PartialDate('1865-10'), end_date=PartialDate('1866-01'),
+                              employee=employee_1865_1866)
+            AssignmentFactory(start_date=PartialDate('1867-06'), end_date=PartialDate('1868-03'),
+                              employee=employee_1867_1868)
 
         request = self.request_factory.get('/')
         request.user = self.user
@@ -185,9 +287,15 @@ class EmploymentYearListFilterTestCase(EmployeeAdminFilterTestCase):
         request.user = self.user
         changelist = self.modeladmin.get_changelist_instance(request)
 
-        # Make sure the correct queryset is returned
+        # Make sure the correct queryset is returned, looked up in one query from employment years
+        # (and one for the states prefetched for the changelist)
         queryset = changelist.get_queryset(request)
-        self.assertSetEqual(set(queryset), {employee_1867_1868})
+        with self.assertNumQueries(2):
+            self.assertSetEqual(set(queryset), {employee_1867_1868})
+
+        # Lookups are cached until assignments change
+        with self.assertNumQueries(0):
+            EmploymentYearListFilter(request, params='', model=Employee, model_admin=self.modeladmin)
 
 
 class FirstLetterListFilterTestCase(EmployeeAdminFilterTestCase):
@@ -3,11 +3,15 @@ from partial_date import PartialDate
 from django.test import TestCase
 
 from assignments.tests.factories import AssignmentFactory, PositionFactory
+from medical.tests.factories import AilmentFactory
 from military.tests.factories import RegimentFactory
-from places.tests.factories import CityFactory, CountryFactory, CountyFactory, PlaceFactory, RegionFactory
+from places.tests.factories import (
+    CityFactory, CountryFactory, CountyFactory, PlaceFactory, PlaceGroupFactory, RegionFactory
+)
 
 from personnel.models import Employee
 from personnel.tests.factories import EmployeeFactory
+from utilities.data_version import get_data_version
 
 
 class EmployeeManagerTestCase(TestCase):
@@ -25,6 +29,11 @@ class EmployeeManagerTestCase(TestCase):
         self.assertNotIn(EmployeeFactory(place_of_birth=None), Employee.objects.birthplace_known(),
                          "Employee with place_of_birth empty shouldn't be in Employee.objects.birthplace_known()")
 
+    def create_assignment(self, **kwargs):
+        # Employment years are updated when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return AssignmentFactory(**kwargs)
+
     def test_employed_during_year_ended_before_year(self):
         """
         Should return employees with assignments during a given year
@@ -32,19 +41,19 @@ class EmployeeManagerTestCase(TestCase):
 
         # Employee with assignment that ended before year shouldn't be returned
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1865-08', end_date='1865-10', employee=employee)
+        self.create_assignment(start_date='1865-08', end_date='1865-10', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
         # Check empty end date
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1865-08', employee=employee)
+        self.create_assignment(start_date='1865-08', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
         # Check start and end dates just year
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1864', end_date='1865', employee=employee)
+        self.create_assignment(start_date='1864', end_date='1865', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
         # Check start date just year and empty end date
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1865', employee=employee)
+        self.create_assignment(start_date='1865', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
 
     def test_employed_during_year_started_before_and_ended_after(self):
@@ -54,11 +63,11 @@ class EmployeeManagerTestCase(TestCase):
 
         # Employee with assignment that started before year and ended after year should be returned
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1865-08', end_date='1867-10', employee=employee)
+        self.create_assignment(start_date='1865-08', end_date='1867-10', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
         # Check start and end dates just year
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1865', end_date='1867', employee=employee)
+        self.create_assignment(start_date='1865', end_date='1867', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
 
     def test_employed_during_year_started_that_year_and_into_next(self):
@@ -68,11 +77,11 @@ class EmployeeManagerTestCase(TestCase):
 
         # Employee with assignment that started that year and continued into next year should be returned
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1866-08', end_date='1867-10', employee=employee)
+        self.create_assignment(start_date='1866-08', end_date='1867-10', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
         # Check start and end dates just year
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1866', end_date='1867', employee=employee)
+        self.create_assignment(start_date='1866', end_date='1867', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
 
     def test_employed_during_year_entirely_in_year(self):
@@ -82,15 +91,15 @@ class EmployeeManagerTestCase(TestCase):
 
         # Employee with assignment entirely in year should be returned
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1866-08', end_date='1866-10', employee=employee)
+        self.create_assignment(start_date='1866-08', end_date='1866-10', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
         # Check start date and no end date
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1866-02', employee=employee)
+        self.create_assignment(start_date='1866-02', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
         # Check start date just year and no end date
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1866', employee=employee)
+        self.create_assignment(start_date='1866', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
 
     def test_employed_during_year_started_year_before_and_into_year(self):
@@ -100,11 +109,11 @@ class EmployeeManagerTestCase(TestCase):
 
         # Employee with assignment that started year before and continued into that year should be returned
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1865-08', end_date='1866-10', employee=employee)
+        self.create_assignment(start_date='1865-08', end_date='1866-10', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
         # Check start and end dates just year
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1865', end_date='1866', employee=employee)
+        self.create_assignment(start_date='1865', end_date='1866', employee=employee)
         self.assertIn(employee, Employee.objects.employed_during_year(1866))
 
     def test_employed_during_year_started_after_year(self):
@@ -114,19 +123,19 @@ class EmployeeManagerTestCase(TestCase):
 
         # Employee with assignment that started after year shouldn't be returned
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1867-08', end_date='1867-10', employee=employee)
+        self.create_assignment(start_date='1867-08', end_date='1867-10', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
         # Check empty end date
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1867-08', employee=employee)
+        self.create_assignment(start_date='1867-08', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
         # Check start and end dates just year
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1867', end_date='1868', employee=employee)
+        self.create_assignment(start_date='1867', end_date='1868', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
         # Check start date just year and empty end date
         employee = EmployeeFactory()
-        AssignmentFactory(start_date='1867', employee=employee)
+        self.create_assignment(start_date='1867', employee=employee)
         self.assertNotIn(employee, Employee.objects.employed_during_year(1866))
 
     def test_foreign_born(self):
@@ -146,6 +155,22 @@ class EmployeeManagerTestCase(TestCase):
             "Employee with place_of_birth in 'DE' should be in Employee.objects.foreign_born()"
         )
 
+    def test_born_near(self):
+        """
+        Should return employees born in cities within radius of a place's city
+        """
+        vicksburg = PlaceFactory(city=CityFactory(name='Vicksburg', latitude='32.35265', longitude='-90.87788'))
+        jackson = PlaceFactory(city=CityFactory(name='Jackson', latitude='32.29876', longitude='-90.18481'))
+        new_orleans = PlaceFactory(city=CityFactory(name='New Orleans', latitude='29.95465', longitude='-90.07507'))
+
+        employee_born_in_jackson = EmployeeFactory(place_of_birth=jackson)
+        employee_born_in_new_orleans = EmployeeFactory(place_of_birth=new_orleans)
+
+        self.assertIn(employee_born_in_jackson, Employee.objects.born_near(vicksburg, 50),
+                      'Employee born within radius should be in Employee.objects.born_near()')
+        self.assertNotIn(employee_born_in_new_orleans, Employee.objects.born_near(vicksburg, 50),
+                         "Employee born outside radius shouldn't be in Employee.objects.born_near()")
+
     def test_vrc(self):
         """
         Should return employees with vrc=True
@@ -156,6 +181,79 @@ class EmployeeManagerTestCase(TestCase):
                       Employee.objects.vrc(),
                       "Employee with vrc=True should be in Employee.objects.vrc()")
 
+    def test_usct(self):
+        """
+        Should return employees in a USCT regiment, once each
+        """
+        employee = EmployeeFactory()
+        employee.regiments.set([RegimentFactory(usct=True), RegimentFactory(usct=True)])
+        EmployeeFactory().regiments.add(RegimentFactory(usct=False))
+
+        self.assertQuerysetEqual(Employee.objects.usct(), [employee],
+                                 msg='Only employees in a USCT regiment should be in Employee.objects.usct()')
+
+    def test_update_regiment_flags(self):
+        """
+        Should set 'vrc' and 'usct' from employees' regiments in one query, keeping 'vrc' set without a VRC regiment
+        """
+        vrc_regiment = RegimentFactory(vrc=True)
+        usct_regiment = RegimentFactory(usct=True)
+        vrc_employee = EmployeeFactory(last_name='Dodge')
+        usct_employee = EmployeeFactory(last_name='Sladen')
+        EmployeeFactory(last_name='MacNulty', vrc=True)
+        # Memberships added in bulk, like an import would, don't update the flags
+        Employee.regiments.through.objects.bulk_create([
+            Employee.regiments.through(employee=vrc_employee, regiment=vrc_regiment),
+            Employee.regiments.through(employee=usct_employee, regiment=usct_regiment),
+        ])
+        EmployeeFactory(last_name='Wrong', usct=True)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(Employee.objects.update_regiment_flags(), 4, 'All employees should be updated')
+        self.assertListEqual(list(Employee.objects.values_list('last_name', 'vrc', 'usct')), [
+            ('Dodge', True, False), ('MacNulty', True, False), ('Sladen', False, True), ('Wrong', False, False),
+        ], "Employees' 'vrc' and 'usct' should be set from their regiments")
+
+    def test_bulk_change(self):
+        """
+        Should set flags and add and remove related objects of employees in bulk, updating VRC and USCT flags
+        from regiments and bumping the employees data version
+        """
+        usct_regiment = RegimentFactory(usct=True)
+        vrc_regiment = RegimentFactory(vrc=True)
+        state = RegionFactory(name='Georgia')
+        ailment = AilmentFactory()
+        employees = [EmployeeFactory(needs_backfilling=True), EmployeeFactory(needs_backfilling=True)]
+        employees[0].regiments.add(vrc_regiment)
+        employees[0].ailments.add(ailment)
+        other = EmployeeFactory(needs_backfilling=True)
+        version = get_data_version('employees')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            count = Employee.objects.bulk_change([employee.pk for employee in employees],
+                                                 flags={'needs_backfilling': False, 'colored': True},
+                                                 add={'bureau_states': [state], 'regiments': [usct_regiment]},
+                                                 remove={'ailments': [ailment], 'regiments': [vrc_regiment]})
+        self.assertEqual(count, 2, 'Should return the number of employees whose flags were set')
+
+        for employee in employees:
+            employee.refresh_from_db()
+            self.assertFalse(employee.needs_backfilling, "Employees' flags should be set")
+            self.assertTrue(employee.colored, "Employees' flags should be set")
+            self.assertTrue(employee.usct, 'Employees added to a USCT regiment should be USCT')
+            self.assertQuerysetEqual(employee.bureau_states.all(), [state], msg='Bureau states should be added')
+            self.assertQuerysetEqual(employee.regiments.all(), [usct_regiment], msg='Regiments should be changed')
+            self.assertFalse(employee.ailments.exists(), 'Ailments should be removed')
+        self.assertTrue(Employee.objects.get(pk=employees[0].pk).vrc,
+                        'Employees removed from a VRC regiment should stay VRC')
+        other.refresh_from_db()
+        self.assertTrue(other.needs_backfilling, 'Employees not changed should keep their flags')
+        self.assertNotEqual(get_data_version('employees'), version, 'Employees data version should be bumped')
+
+        # Adding what's already there is ignored
+        Employee.objects.bulk_change([employees[0].pk], add={'bureau_states': [state]})
+        self.assertEqual(employees[0].bureau_states.count(), 1, "Bureau states already added shouldn't be repeated")
+
     def test_non_vrc(self):
         """
         Should return employees with vrc=False
@@ -201,6 +299,14 @@ class EmployeeManagerBornDiedResidedInPlaceTestCase(TestCase):
             city=None, county=CountyFactory(name='Clay', state=self.west_virginia.region, country=us.country)
         )
 
+        # Group Prussia with Germany, and West Virginia with Virginia except for places of death
+        germany_group = PlaceGroupFactory(name='Germany', country=self.germany.country)
+        germany_group.member_countries.add(self.prussia.country)
+        virginia_group = PlaceGroupFactory(name='Virginia', region=self.virginia.region, death=False)
+        virginia_group.member_regions.add(self.west_virginia.region)
+        for place in [self.germany, self.virginia]:
+            place.refresh_from_db()
+
     def test_born_in_place(self):
         """
         born_in_place() should return employees who were born in a particular place,
@@ -304,6 +410,26 @@ class EmployeeManagerBornDiedResidedInPlaceTestCase(TestCase):
         self.assertNotIn(employee_born_in_west_virginia, Employee.objects.born_in_place(place=self.richmond),
                          "born_in_place() shouldn't include employee born in another state if place is a city")
 
+    def test_count_place_roles(self):
+        """
+        count_place_roles() should return the numbers of employees who were born, died, and resided in a particular
+        place, like born_in_place(), died_in_place(), and resided_in_place()
+        """
+
+        # West Virginia is grouped with Virginia except for places of death
+        EmployeeFactory(place_of_birth=self.booger_hole, place_of_death=self.clay_county)
+        EmployeeFactory(place_of_residence=self.richmond, place_of_death=self.richmond)
+        EmployeeFactory(place_of_birth=self.germany, place_of_residence=self.cologne)
+
+        for place in [self.virginia, self.richmond, self.germany, self.cologne]:
+            self.assertDictEqual(
+                Employee.objects.count_place_roles(place=place),
+                {'born': Employee.objects.born_in_place(place=place).count(),
+                 'died': Employee.objects.died_in_place(place=place).count(),
+                 'resided': Employee.objects.resided_in_place(place=place).count()},
+                'count_place_roles() should count employees like born_in_place(), etc.'
+            )
+
     def test_died_in_place(self):
         """
         born_in_place() should return employees who were born in a particular place,
@@ -568,6 +694,28 @@ class EmployeeTestCase(TestCase):
         self.assertEqual(list(employee.assignments_in_order()), [assignment_1865, assignment_1867, assignment_1868],
                          'assignments_in_order() should return assignments ordered by start_date')
 
+        # Partial dates should sort by what's known of them: a year before the months and days in it
+        assignment_1867_03_01 = AssignmentFactory(start_date=PartialDate('1867-03-01'), employee=employee)
+        assignment_1867_03 = AssignmentFactory(start_date=PartialDate('1867-03'), employee=employee)
+        self.assertEqual(list(employee.assignments_in_order())[1:4],
+                         [assignment_1867, assignment_1867_03, assignment_1867_03_01],
+                         'assignments_in_order() should order partial start dates by precision within a period')
+
+    def test_date_keys(self):
+        """
+        Sortable keys of dates of birth and death should be kept up to date when employees are saved
+        """
+
+        employee = EmployeeFactory(date_of_birth=PartialDate('1840-05'))
+        self.assertEqual(employee.date_of_birth_key, 184005001)
+        self.assertIsNone(employee.date_of_death_key)
+
+        employee.date_of_death = PartialDate('1890-02-03')
+        employee.save(update_fields=['date_of_death'])
+        employee.refresh_from_db()
+        self.assertEqual(employee.date_of_death_key, 189002032,
+                         'Date keys should be saved with their dates when saving with update_fields')
+
     def test_calculate_age(self):
         """
         Should calculate year - birth year, if birth date filled
@@ -579,14 +727,36 @@ class EmployeeTestCase(TestCase):
         self.assertEqual(EmployeeFactory(date_of_birth=PartialDate('1840')).calculate_age(1865), 25,
                          "calculate_age() should be year - birth year")
 
-    def test_vrc_set_on_save(self):
+    def test_regiment_flags(self):
         """
-        If Employee is a member of a VRC unit, 'vrc' should be True
+        'vrc' and 'usct' should be kept up to date with the Employee's regiments, from either side of the relation
         """
 
+        vrc_regiment = RegimentFactory(vrc=True)
+        usct_regiment = RegimentFactory(usct=True)
         employee = EmployeeFactory(vrc=False)
-        employee.regiments.set([RegimentFactory(vrc=True)])
-        employee.save()
+
+        employee.regiments.set([vrc_regiment, usct_regiment])
+        employee.refresh_from_db()
+        self.assertTupleEqual((employee.vrc, employee.usct), (True, True),
+                              "Employee in VRC and USCT units should have 'vrc' and 'usct' set to true")
+
+        usct_regiment.employees.clear()
+        employee.refresh_from_db()
+        self.assertTupleEqual((employee.vrc, employee.usct), (True, False),
+                              "Employee no longer in a USCT unit should have 'usct' set to false")
+
+        usct_regiment.employees.add(employee)
+        usct_regiment.usct = False
+        usct_regiment.save()
+        employee.refresh_from_db()
+        self.assertFalse(employee.usct, "Employee in a unit that's no longer USCT should have 'usct' set to false")
+
+        usct_regiment.usct = True
+        usct_regiment.save()
+        employee.refresh_from_db()
+        self.assertTrue(employee.usct, "Employee in a unit that became USCT should have 'usct' set to true")
+
+        usct_regiment.delete()
         employee.refresh_from_db()
-        self.assertTrue(employee.vrc,
-                        "Employee in VRC unit should have 'vrc' set to true after saving")
+        self.assertFalse(employee.usct, "Employee whose USCT unit was deleted should have 'usct' set to false")
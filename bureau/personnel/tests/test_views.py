@@ -5,11 +5,14 @@ from partial_date import PartialDate
 from django.test import RequestFactory, TestCase
 from django.urls import reverse
 
+from assignments.models import CoworkerLink
 from medical.tests.factories import AilmentFactory, AilmentTypeFactory
-from personnel.models import Employee, EmployeeManager
+from personnel.models import Employee
 from personnel.tests.factories import EmployeeFactory
 from personnel.views import EmployeeListView, EmployeesBornResidedDiedInPlaceView, EmployeesWithAilmentListView
-from places.tests.factories import BureauStateFactory, CityFactory, CountryFactory, PlaceFactory, RegionFactory
+from places.tests.factories import (
+    BureauStateFactory, CityFactory, CountryFactory, PlaceFactory, PlaceGroupFactory, RegionFactory
+)
 
 
 class EmployeeListViewTestCase(TestCase):
@@ -35,6 +38,10 @@ class EmployeeListViewTestCase(TestCase):
         self.philadelphia = PlaceFactory(
             city=CityFactory(name='Philadelphia', country=us), region=RegionFactory(name='Pennsylvania')
         )
+        PlaceGroupFactory(name='Germany', country=self.germany.country).member_countries.add(self.bavaria.country)
+        PlaceGroupFactory(name='Virginia', region=self.virginia.region, death=False).member_regions.add(
+            self.west_virginia.region
+        )
         self.boolean_keys = ['vrc', 'union_veteran', 'confederate_veteran', 'colored', 'died_during_assignment',
                              'former_slave', 'slaveholder']
         self.search_keys = ['first_name', 'last_name', 'gender', 'place_of_birth', 'place_of_death']
@@ -170,7 +177,7 @@ class EmployeeListViewTestCase(TestCase):
             'If country specified as place_of_birth, EmployeeListView should return employees born in that country'
         )
 
-        # State: search for "Virginia" will automatically include West Virginia, which is what we want
+        # State: search for "Virginia" should include West Virginia, because they're grouped for places of birth
         request = RequestFactory().get('/', {'place_of_birth': 'Virginia'})
         view = EmployeeListView(kwargs={}, object_list=[], request=request)
         self.assertSetEqual(
@@ -499,16 +506,14 @@ class EmployeesBornResidedDiedInPlaceViewTestCase(TestCase):
                          "EmployeesBornResidedDiedInPlaceView.get_place() should return Place with pk 'place'")
 
     @patch.object(EmployeesBornResidedDiedInPlaceView, 'get_place', autospec=True)
-    @patch.object(EmployeeManager, 'born_in_place', return_value='employees_born_in_place', autospec=True)
-    @patch.object(EmployeeManager, 'resided_in_place', return_value='employees_resided_in_place', autospec=True)
-    @patch.object(EmployeeManager, 'died_in_place', return_value='employees_died_in_place', autospec=True)
-    def test_get_context_data(self, mock_died_in_place, mock_resided_in_place, mock_born_in_place, mock_get_place):
+    def test_get_context_data(self, mock_get_place):
         """
         get_context_data() should fill 'place' with specified place and fill 'employees_born_in_place',
-        'employees_resided_in_place', and 'employees_died_in_place'
+        'employees_resided_in_place', and 'employees_died_in_place' with pages of those employees
         """
 
         context_keys = ['employees_born_in_place', 'employees_resided_in_place', 'employees_died_in_place']
+        self.view.request = RequestFactory().get('/', {'born_page': 2})
 
         # If 'place' not found, context['place'] should be empty and employees_* shouldn't be in context at all
         mock_get_place.return_value = None
@@ -525,26 +530,28 @@ class EmployeesBornResidedDiedInPlaceViewTestCase(TestCase):
 
         # If 'place' is found, it should go in context['place']
         mock_get_place.return_value = self.place
-        context_data = self.view.get_context_data()
+        born_in_place = [EmployeeFactory(place_of_birth=self.place) for _ in range(self.view.paginate_by + 1)]
+        died_in_place = EmployeeFactory(place_of_birth=self.place, place_of_death=self.place)
+        EmployeeFactory()
+
+        # Roles are counted in one query, and a page of each listed in one each (except roles without employees)
+        with self.assertNumQueries(3):
+            context_data = self.view.get_context_data()
+            pages = {key: list(context_data[key]) for key in context_keys}
         self.assertEqual(
             context_data['place'], self.place,
             "If place is found, it should go in EmployeesBornResidedDiedInPlaceView context['place']"
         )
 
-        # If place is set, other context keys should be filled using EmployeeManager.born_in_place(),
-        # resided_in_place(), and died_in_place()
-        self.assertEqual(
-            context_data['employees_born_in_place'], mock_born_in_place.return_value,
-            "'employees_born_in_place' in context of EmployeesBornResidedDiedInPlaceView should be born_in_place()"
-        )
-        self.assertEqual(
-            context_data['employees_resided_in_place'], mock_resided_in_place.return_value,
-            "'employees_resided_in_place' in EmployeesBornResidedDiedInPlaceView context should be resided_in_place()"
-        )
-        self.assertEqual(
-            context_data['employees_died_in_place'], mock_died_in_place.return_value,
-            "'employees_died_in_place' in context of EmployeesBornResidedDiedInPlaceView should be died_in_place()"
-        )
+        # Each role is paginated separately, with its own page parameter
+        self.assertEqual(context_data['employees_born_in_place'].paginator.count, len(born_in_place) + 1,
+                         "'employees_born_in_place' should be paginated employees born in place")
+        self.assertEqual((context_data['employees_born_in_place'].number, len(pages['employees_born_in_place'])),
+                         (2, 2), "'employees_born_in_place' should be the page in 'born_page' parameter")
+        self.assertListEqual(pages['employees_died_in_place'], [died_in_place],
+                             "'employees_died_in_place' should be the first page of employees who died in place")
+        self.assertListEqual(pages['employees_resided_in_place'], [],
+                             "'employees_resided_in_place' should be empty if no employees resided in place")
 
 
 class EmployeesWithAilmentListViewTestCase(TestCase):
@@ -681,3 +688,47 @@ class EmployeesWithAilmentListViewTestCase(TestCase):
                 employee, queryset,
                 'EmployeesWithAilmentListView.get_queryset() should return all employees if no ailment or type given'
             )
+
+
+class EmployeeDetailViewTestCase(TestCase):
+    """
+    Test EmployeeDetailView and CoworkerNetworkExportView
+    """
+
+    def setUp(self):
+        self.employee = EmployeeFactory(first_name='Oliver', last_name='Howard')
+        self.coworker = EmployeeFactory(first_name='John', last_name='Alvord')
+        self.other_coworker = EmployeeFactory(first_name='Eliphalet', last_name='Whittlesey')
+        CoworkerLink.objects.bulk_create([
+            CoworkerLink(employee=self.employee, coworker=self.coworker, weight=1),
+            CoworkerLink(employee=self.coworker, coworker=self.employee, weight=1),
+            CoworkerLink(employee=self.employee, coworker=self.other_coworker, weight=3),
+            CoworkerLink(employee=self.other_coworker, coworker=self.employee, weight=3),
+        ])
+
+    def test_coworkers(self):
+        """
+        Co-workers should be listed, most served alongside first
+        """
+
+        response = self.client.get(reverse('personnel:employee_detail', kwargs={'pk': self.employee.pk}))
+        self.assertListEqual([link.coworker for link in response.context['coworker_links']],
+                             [self.other_coworker, self.coworker],
+                             'EmployeeDetailView should list co-workers by weight')
+        self.assertContains(response, reverse('personnel:employee_coworkers_export', kwargs={'pk': self.employee.pk}))
+
+    def test_export(self):
+        """
+        The network export should have each link once, and an employee's export only their links
+        """
+
+        response = self.client.get(reverse('personnel:coworker_network_export'))
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], 'Source,Target,Type,Weight,Source Label,Target Label')
+        self.assertEqual(len(rows), 3, 'The network export should have a row for each pair of co-workers')
+
+        response = self.client.get(reverse('personnel:employee_coworkers_export', kwargs={'pk': self.coworker.pk}))
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertListEqual(rows[1:],
+                             [f'{self.coworker.pk},{self.employee.pk},Undirected,1,John Alvord,Oliver Howard'],
+                             "An employee's export should only have their links")
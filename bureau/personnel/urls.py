@@ -1,6 +1,7 @@
 from django.urls import path
 
 from bureau.personnel.views import (
+    coworker_network_export_view,
     employee_detail_view,
     employee_list_view,
     employees_born_resided_died_in_place_view,
@@ -17,4 +18,6 @@ urlpatterns = [
     path("place/<uuid:place>/", view=employees_born_resided_died_in_place_view,
          name="employees_born_resided_died_in_place"),
     path("<uuid:pk>/", view=employee_detail_view, name="employee_detail"),
+    path("coworkers/export", view=coworker_network_export_view, name="coworker_network_export"),
+    path("<uuid:pk>/coworkers/export", view=coworker_network_export_view, name="employee_coworkers_export"),
 ]
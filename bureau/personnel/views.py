@@ -1,23 +1,81 @@
-import datetime
+import csv
 
-from django.db.models import Q
-from django.views.generic import DetailView, ListView, TemplateView
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.generic import DetailView, ListView, TemplateView, View
 
+from assignments.models import CoworkerLink
 from medical.models import Ailment, AilmentType
-from personnel.models import Employee
-from places.models import Region
-from places.settings import GERMANY_COUNTRY_NAMES
+from personnel.models import PLACE_ROLES, Employee, get_in_place_filter
+from places.models import PlaceGroup, Region
 from places.utils import get_place_or_none
+from utilities.dates import get_year_key
 
 
 class EmployeeDetailView(DetailView):
 
     model = Employee
+    # Number of co-workers to list, most served alongside first
+    coworker_count = 25
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['coworker_links'] = self.object.coworker_links.select_related('coworker').order_by(
+            '-weight', 'coworker__last_name', 'coworker__first_name')[:self.coworker_count]
+        return context
 
 
 employee_detail_view = EmployeeDetailView.as_view()
 
 
+class Echo:
+    """
+    File-like object that returns what's written to it, for streaming CSV rows
+    """
+
+    def write(self, value):
+        return value
+
+
+class CoworkerNetworkExportView(View):
+    """
+    Export the network of employees who served alongside each other as a CSV edge list (which Gephi can import),
+    streamed because there can be hundreds of thousands of links.
+    With an employee pk, only that employee's links
+    """
+
+    def get(self, request, *args, **kwargs):
+        if 'pk' in kwargs:
+            employee = get_object_or_404(Employee, pk=kwargs['pk'])
+            links = CoworkerLink.objects.filter(employee=employee)
+            filename = f'coworkers_{employee.pk}.csv'
+        else:
+            # Links go both ways, so only export one of them
+            links = CoworkerLink.objects.filter(employee__lt=F('coworker'))
+            filename = 'coworker_network.csv'
+
+        rows = links.order_by().values_list(
+            'employee_id', 'coworker_id', 'weight', 'employee__first_name', 'employee__last_name',
+            'coworker__first_name', 'coworker__last_name').iterator(chunk_size=5000)
+
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in self.get_rows(rows)), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_rows(self, rows):
+        yield ['Source', 'Target', 'Type', 'Weight', 'Source Label', 'Target Label']
+        for employee_id, coworker_id, weight, first_name, last_name, coworker_first_name, coworker_last_name in rows:
+            yield [employee_id, coworker_id, 'Undirected', weight, f'{first_name} {last_name}',
+                   f'{coworker_first_name} {coworker_last_name}']
+
+
+coworker_network_export_view = CoworkerNetworkExportView.as_view()
+
+
 class EmployeeListView(ListView):
 
     model = Employee
@@ -99,17 +157,13 @@ class EmployeeListView(ListView):
         if place_of_death:
             qs = self.filter_place_of_death(qs, place_of_death)
 
-        # PartialDate fields can't be filtered with Django query
+        # Filter PartialDate fields by year with their sortable keys
         year_of_birth_start = self.request.GET.get('year_of_birth_start')
         if year_of_birth_start:
-            filtered_pks = [employee.pk for employee in qs.filter(date_of_birth__isnull=False) if
-                            employee.date_of_birth.date >= datetime.date(int(year_of_birth_start), 1, 1)]
-            qs = Employee.objects.filter(pk__in=filtered_pks)
+            qs = qs.filter(date_of_birth_key__gte=get_year_key(int(year_of_birth_start)))
         year_of_birth_end = self.request.GET.get('year_of_birth_end')
         if year_of_birth_end:
-            filtered_pks = [employee.pk for employee in qs.filter(date_of_birth__isnull=False) if
-                            employee.date_of_birth.date <= datetime.date(int(year_of_birth_end), 12, 31)]
-            qs = Employee.objects.filter(pk__in=filtered_pks)
+            qs = qs.filter(date_of_birth_key__lt=get_year_key(int(year_of_birth_end) + 1))
 
         # Bureau states
         selected_bureau_states = self.request.GET.getlist('bureau_states', [])
@@ -123,37 +177,38 @@ class EmployeeListView(ListView):
         return qs.distinct()
 
     def filter_place_of_birth(self, qs, place_of_birth):
-        # Group Germany, Prussia, Bavaria, and Saxony, etc. together, because of inconsistencies in reporting of
-        # German places in the sources
-        if place_of_birth.upper() == 'GERMANY':
-            return qs.filter(place_of_birth__country__name__in=GERMANY_COUNTRY_NAMES)
-
-        return qs.filter(Q(place_of_birth__country__name__icontains=place_of_birth)
-                         | Q(place_of_birth__region__name__icontains=place_of_birth)
-                         | Q(place_of_birth__county__name__icontains=place_of_birth)
-                         | Q(place_of_birth__city__name__icontains=place_of_birth))
+        return self.filter_place(qs, 'place_of_birth', place_of_birth, context='birth')
 
     def filter_place_of_death(self, qs, place_of_death):
+        return self.filter_place(qs, 'place_of_death', place_of_death, context='death')
+
+    def filter_place(self, qs, place_field, search_text, context):
         # Group Germany, Prussia, Bavaria, and Saxony, etc. together, because of inconsistencies in reporting of
-        # German places in the sources
-        if place_of_death.upper() == 'GERMANY':
-            return qs.filter(place_of_death__country__name__in=GERMANY_COUNTRY_NAMES)
-        # Virginia and West Virginia shouldn't be grouped together, because West Virginia was already a state
-        # when the war ended
-        if place_of_death.upper() == 'VIRGINIA':
-            return qs.filter(place_of_death__region__name__iexact=place_of_death)
-        return qs.filter(Q(place_of_death__country__name__icontains=place_of_death)
-                         | Q(place_of_death__region__name__icontains=place_of_death)
-                         | Q(place_of_death__county__name__icontains=place_of_death)
-                         | Q(place_of_death__city__name__icontains=place_of_death))
+        # German places in the sources. Groups that don't apply in this context, like Virginia and West Virginia for
+        # places of death, should only match the place the group is named after
+        group = PlaceGroup.objects.filter(name__iexact=search_text).first()
+        if group:
+            if getattr(group, context):
+                return qs.filter(group.get_filter(place_field))
+            return qs.filter(group.get_canonical_filter(place_field))
+
+        return qs.filter(Q(**{f'{place_field}__country__name__icontains': search_text})
+                         | Q(**{f'{place_field}__region__name__icontains': search_text})
+                         | Q(**{f'{place_field}__county__name__icontains': search_text})
+                         | Q(**{f'{place_field}__city__name__icontains': search_text}))
 
 
 employee_list_view = EmployeeListView.as_view()
 
 
 class EmployeesBornResidedDiedInPlaceView(TemplateView):
+    """
+    List employees who were born, died, or resided in a place, each list paginated separately
+    (with '<role>_page' parameters)
+    """
 
     model = Employee
+    paginate_by = 25
     template_name = "personnel/employees_born_resided_died_in_place.html"
 
     def get_place(self):
@@ -169,12 +224,23 @@ class EmployeesBornResidedDiedInPlaceView(TemplateView):
         context['place'] = place
 
         if place:
-            context['employees_born_in_place'] = Employee.objects.born_in_place(place=place)
-            context['employees_resided_in_place'] = Employee.objects.resided_in_place(place=place)
-            context['employees_died_in_place'] = Employee.objects.died_in_place(place=place)
+            counts = Employee.objects.count_place_roles(place)
+            # Each page is filtered on its own place field, so it can use that field's index
+            for role, place_field, place_context in PLACE_ROLES:
+                employees = Employee.objects.filter(get_in_place_filter(place_field, place, place_context))
+                context[f'employees_{role}_in_place'] = self.get_page(employees, role, counts[role])
 
         return context
 
+    def get_page(self, employees, role, count):
+        """
+        Return the requested page of employees with a role, whose number is already known
+        """
+        paginator = Paginator(employees, self.paginate_by)
+        # Counted along with the other roles, so the paginator doesn't have to count them again
+        paginator.count = count
+        return paginator.get_page(self.request.GET.get(f'{role}_page'))
+
 
 employees_born_resided_died_in_place_view = EmployeesBornResidedDiedInPlaceView.as_view()
 
@@ -2,11 +2,12 @@ from cities_light.admin import CityAdmin as CitiesLightCityAdmin
 from cities_light.admin import RegionAdmin as CitiesLightRegionAdmin
 
 from django.contrib import admin
+from django.db.models import Exists, OuterRef
 from django.urls import reverse
 from django.utils.html import format_html
 
 from places.forms import CityForm, CountyForm, RegionForm
-from places.models import City, County, Place, Region
+from places.models import City, County, Place, PlaceGroup, Region
 from places.utils import geonames_city_lookup, geonames_county_lookup
 
 
@@ -73,10 +74,18 @@ class CityAdmin(CitiesLightCityAdmin):
 
         return {}
 
+    def get_queryset(self, request):
+        # Whether each city is in use is looked up along with the cities, instead of with a query for each
+        return super().get_queryset(request).annotate(in_use=Exists(Place.objects.filter(city=OuterRef('pk'))))
+
     def get_fields(self, request, obj=None):
         return ['geonames_lookup', ] + super().get_fields(request, obj)
 
+    @admin.display(boolean=True, ordering='in_use')
     def in_use(self, obj):
+        # Annotated by get_queryset(), so only cities from elsewhere need a query
+        if hasattr(obj, 'in_use'):
+            return obj.in_use
         return obj.places.exists()
 
     def geonames_lookup(self, obj):  # pylint: disable=unused-argument
@@ -152,7 +161,7 @@ class PlaceAdmin(admin.ModelAdmin):
     save_on_top = True
 
     list_select_related = (
-        'region', 'country', 'city'
+        'region', 'country', 'city', 'county__state', 'county__country'
     )
 
     def save_model(self, request, obj, form, change):
@@ -173,3 +182,13 @@ class PlaceAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Place, PlaceAdmin)
+
+
+class PlaceGroupAdmin(admin.ModelAdmin):
+    list_display = ('name', 'country', 'region', 'birth', 'residence', 'death')
+    fields = ('name', 'country', 'region', 'member_countries', 'member_regions', 'birth', 'residence', 'death')
+    filter_horizontal = ('member_countries', 'member_regions')
+    save_on_top = True
+
+
+admin.site.register(PlaceGroup, PlaceGroupAdmin)
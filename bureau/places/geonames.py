@@ -0,0 +1,215 @@
+import mmap
+import os
+import unicodedata
+
+from cities_light.settings import (
+    CITY_SOURCES, COUNTRY_SOURCES, DATA_DIR, ICity, ICountry, IRegion, ISubRegion, REGION_SOURCES, SUBREGION_SOURCES
+)
+
+from places.settings import GEONAMES_INDEX_FILE
+
+# Columns of a line in the index file, which is sorted by key (a normalized name) so it can be binary searched
+INDEX_COLUMNS = ('key', 'feature_code', 'geoname_id', 'name', 'state', 'state_code', 'country', 'country_code',
+                 'latitude', 'longitude', 'population')
+
+
+def normalize_name(name):
+    """
+    Lowercase name and strip its accents, so 'Köln' can be found by searching for 'koln'
+    """
+    decomposed = unicodedata.normalize('NFKD', name.strip().lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).replace('\t', ' ')
+
+
+def get_source_path(source):
+    """
+    Get the path that cities_light saves a source file to, after extracting it if it's zipped
+    """
+    file_name = os.path.basename(source)
+    if file_name.endswith('.zip'):
+        file_name = f'{file_name[:-4]}.txt'
+    return os.path.join(DATA_DIR, file_name)
+
+
+def get_index_path():
+    return GEONAMES_INDEX_FILE or os.path.join(DATA_DIR, 'geonames_index.txt')
+
+
+def read_geonames_file(path):
+    """
+    Yield the tab-separated columns of each line in a GeoNames dump file, skipping comments
+    """
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.startswith('#') or not line.strip():
+                continue
+            yield line.rstrip('\n').split('\t')
+
+
+def read_geonames_names(paths, code_column, name_column):
+    """
+    Read a dict of codes to names (of countries or regions) from GeoNames dump files
+    """
+    return {items[code_column]: items[name_column] for path in paths for items in read_geonames_file(path)}
+
+
+def get_index_rows(names, row):
+    """
+    Return a row for each distinct normalized name a place is known by
+    """
+    return [(key, ) + row for key in sorted({normalize_name(name) for name in names if name})]
+
+
+def build_geonames_index(index_path=None, city_paths=None, county_paths=None, region_paths=None, country_paths=None):
+    """
+    Build the sorted name index from the GeoNames dump files cities_light downloads, and return the number of names
+    in it. Cities are indexed under their name and ASCII name, and counties (admin2 codes) with feature code 'ADM2'
+    """
+    countries = read_geonames_names(country_paths or [get_source_path(source) for source in COUNTRY_SOURCES],
+                                    ICountry.code2, ICountry.name)
+    states = read_geonames_names(region_paths or [get_source_path(source) for source in REGION_SOURCES],
+                                 IRegion.code, IRegion.name)
+
+    rows = []
+    for path in city_paths or [get_source_path(source) for source in CITY_SOURCES]:
+        for items in read_geonames_file(path):
+            country_code, state_code = items[ICity.countryCode], items[ICity.admin1Code]
+            rows += get_index_rows(
+                (items[ICity.name], items[ICity.asciiName]),
+                (items[ICity.featureCode], items[ICity.geonameid], items[ICity.name],
+                 states.get(f'{country_code}.{state_code}', ''), state_code, countries.get(country_code, ''),
+                 country_code, items[ICity.latitude], items[ICity.longitude], items[ICity.population])
+            )
+
+    for path in county_paths or [get_source_path(source) for source in SUBREGION_SOURCES]:
+        for items in read_geonames_file(path):
+            country_code, state_code = items[ISubRegion.code].split('.')[:2]
+            rows += get_index_rows(
+                (items[ISubRegion.name], items[ISubRegion.asciiName]),
+                ('ADM2', items[ISubRegion.geonameid], items[ISubRegion.name],
+                 states.get(f'{country_code}.{state_code}', ''), state_code, countries.get(country_code, ''),
+                 country_code, '', '', '')
+            )
+
+    # Sort by the encoded key, because that's how GeoNamesIndex compares them
+    rows.sort(key=lambda row: (row[0].encode(), row[1:]))
+
+    index_path = index_path or get_index_path()
+    temp_path = f'{index_path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8', newline='\n') as file:
+        for row in rows:
+            file.write('\t'.join(row) + '\n')
+    os.replace(temp_path, index_path)
+
+    return len(rows)
+
+
+class GeoNamesIndex:
+    """
+    Memory-mapped GeoNames name index built by build_geonames_index(), searched by name prefix with binary search
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size \
+                else b''
+
+    def get_line_end(self, start):
+        end = self.map.find(b'\n', start)
+        return end if end != -1 else len(self.map)
+
+    def lower_bound(self, key):
+        """
+        Return the offset of the first line with key >= key
+        """
+        low, high = 0, len(self.map)
+        while low < high:
+            middle = (low + high) // 2
+            start = self.map.rfind(b'\n', low, middle) + 1 or low
+            end = self.get_line_end(start)
+            if self.map[start:self.map.find(b'\t', start, end)] < key:
+                low = end + 1
+            else:
+                high = start
+        return low
+
+    def search_prefix(self, prefix, feature_codes=None):
+        """
+        Yield index entries whose normalized name starts with prefix, optionally only with certain feature codes
+        """
+        prefix = normalize_name(prefix).encode()
+        position = self.lower_bound(prefix)
+        while position < len(self.map):
+            end = self.get_line_end(position)
+            line = self.map[position:end]
+            if not line.startswith(prefix):
+                break
+            entry = dict(zip(INDEX_COLUMNS, line.decode().split('\t')))
+            if not feature_codes or entry['feature_code'] in feature_codes:
+                yield entry
+            position = end + 1
+
+    def search(self, name, feature_codes=None, qualifiers=None):
+        """
+        Return entries named exactly name, best first: those whose state or country match the most qualifiers
+        (the rest of a search like 'Hamburg, Arkansas'), then the most populous
+        """
+        key = normalize_name(name)
+        qualifiers = [normalize_name(qualifier) for qualifier in qualifiers or [] if qualifier.strip()]
+
+        def rank(entry):
+            places = {normalize_name(entry[column]) for column in ('state', 'state_code', 'country', 'country_code')}
+            population = int(entry['population']) if entry['population'].isdigit() else 0
+            return -len([qualifier for qualifier in qualifiers if qualifier in places]), -population
+
+        entries = [entry for entry in self.search_prefix(key, feature_codes) if entry['key'] == key]
+        return sorted(entries, key=rank)
+
+
+_index = None  # pylint: disable=invalid-name
+
+
+def get_geonames_index():
+    """
+    Return the GeoNames index, or None if it hasn't been built. Reopened if it's been rebuilt since it was opened
+    """
+    global _index  # pylint: disable=global-statement
+
+    path = get_index_path()
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+
+    if _index is None or _index.path != path or _index.mtime != mtime:
+        _index = GeoNamesIndex(path)
+    return _index
+
+
+def local_geonames_lookup(geonames_search, feature_codes=None):
+    """
+    Search the local GeoNames index like the GeoNames search API (name equal to the first part of the search),
+    returning the best match in the format of a GeoNames API result, or None
+    """
+    index = get_geonames_index()
+    if index is None:
+        return None
+
+    name, *qualifiers = geonames_search.split(',')
+    entries = index.search(name, feature_codes, qualifiers)
+    if not entries:
+        return None
+
+    entry = entries[0]
+    return {
+        'geonameId': int(entry['geoname_id']),
+        'toponymName': entry['name'],
+        'adminName1': entry['state'],
+        'countryName': entry['country'],
+        'lat': entry['latitude'],
+        'lng': entry['longitude'],
+        'population': int(entry['population']) if entry['population'].isdigit() else None,
+        'fcode': entry['feature_code'],
+    }
@@ -0,0 +1,146 @@
+from itertools import islice
+
+from cities_light.abstract_models import to_ascii
+from cities_light.receivers import city_search_names
+from cities_light.settings import ICity, ICountry, INCLUDE_CITY_TYPES, INCLUDE_COUNTRIES, IRegion
+
+from django.db import transaction
+
+from places.geonames import read_geonames_file
+from places.models import City, Country, Place, Region
+from places.settings import BUREAU_STATES, LOAD_CITIES_FROM_COUNTRIES, LOAD_REGIONS_FROM_COUNTRIES
+from utilities.data_version import bump_data_version
+
+BATCH_SIZE = 5000
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def upsert(model, objs, update_fields):
+    """
+    Insert objs, updating those that already exist (with the same GeoNames ID) instead
+    """
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=['geoname_id'],
+                              update_fields=update_fields)
+
+
+def import_countries(path):
+    """
+    Import countries in INCLUDE_COUNTRIES (all if it isn't set) from a GeoNames countryInfo file,
+    returning the number of rows read and imported
+    """
+    rows = 0
+    countries = []
+    for items in read_geonames_file(path):
+        rows += 1
+        if INCLUDE_COUNTRIES and items[ICountry.code2] not in INCLUDE_COUNTRIES:
+            continue
+
+        countries.append(Country(
+            name=items[ICountry.name],
+            name_ascii=to_ascii(items[ICountry.name]).strip(),
+            geoname_id=int(items[ICountry.geonameid]),
+            code2=items[ICountry.code2],
+            code3=items[ICountry.code3],
+            continent=items[ICountry.continent],
+            tld=items[ICountry.tld][1:],
+            phone=items[ICountry.phone],
+        ))
+
+    upsert(Country, countries, ['name', 'name_ascii', 'code2', 'code3', 'continent', 'tld', 'phone'])
+    return rows, len(countries)
+
+
+def import_regions(path):
+    """
+    Import regions from countries in LOAD_REGIONS_FROM_COUNTRIES from a GeoNames admin1Codes file,
+    setting bureau_operations for BUREAU_STATES, and return the number of rows read and imported
+    """
+    countries = {country.code2: country for country in Country.objects.filter(code2__in=LOAD_REGIONS_FROM_COUNTRIES)}
+
+    rows = 0
+    regions = []
+    for items in read_geonames_file(path):
+        rows += 1
+        country_code, geoname_code = items[IRegion.code].split('.', 1)
+        country = countries.get(country_code)
+        if not country:
+            continue
+
+        region = Region(
+            name=items[IRegion.name],
+            name_ascii=items[IRegion.asciiName],
+            geoname_id=int(items[IRegion.geonameid]),
+            geoname_code=geoname_code,
+            country=country,
+            bureau_operations=country_code == 'US' and geoname_code in BUREAU_STATES,
+        )
+        region.display_name = region.get_display_name()
+        regions.append(region)
+
+    # Only Bureau states are updated with bureau_operations, so it isn't unset where it's been set by hand
+    update_fields = ['name', 'name_ascii', 'geoname_code', 'country', 'display_name']
+    upsert(Region, [region for region in regions if region.bureau_operations], update_fields + ['bureau_operations'])
+    upsert(Region, [region for region in regions if not region.bureau_operations], update_fields)
+    return rows, len(regions)
+
+
+def import_cities(path):
+    """
+    Import cities with feature codes in INCLUDE_CITY_TYPES from countries in LOAD_CITIES_FROM_COUNTRIES
+    from a GeoNames cities file, streaming it in batches, and return the number of rows read and imported.
+    Rows are filtered before anything else is done with them
+    """
+    countries = {country.code2: country for country in Country.objects.filter(code2__in=LOAD_CITIES_FROM_COUNTRIES)}
+    regions = {
+        f'{region.country.code2}.{region.geoname_code}': region
+        for region in Region.objects.filter(country__in=countries.values()).select_related('country')
+    }
+    update_fields = ['name', 'name_ascii', 'latitude', 'longitude', 'region', 'country', 'population',
+                     'feature_code', 'timezone', 'display_name', 'search_names']
+
+    rows = 0
+    imported = 0
+    for batch in batched(read_geonames_file(path)):
+        rows += len(batch)
+
+        cities = []
+        for items in batch:
+            country = countries.get(items[ICity.countryCode])
+            if not country or items[ICity.featureCode] not in INCLUDE_CITY_TYPES:
+                continue
+
+            city = City(
+                name=items[ICity.name],
+                name_ascii=items[ICity.asciiName],
+                geoname_id=int(items[ICity.geonameid]),
+                latitude=items[ICity.latitude],
+                longitude=items[ICity.longitude],
+                region=regions.get(f'{items[ICity.countryCode]}.{items[ICity.admin1Code]}'),
+                country=country,
+                population=int(items[ICity.population] or 0),
+                feature_code=items[ICity.featureCode],
+                timezone=items[ICity.timezone],
+            )
+            city.display_name = city.get_display_name()
+            city_search_names(City, city)
+            cities.append(city)
+
+        upsert(City, cities, update_fields)
+        imported += len(cities)
+
+    return rows, imported
+
+
+@transaction.atomic
+def update_places():
+    """
+    Bulk upserts don't send signals, so update the display names of all places afterwards,
+    and the regions data version
+    """
+    Place.objects.update_display_names()
+    bump_data_version('regions')
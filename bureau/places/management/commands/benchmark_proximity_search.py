@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from places.models import City, haversine_distance
+
+
+class Command(BaseCommand):
+    help = ("Compares radius searches with the bounding box on the City latitude/longitude index "
+            "to scanning every city and checking its distance")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--miles', type=float, default=50, help='Search radius in miles')
+        parser.add_argument('--searches', type=int, default=100, help='Number of random cities to search around')
+
+    def handle(self, *args, **kwargs):
+        miles = kwargs['miles']
+        points = list(City.objects.filter(latitude__isnull=False, longitude__isnull=False).order_by('?').values_list(
+            'latitude', 'longitude')[:kwargs['searches']])
+        if not points:
+            self.stdout.write('No cities with coordinates')
+            return
+
+        start = time.perf_counter()
+        indexed_results = [set(City.objects.within_radius(latitude, longitude, miles))
+                           for latitude, longitude in points]
+        indexed_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        naive_results = []
+        for latitude, longitude in points:
+            cities = City.objects.filter(latitude__isnull=False, longitude__isnull=False).values_list(
+                'pk', 'latitude', 'longitude')
+            naive_results.append({pk for pk, city_latitude, city_longitude in cities
+                                  if haversine_distance(latitude, longitude, city_latitude, city_longitude) <= miles})
+        naive_seconds = time.perf_counter() - start
+
+        if indexed_results != naive_results:
+            self.stderr.write('Bounding box search results differ from full scan results')
+
+        self.stdout.write(f'{len(points)} searches within {miles:g} miles')
+        self.stdout.write(f'Bounding box: {indexed_seconds / len(points) * 1000:.2f} ms/search')
+        self.stdout.write(f'Full scan: {naive_seconds / len(points) * 1000:.2f} ms/search')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from places.geonames import build_geonames_index, get_index_path
+
+
+class Command(BaseCommand):
+    help = "Builds the local GeoNames index used for city and county lookups from the files cities_light downloads"
+
+    def handle(self, *args, **kwargs):
+        count = build_geonames_index()
+        self.stdout.write(f'{count} names indexed in {get_index_path()}')
@@ -0,0 +1,32 @@
+import time
+
+from cities_light.geonames import Geonames
+from cities_light.settings import CITY_SOURCES, COUNTRY_SOURCES, REGION_SOURCES
+
+from django.core.management.base import BaseCommand
+
+from places.importer import import_cities, import_countries, import_regions, update_places
+
+
+class Command(BaseCommand):
+    help = ("Imports countries, regions, and cities from GeoNames in bulk, a faster alternative to the cities_light "
+            "command that only builds the cities and regions that will be kept")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force-download', action='store_true',
+                            help='Download GeoNames files even if they have already been downloaded')
+
+    def handle(self, *args, **kwargs):
+        force = kwargs['force_download']
+
+        for name, sources, import_function in [('countries', COUNTRY_SOURCES, import_countries),
+                                               ('regions', REGION_SOURCES, import_regions),
+                                               ('cities', CITY_SOURCES, import_cities)]:
+            for source in sources:
+                start = time.monotonic()
+                rows, imported = import_function(Geonames(source, force).file_path)
+                seconds = time.monotonic() - start
+                self.stdout.write(f'{imported} {name} imported from {rows} rows in {seconds:.1f}s '
+                                  f'({rows / seconds if seconds else rows:.0f} rows/sec)')
+
+        update_places()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from places.models import PlaceHierarchy
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the Place hierarchy (closure table) used for finding everything in a place"
+
+    def handle(self, *args, **kwargs):
+        count = PlaceHierarchy.objects.rebuild()
+        self.stdout.write(f'{count} place hierarchy links created')
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.6 on 2026-10-19 08:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_place_hierarchy(apps, schema_editor):
+    """
+    Link every existing place to itself and to every place in it
+    """
+    Place = apps.get_model('places', 'Place')
+    PlaceHierarchy = apps.get_model('places', 'PlaceHierarchy')
+
+    links = []
+    for place in Place.objects.all():
+        descendants = Place.objects.filter(country_id=place.country_id)
+        if place.region_id:
+            descendants = descendants.filter(region_id=place.region_id)
+        if place.county_id:
+            descendants = descendants.filter(county_id=place.county_id)
+        elif place.city_id:
+            descendants = descendants.filter(city_id=place.city_id)
+        links.extend(PlaceHierarchy(ancestor_id=place.pk, descendant_id=pk)
+                     for pk in descendants.values_list('pk', flat=True))
+
+    PlaceHierarchy.objects.bulk_create(links, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0008_auto_20220209_1727'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceHierarchy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='places.place')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='places.place')),
+            ],
+            options={
+                'verbose_name_plural': 'place hierarchy',
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(populate_place_hierarchy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.6 on 2026-10-19 08:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Q
+
+
+# Groups that used to be hardcoded in places.settings
+GERMANY_COUNTRY_NAMES = ['Germany', 'Prussia', 'Bavaria', 'Grand Duchy of Baden', 'Hessia', 'Saxony']
+VIRGINIA_REGION_NAMES = ['Virginia', 'West Virginia']
+
+
+def create_place_groups(apps, schema_editor):
+    """
+    Create groups for Germany and Virginia, if those places have already been loaded,
+    and set the groups of existing places
+    """
+    Country = apps.get_model('places', 'Country')
+    Place = apps.get_model('places', 'Place')
+    PlaceGroup = apps.get_model('places', 'PlaceGroup')
+    Region = apps.get_model('places', 'Region')
+
+    germany = Country.objects.filter(name=GERMANY_COUNTRY_NAMES[0]).first()
+    if germany:
+        group = PlaceGroup.objects.create(name=germany.name, country=germany)
+        countries = Country.objects.filter(name__in=GERMANY_COUNTRY_NAMES)
+        group.member_countries.set(countries)
+        Place.objects.filter(country__in=countries).update(country_group=group)
+
+    # West Virginia is only grouped with Virginia for birth and residence, because it was a state
+    # before anyone who worked for the Bureau died
+    virginia = Region.objects.filter(name=VIRGINIA_REGION_NAMES[0], country__code2='US').first()
+    if virginia:
+        group = PlaceGroup.objects.create(name=virginia.name, region=virginia, death=False)
+        regions = Region.objects.filter(Q(pk=virginia.pk) | Q(name__in=VIRGINIA_REGION_NAMES[1:], country__code2='US'))
+        group.member_regions.set(regions)
+        Place.objects.filter(region__in=regions).update(region_group=group)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0009_place_hierarchy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('birth', models.BooleanField(default=True, help_text='Group places of birth')),
+                ('residence', models.BooleanField(default=True, help_text='Group places of residence')),
+                ('death', models.BooleanField(default=True, help_text='Group places of death')),
+                ('country', models.ForeignKey(blank=True, help_text='Country the group is named after, if it groups countries', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='places.country')),
+                ('member_countries', models.ManyToManyField(blank=True, related_name='place_groups', to='places.country')),
+                ('member_regions', models.ManyToManyField(blank=True, related_name='place_groups', to='places.region')),
+                ('region', models.ForeignKey(blank=True, help_text='Region the group is named after, if it groups regions', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='places.region')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='country_group',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='country_places', to='places.placegroup'),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='region_group',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='region_places', to='places.placegroup'),
+        ),
+        migrations.RunPython(create_place_groups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.6 on 2026-10-19 08:38
+
+from django.db import migrations, models
+
+
+def set_display_names(apps, schema_editor):
+    """
+    Historical models don't have the custom __str__ methods, so work the names out the same way here
+    """
+    Place = apps.get_model('places', 'Place')
+
+    places = list(Place.objects.select_related('city', 'county__state', 'county__country', 'region', 'country'))
+    for place in places:
+        if place.city:
+            name = place.city.display_name
+        elif place.county:
+            county = place.county
+            if county.state:
+                name = f'{county.name}, {county.state.name}, {county.country.name}'
+            else:
+                name = f'{county.name}, {county.country.name}'
+        elif place.region:
+            name = place.region.display_name
+        else:
+            name = place.country.name if place.country else 'None'
+        place.display_name = name
+
+        country_suffix = f', {place.country.name}' if place.country else ', None'
+        if place.region and name.endswith(country_suffix):
+            name = name[:-len(country_suffix)]
+        place.display_name_without_country = name
+
+    Place.objects.bulk_update(places, ['display_name', 'display_name_without_country'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0010_placegroup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='display_name',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='display_name_without_country',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(set_display_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-19 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0011_place_display_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['latitude', 'longitude'], name='places_city_latitud_5f83ff_idx'),
+        ),
+    ]
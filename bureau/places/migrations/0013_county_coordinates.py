@@ -0,0 +1,23 @@
+# Generated by Django 4.2.6 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0012_city_coordinates_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='county',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='county',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=5, max_digits=8, null=True),
+        ),
+    ]
@@ -1,19 +1,123 @@
+import math
 import uuid
 
-from cities_light.abstract_models import (AbstractCity, AbstractRegion, AbstractSubRegion, AbstractCountry)
+from collections import defaultdict
+
+from cities_light.abstract_models import (AbstractCity, AbstractRegion, AbstractSubRegion, AbstractCountry, BaseManager)
 from cities_light.exceptions import InvalidItems
 from cities_light.receivers import connect_default_signals
 from cities_light.settings import ICity, IRegion
 from cities_light.signals import city_items_pre_import, region_items_pre_import, region_items_post_import
 
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from utilities.data_version import bump_data_version
 
 from .settings import BUREAU_STATES, LOAD_CITIES_FROM_COUNTRIES, LOAD_REGIONS_FROM_COUNTRIES
 
 
-class City(AbstractCity):
-    pass
+class DisplayNameTrackingMixin:
+    """
+    Remember the values of the fields that a model's display name is made of when it's loaded from the database,
+    so places using it only have to be updated when it's actually renamed or moved
+    """
+
+    display_name_fields = ('name', 'country_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_display_name_values = instance.get_display_name_values()
+        return instance
+
+    def get_display_name_values(self):
+        return tuple(self.__dict__.get(field) for field in self.display_name_fields)
+
+    def display_name_changed(self):
+        loaded_values = getattr(self, 'loaded_display_name_values', None)
+        return loaded_values is not None and loaded_values != self.get_display_name_values()
+
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LATITUDE = 69.09
+
+
+def haversine_distance(latitude1, longitude1, latitude2, longitude2):
+    """
+    Return great-circle distance in miles between two points
+    """
+    latitude1, longitude1, latitude2, longitude2 = map(
+        math.radians, map(float, (latitude1, longitude1, latitude2, longitude2)))
+    a = (math.sin((latitude2 - latitude1) / 2) ** 2 +
+         math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1, math.sqrt(a)))
+
+
+def get_bounding_box(latitude, longitude, miles):
+    """
+    Return (min latitude, max latitude, min longitude, max longitude) of a box around a point containing everything
+    within miles of it
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    latitude_delta = miles / MILES_PER_DEGREE_LATITUDE
+    min_latitude, max_latitude = max(latitude - latitude_delta, -90), min(latitude + latitude_delta, 90)
+
+    # Degrees of longitude get shorter away from the equator, so use the latitude in the box closest to a pole
+    cos_latitude = math.cos(math.radians(max(abs(min_latitude), abs(max_latitude))))
+    if cos_latitude < 1e-6 or miles / (MILES_PER_DEGREE_LATITUDE * cos_latitude) >= 180:
+        return min_latitude, max_latitude, -180, 180
+    longitude_delta = miles / (MILES_PER_DEGREE_LATITUDE * cos_latitude)
+    return min_latitude, max_latitude, longitude - longitude_delta, longitude + longitude_delta
+
+
+class CityManager(BaseManager):
+
+    def within_radius(self, latitude, longitude, miles):
+        """
+        Return a dict of distances in miles by city pk for cities within miles of a point, finding candidates
+        in a bounding box with the latitude/longitude index, then checking their actual distance
+        """
+        min_latitude, max_latitude, min_longitude, max_longitude = get_bounding_box(latitude, longitude, miles)
+        candidates = self.filter(
+            latitude__range=(min_latitude, max_latitude), longitude__range=(min_longitude, max_longitude)
+        ).values_list('pk', 'latitude', 'longitude')
+
+        distances = {}
+        for pk, city_latitude, city_longitude in candidates:
+            distance = haversine_distance(latitude, longitude, city_latitude, city_longitude)
+            if distance <= miles:
+                distances[pk] = distance
+        return distances
+
+    def nearest(self, latitude, longitude, number=10, max_miles=500):
+        """
+        Return the number of cities nearest a point (up to max_miles away), nearest first, with a distance attribute
+        """
+        miles = min(25, max_miles)
+        while True:
+            distances = self.within_radius(latitude, longitude, miles)
+            if len(distances) >= number or miles >= max_miles:
+                break
+            miles = min(miles * 2, max_miles)
+
+        pks = sorted(distances, key=distances.get)[:number]
+        cities = self.in_bulk(pks)
+        for pk, city in cities.items():
+            city.distance = distances[pk]
+        return [cities[pk] for pk in pks]
+
+
+class City(DisplayNameTrackingMixin, AbstractCity):
+    display_name_fields = ('name', 'region_id', 'country_id')
+
+    objects = CityManager()
+
+    class Meta(AbstractCity.Meta):
+        # For finding cities in a bounding box, see CityManager.within_radius()
+        indexes = [models.Index(fields=['latitude', 'longitude'])]
 
 
 connect_default_signals(City)
@@ -34,7 +138,7 @@ class RegionManager(models.Manager):
         return self.filter(bureau_operations=True).filter(**kwargs)
 
 
-class Region(AbstractRegion):
+class Region(DisplayNameTrackingMixin, AbstractRegion):
     """
     Extend django-cities-light Region model to keep track of
     whether or not Freedmen's Bureau was active there
@@ -77,13 +181,18 @@ class SubRegion(AbstractSubRegion):
 connect_default_signals(SubRegion)
 
 
-class County(AbstractRegion):
+class County(DisplayNameTrackingMixin, AbstractRegion):
     """
     Counties (regions with feature code 'ADM2' aren't supported by django-cities-light
     and they're sometimes needed for birthplaces and Bureau assignments
     """
 
+    display_name_fields = ('name', 'state_id', 'country_id')
+
     state = models.ForeignKey(Region, null=True, blank=True, on_delete=models.PROTECT, related_name='counties')
+    # Coordinates of the county seat or center, as GeoNames has them, for maps
+    latitude = models.DecimalField(max_digits=8, decimal_places=5, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=8, decimal_places=5, null=True, blank=True)
 
     class Meta(Region.Meta):
         unique_together = ('country', 'state', 'name')
@@ -99,13 +208,63 @@ class County(AbstractRegion):
         return f'{self.name}, {self.country.name}'
 
 
-class Country(AbstractCountry):
-    pass
+class Country(DisplayNameTrackingMixin, AbstractCountry):
+    display_name_fields = ('name',)
 
 
 connect_default_signals(Country)
 
 
+class PlaceManager(models.Manager):
+
+    def containing(self, place):
+        """
+        Return places that contain a particular place, including the place itself
+        (ex. Alabama and United States for Bacon Level, Alabama)
+        """
+        places = self.filter(Q(region__isnull=True) | Q(region_id=place.region_id), country_id=place.country_id)
+
+        level = Q(county__isnull=True, city__isnull=True)
+        if place.county_id:
+            level |= Q(county_id=place.county_id)
+        if place.city_id:
+            level |= Q(county__isnull=True, city_id=place.city_id)
+
+        return places.filter(level)
+
+    def near(self, place, miles):
+        """
+        Return places in cities within miles of a place's city or county, or none if it has no coordinates
+        """
+        coordinates = place.get_coordinates()
+        if not coordinates:
+            return self.none()
+        return self.filter(city__in=City.objects.within_radius(*coordinates, miles))
+
+    def within(self, place):
+        """
+        Return places in a particular place, according to how specific the place is, including the place itself
+        """
+        places = self.filter(country_id=place.country_id)
+        if place.region_id:
+            places = places.filter(region_id=place.region_id)
+        if place.county_id:
+            places = places.filter(county_id=place.county_id)
+        elif place.city_id:
+            places = places.filter(city_id=place.city_id)
+        return places
+
+    def update_display_names(self, *args, **kwargs):
+        """
+        Recalculate display names of the places matching the filters, for when something they're in has been renamed
+        """
+        places = list(self.filter(*args, **kwargs).select_related(
+            'city__region', 'city__country', 'county__state', 'county__country', 'region', 'country'))
+        for place in places:
+            place.set_display_names()
+        self.bulk_update(places, ['display_name', 'display_name_without_country'], batch_size=1000)
+
+
 class Place(models.Model):
     """
     Place with city and region optional
@@ -117,27 +276,48 @@ class Place(models.Model):
     region = models.ForeignKey(Region, null=True, blank=True, on_delete=models.PROTECT, related_name='places')
     country = models.ForeignKey(Country, null=True, blank=True, on_delete=models.PROTECT, related_name='places')
 
+    # Precomputed from PlaceGroup members, so grouped places can be queried with an integer join
+    country_group = models.ForeignKey('PlaceGroup', null=True, blank=True, editable=False, on_delete=models.SET_NULL,
+                                      related_name='country_places')
+    region_group = models.ForeignKey('PlaceGroup', null=True, blank=True, editable=False, on_delete=models.SET_NULL,
+                                     related_name='region_places')
+
+    # Stored so that showing a place doesn't have to go through city/county/region/country and their regions
+    # and countries. Kept up to date in save() and when any of those is renamed
+    display_name = models.CharField(max_length=300, blank=True, editable=False)
+    display_name_without_country = models.CharField(max_length=300, blank=True, editable=False)
+
+    objects = PlaceManager()
+
     class Meta:
         unique_together = ('city', 'region', 'country')
 
     def __str__(self):
-        if self.city:
-            return str(self.city)
-        if self.county:
-            return str(self.county)
-        if self.region:
-            return str(self.region)
-        return str(self.country)
+        if not self.display_name:
+            self.set_display_names()
+        return self.display_name
 
     def name_without_country(self):
         # Return place name without country, if place has a region defined
-        name = str(self)
+        if not self.display_name:
+            self.set_display_names()
+        return self.display_name_without_country
+
+    def set_display_names(self):
+        if self.city:
+            name = str(self.city)
+        elif self.county:
+            name = str(self.county)
+        elif self.region:
+            name = str(self.region)
+        else:
+            name = str(self.country)
+        self.display_name = name
 
         country_suffix = f', {self.country}'
         if self.region and name.endswith(country_suffix):
             name = name[:-len(country_suffix)]
-
-        return name
+        self.display_name_without_country = name
 
     def clean(self):
         super().clean()
@@ -155,4 +335,277 @@ class Place(models.Model):
         elif self.region:
             self.country = self.region.country
 
+        self.country_group = PlaceGroup.objects.for_country(self.country_id) if self.country_id else None
+        self.region_group = PlaceGroup.objects.for_region(self.region_id) if self.region_id else None
+        self.set_display_names()
+
         super().save(*args, **kwargs)  # Call the "real" save() method.
+
+        # Keep the hierarchy up to date, because region and country may have changed along with the city or county
+        PlaceHierarchy.objects.update_for_place(self)
+
+    def get_coordinates(self):
+        """
+        Return (latitude, longitude) of place's city or county, or None if it doesn't have one with coordinates
+        """
+        for location in (self.city, self.county):
+            if location and location.latitude is not None and location.longitude is not None:
+                return location.latitude, location.longitude
+        return None
+
+    def contains(self, place):
+        """
+        Is place in this place, according to how specific this place is?
+        """
+        return place_contains(self, place)
+
+    def get_group(self, context):
+        """
+        Return the PlaceGroup this place stands for in context ('birth', 'residence', or 'death'), if any.
+        Only a country or region on its own stands for a group, not a city or county in it
+        """
+        if self.city_id or self.county_id:
+            return None
+
+        if self.region_id:
+            group = self.region_group
+            is_canonical = group and group.region_id == self.region_id
+        else:
+            group = self.country_group
+            is_canonical = group and group.country_id == self.country_id
+
+        return group if is_canonical and getattr(group, context) else None
+
+
+# Signals to keep display names of cities, regions, and places up to date when something they're in is renamed
+def update_country_display_names(sender, instance, created, raw=False, **kwargs):  # pylint: disable=unused-argument
+    if created or raw or not instance.display_name_changed():
+        return
+
+    regions = list(instance.region_set.all())
+    cities = list(instance.city_set.select_related('region'))
+    for obj in regions + cities:
+        obj.country = instance
+        obj.display_name = obj.get_display_name()
+    Region.objects.bulk_update(regions, ['display_name'], batch_size=1000)
+    City.objects.bulk_update(cities, ['display_name'], batch_size=1000)
+
+    Place.objects.update_display_names(country=instance)
+    instance.loaded_display_name_values = instance.get_display_name_values()
+
+
+def update_region_display_names(sender, instance, created, raw=False, **kwargs):  # pylint: disable=unused-argument
+    if created or raw or not instance.display_name_changed():
+        return
+
+    cities = list(instance.city_set.select_related('country'))
+    for city in cities:
+        city.region = instance
+        city.display_name = city.get_display_name()
+    City.objects.bulk_update(cities, ['display_name'], batch_size=1000)
+
+    # Counties show their state's name too
+    Place.objects.update_display_names(Q(region=instance) | Q(county__state=instance))
+    instance.loaded_display_name_values = instance.get_display_name_values()
+
+
+def update_place_display_names(sender, instance, created, raw=False, **kwargs):
+    if created or raw or not instance.display_name_changed():
+        return
+
+    Place.objects.update_display_names(**{sender._meta.model_name: instance})
+    instance.loaded_display_name_values = instance.get_display_name_values()
+
+
+post_save.connect(update_country_display_names, sender=Country)
+post_save.connect(update_region_display_names, sender=Region)
+post_save.connect(update_place_display_names, sender=City)
+post_save.connect(update_place_display_names, sender=County)
+
+
+# Signals to keep the regions data version up to date, for caches of Bureau state stats
+def update_regions_data_version(sender, **kwargs):  # pylint: disable=unused-argument
+    bump_data_version('regions')
+
+
+post_save.connect(update_regions_data_version, sender=Region)
+post_delete.connect(update_regions_data_version, sender=Region)
+
+
+class PlaceGroupManager(models.Manager):
+
+    def for_country(self, country_id):
+        return self.filter(Q(country_id=country_id) | Q(member_countries=country_id)).first()
+
+    def for_region(self, region_id):
+        return self.filter(Q(region_id=region_id) | Q(member_regions=region_id)).first()
+
+    def update_places(self):
+        """
+        Set country_group and region_group of every Place with one UPDATE per group
+        """
+        with transaction.atomic():
+            Place.objects.update(country_group=None, region_group=None)
+            for group in self.all():
+                if group.country_id:
+                    Place.objects.filter(
+                        Q(country_id=group.country_id) | Q(country__in=group.member_countries.all())
+                    ).update(country_group=group)
+                if group.region_id:
+                    Place.objects.filter(
+                        Q(region_id=group.region_id) | Q(region__in=group.member_regions.all())
+                    ).update(region_group=group)
+
+
+class PlaceGroup(models.Model):
+    """
+    Countries or regions that are treated as one place because of inconsistencies in reporting places in the sources,
+    like Germany, Prussia, Bavaria, and Saxony, etc. or Virginia and West Virginia
+
+    A group stands for either a country or a region, and applies to birth, residence, and death separately
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    country = models.ForeignKey(Country, null=True, blank=True, on_delete=models.PROTECT, related_name='+',
+                                help_text='Country the group is named after, if it groups countries')
+    region = models.ForeignKey(Region, null=True, blank=True, on_delete=models.PROTECT, related_name='+',
+                               help_text='Region the group is named after, if it groups regions')
+    member_countries = models.ManyToManyField(Country, related_name='place_groups', blank=True)
+    member_regions = models.ManyToManyField(Region, related_name='place_groups', blank=True)
+
+    birth = models.BooleanField(default=True, help_text='Group places of birth')
+    residence = models.BooleanField(default=True, help_text='Group places of residence')
+    death = models.BooleanField(default=True, help_text='Group places of death')
+
+    objects = PlaceGroupManager()
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        super().clean()
+        if bool(self.country) == bool(self.region):
+            raise ValidationError('A group has to be named after either a country or a region.')
+
+    def get_filter(self, place_field):
+        """
+        Return a Q object for finding objects with place_field in the group
+        """
+        if self.region_id:
+            return Q(**{f'{place_field}__region_group': self})
+        return Q(**{f'{place_field}__country_group': self})
+
+    def get_canonical_filter(self, place_field):
+        """
+        Return a Q object for finding objects with place_field in the country or region the group is named after,
+        without the rest of the group
+        """
+        if self.region_id:
+            return Q(**{f'{place_field}__region': self.region_id})
+        return Q(**{f'{place_field}__country': self.country_id})
+
+
+# Signals to keep places' precomputed groups up to date when groups change
+def update_place_groups(sender, action=None, **kwargs):  # pylint: disable=unused-argument
+    # m2m_changed is sent before and after members change, so only update places afterwards
+    if action in (None, 'post_add', 'post_remove', 'post_clear'):
+        PlaceGroup.objects.update_places()
+
+
+post_save.connect(update_place_groups, sender=PlaceGroup)
+m2m_changed.connect(update_place_groups, sender=PlaceGroup.member_countries.through)
+m2m_changed.connect(update_place_groups, sender=PlaceGroup.member_regions.through)
+
+
+def place_contains(ancestor, descendant):
+    """
+    Works with anything that has city_id, county_id, region_id, and country_id, so the whole hierarchy
+    can be built from values_list() rows without instantiating places
+    """
+    if ancestor.country_id != descendant.country_id:
+        return False
+    if ancestor.region_id and ancestor.region_id != descendant.region_id:
+        return False
+    if ancestor.county_id:
+        return ancestor.county_id == descendant.county_id
+    if ancestor.city_id:
+        return ancestor.city_id == descendant.city_id
+    return True
+
+
+class PlaceHierarchyManager(models.Manager):
+
+    def rebuild(self):
+        """
+        Rebuild the whole closure table, returning the number of links created
+        """
+        places = list(Place.objects.values_list('pk', 'city_id', 'county_id', 'region_id', 'country_id', named=True))
+
+        # Index places by each level of the hierarchy, so only places that can possibly be descendants get compared
+        places_by_level = defaultdict(list)
+        for place in places:
+            for level in [('country', place.country_id), ('region', place.region_id), ('county', place.county_id),
+                          ('city', place.city_id)]:
+                if level[1]:
+                    places_by_level[level].append(place)
+
+        links = []
+        for ancestor in places:
+            for descendant in places_by_level[get_place_level(ancestor)]:
+                if place_contains(ancestor, descendant):
+                    links.append(self.model(ancestor_id=ancestor.pk, descendant_id=descendant.pk))
+
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(links, batch_size=5000)
+        bump_data_version('places')
+
+        return len(links)
+
+    def update_for_place(self, place):
+        """
+        Replace the links of a single place with links to the places that contain it and the places in it
+        """
+        ancestors = Place.objects.containing(place).values_list('pk', flat=True)
+        descendants = Place.objects.within(place).exclude(pk=place.pk).values_list('pk', flat=True)
+
+        with transaction.atomic():
+            self.filter(Q(ancestor=place) | Q(descendant=place)).delete()
+            self.bulk_create([self.model(ancestor_id=pk, descendant_id=place.pk) for pk in ancestors] +
+                             [self.model(ancestor_id=place.pk, descendant_id=pk) for pk in descendants])
+        bump_data_version('places')
+
+
+def get_place_level(place):
+    """
+    Return the most specific level of the hierarchy that a place is defined by, as used by place_contains()
+    """
+    if place.county_id:
+        return 'county', place.county_id
+    if place.city_id:
+        return 'city', place.city_id
+    if place.region_id:
+        return 'region', place.region_id
+    return 'country', place.country_id
+
+
+class PlaceHierarchy(models.Model):
+    """
+    Closure table of Place, with a link from every place to itself and to every place in it,
+    so everything in a place can be found with one indexed join instead of rebuilding the hierarchy in each query
+    """
+
+    ancestor = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='ancestor_links')
+
+    objects = PlaceHierarchyManager()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        verbose_name_plural = 'place hierarchy'
+
+    def __str__(self):
+        return f'{self.descendant} in {self.ancestor}'
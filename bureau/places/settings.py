@@ -27,16 +27,6 @@ BUREAU_STATES = [
 
 GEONAMES_USERNAME = os.environ.get('GEONAMES_USERNAME', '')
 
-# Sometimes we want to group Germany, Prussia, Bavaria, Hessia, and Saxony, etc. together, because of inconsistencies
-# in reporting of German places in the sources
-GERMANY_COUNTRY_NAME = 'Germany'
-GERMANY_COUNTRY_NAMES = [GERMANY_COUNTRY_NAME, 'Prussia', 'Bavaria', 'Grand Duchy of Baden', 'Hessia', 'Saxony']
-
-# Sometimes Virginia and West Virginia need to be grouped together, because of inconsistencies in reporting
-# birthplaces in the sources, and because all employees were born before West Virginia was formed
-VIRGINIA_REGION_NAME = 'Virginia'
-VIRGINIA_REGION_NAMES = [VIRGINIA_REGION_NAME, 'West Virginia']
-
 # Only load regions from a country when needed
 LOAD_REGIONS_FROM_COUNTRIES = [
     'US',
@@ -50,3 +40,14 @@ LOAD_CITIES_FROM_COUNTRIES = [
     'UK',
     'US',
 ]
+
+# Local GeoNames index built by the build_geonames_index command (defaults to geonames_index.txt in cities_light's
+# data directory), and whether to use the GeoNames search API when a place isn't found there
+GEONAMES_INDEX_FILE = os.environ.get('GEONAMES_INDEX_FILE', '')
+GEONAMES_REMOTE_FALLBACK = os.environ.get('GEONAMES_REMOTE_FALLBACK', 'True') == 'True'
+
+# How long GeoNames lookups are cached, in seconds, when a place is found and when it isn't, and how many
+# GeoNames search API requests can be made at a time for a batch of lookups
+GEONAMES_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+GEONAMES_NEGATIVE_CACHE_TIMEOUT = 60 * 60 * 24
+GEONAMES_MAX_CONCURRENT_REQUESTS = 4
@@ -1,7 +1,7 @@
 from factory import Faker, LazyAttribute, SubFactory
 from factory.django import DjangoModelFactory
 
-from places.models import City, Country, County, Place, Region
+from places.models import City, Country, County, Place, PlaceGroup, Region
 
 
 class CountryFactory(DjangoModelFactory):
@@ -49,6 +49,17 @@ class PlaceFactory(DjangoModelFactory):
         model = Place
 
 
+class PlaceGroupFactory(DjangoModelFactory):
+    """
+    Base PlaceGroup factory
+    """
+
+    name = Faker('country')
+
+    class Meta:
+        model = PlaceGroup
+
+
 class RegionFactory(DjangoModelFactory):
     """
     Base Region factory
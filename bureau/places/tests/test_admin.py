@@ -10,6 +10,7 @@ from django.urls import reverse
 from places.admin import CityAdmin, InUseListFilter, PopulationListFilter
 from places.models import City, Place
 from places.tests.factories import CityFactory, CountryFactory, CountyFactory, PlaceFactory, RegionFactory
+from utilities.tests.mixins import ChangelistQueriesMixin
 
 
 User = get_user_model()
@@ -266,3 +267,28 @@ class PlaceAdminTestCase(AdminTestCase):
         existing_places_pks.append(place.pk)
         self.assertEqual(place.country, country,
                          "PlaceAdmin.save_model() should get keep Place's country if no city, county, or region set")
+
+
+class ChangelistTestCase(ChangelistQueriesMixin, AdminTestCase):
+    """
+    Test the number of queries for City and Place changelists
+    """
+
+    def test_city_changelist_queries(self):
+        def add_rows():
+            for _ in range(3):
+                city = CityFactory()
+                PlaceFactory(city=city, region=city.region, country=city.country)
+                CityFactory()
+
+        self.assertChangelistQueries(reverse('admin:places_city_changelist'), 11, add_rows)
+
+    def test_place_changelist_queries(self):
+        def add_rows():
+            for _ in range(3):
+                city = CityFactory()
+                PlaceFactory(city=city, region=city.region, country=city.country)
+                county = CountyFactory(state=RegionFactory())
+                PlaceFactory(county=county, region=county.state, country=county.country)
+
+        self.assertChangelistQueries(reverse('admin:places_place_changelist'), 9, add_rows)
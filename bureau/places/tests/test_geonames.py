@@ -0,0 +1,107 @@
+import os
+import tempfile
+
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from places.geonames import build_geonames_index, get_geonames_index, local_geonames_lookup, normalize_name
+
+CITIES = [
+    ['4113607', 'Hamburg', 'Hamburg', '', '33.22818', '-91.79763', 'P', 'PPLA2', 'US', '', 'AR', '003', '', '',
+     '2791', '', '', 'America/Chicago', '2017-03-09'],
+    ['2911298', 'Hamburg', 'Hamburg', '', '53.57532', '10.01534', 'P', 'PPLA', 'DE', '', '04', '00', '', '',
+     '1739117', '', '', 'Europe/Berlin', '2019-09-05'],
+    ['2886242', 'Köln', 'Koeln', '', '50.93333', '6.95', 'P', 'PPLA2', 'DE', '', '07', '053', '', '',
+     '963395', '', '', 'Europe/Berlin', '2019-09-05'],
+    ['4140963', 'Washington', 'Washington', '', '38.89511', '-77.03637', 'P', 'PPLC', 'US', '', 'DC', '001', '', '',
+     '689545', '', '', 'America/New_York', '2019-09-05'],
+]
+COUNTIES = [
+    ['US.AR.041', 'Desha County', 'Desha County', '4101860'],
+    ['US.NC.183', 'Wake County', 'Wake County', '4497286'],
+]
+REGIONS = [
+    ['US.AR', 'Arkansas', 'Arkansas', '4099753'],
+    ['US.NC', 'North Carolina', 'North Carolina', '4482348'],
+    ['DE.04', 'Hamburg', 'Hamburg', '2911297'],
+]
+COUNTRIES = [
+    ['US', 'USA', '840', 'US', 'United States'],
+    ['DE', 'DEU', '276', 'GM', 'Germany'],
+]
+
+
+class GeoNamesIndexTestCase(SimpleTestCase):
+    """
+    Test local GeoNames index
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+
+        paths = {}
+        for name, rows in [('cities', CITIES), ('counties', COUNTIES), ('regions', REGIONS),
+                           ('countries', COUNTRIES)]:
+            paths[name] = os.path.join(self.directory.name, f'{name}.txt')
+            with open(paths[name], 'w', encoding='utf-8') as file:
+                file.write('# comment\n')
+                file.writelines('\t'.join(row) + '\n' for row in rows)
+
+        self.index_path = os.path.join(self.directory.name, 'index.txt')
+        self.count = build_geonames_index(self.index_path, [paths['cities']], [paths['counties']],
+                                          [paths['regions']], [paths['countries']])
+
+        patcher = patch('places.geonames.get_index_path', return_value=self.index_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_normalize_name(self):
+        """
+        normalize_name() should lowercase names and strip accents
+        """
+        self.assertEqual(normalize_name(' Köln '), 'koln')
+
+    def test_build_geonames_index(self):
+        """
+        build_geonames_index() should index cities under their name and ASCII name, and counties
+        """
+        # Köln is indexed as both 'koln' and 'koeln'
+        self.assertEqual(self.count, len(CITIES) + 1 + len(COUNTIES))
+
+    def test_search_prefix(self):
+        """
+        search_prefix() should find all names starting with prefix, with feature codes if passed
+        """
+        index = get_geonames_index()
+        self.assertEqual({entry['geoname_id'] for entry in index.search_prefix('ham')}, {'4113607', '2911298'})
+        self.assertEqual([entry['name'] for entry in index.search_prefix('w')], ['Wake County', 'Washington'])
+        self.assertEqual([entry['name'] for entry in index.search_prefix('w', ['ADM2'])], ['Wake County'])
+        self.assertEqual(list(index.search_prefix('zzz')), [])
+
+    def test_local_geonames_lookup(self):
+        """
+        local_geonames_lookup() should return the best match for a search in the GeoNames API format
+        """
+        # Most populous Hamburg, unless the search says which one
+        self.assertEqual(local_geonames_lookup('Hamburg')['geonameId'], 2911298)
+        result = local_geonames_lookup('Hamburg, Arkansas', ['PPLA2'])
+        self.assertEqual(result['geonameId'], 4113607)
+        self.assertEqual(result['adminName1'], 'Arkansas')
+        self.assertEqual(result['countryName'], 'United States')
+        self.assertEqual(result['population'], 2791)
+
+        self.assertEqual(local_geonames_lookup('Koln, Germany')['toponymName'], 'Köln')
+        self.assertEqual(local_geonames_lookup('Wake, North Carolina', ['ADM2']), None,
+                         'Lookup should only find names equal to the first part of the search')
+        self.assertEqual(local_geonames_lookup('Wake County, North Carolina', ['ADM2'])['fcode'], 'ADM2')
+        self.assertIsNone(local_geonames_lookup('Washington', ['ADM2']))
+
+    def test_no_index(self):
+        """
+        local_geonames_lookup() should return None if the index hasn't been built
+        """
+        with patch('places.geonames.get_index_path', return_value=os.path.join(self.directory.name, 'none.txt')):
+            self.assertIsNone(get_geonames_index())
+            self.assertIsNone(local_geonames_lookup('Hamburg'))
@@ -0,0 +1,88 @@
+import os
+import tempfile
+
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from places.importer import import_cities, import_countries, import_regions
+from places.models import City, Country, Region
+from places.tests.factories import RegionFactory
+
+COUNTRIES = [
+    ['US', 'USA', '840', 'US', 'United States', 'Washington', '9629091', '310232863', 'NA', '.us', 'USD', 'Dollar',
+     '1', '', '', 'en-US', '6252001', 'CA,MX,CU', ''],
+    ['DE', 'DEU', '276', 'GM', 'Germany', 'Berlin', '357021', '81802257', 'EU', '.de', 'EUR', 'Euro',
+     '49', '', '', 'de', '2921044', '', ''],
+    ['FR', 'FRA', '250', 'FR', 'France', 'Paris', '547030', '64768389', 'EU', '.fr', 'EUR', 'Euro',
+     '33', '', '', 'fr-FR', '3017382', '', ''],
+]
+REGIONS = [
+    ['US.AR', 'Arkansas', 'Arkansas', '4099753'],
+    ['US.VT', 'Vermont', 'Vermont', '5242283'],
+    ['DE.04', 'Hamburg', 'Hamburg', '2911297'],
+]
+CITIES = [
+    ['4113607', 'Hamburg', 'Hamburg', '', '33.22818', '-91.79763', 'P', 'PPLA2', 'US', '', 'AR', '003', '', '',
+     '2791', '', '', 'America/Chicago', '2017-03-09'],
+    ['4113608', 'Hamburg Lake', 'Hamburg Lake', '', '33.2', '-91.7', 'H', 'LK', 'US', '', 'AR', '003', '', '',
+     '0', '', '', 'America/Chicago', '2017-03-09'],
+    ['2911298', 'Hamburg', 'Hamburg', '', '53.57532', '10.01534', 'P', 'PPLA', 'DE', '', '04', '00', '', '',
+     '1739117', '', '', 'Europe/Berlin', '2019-09-05'],
+]
+
+
+def write_geonames_file(directory, name, rows):
+    path = os.path.join(directory, f'{name}.txt')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('# comment\n')
+        file.writelines('\t'.join(row) + '\n' for row in rows)
+    return path
+
+
+@patch('places.importer.INCLUDE_COUNTRIES', ['US', 'DE'])
+@patch('places.importer.LOAD_REGIONS_FROM_COUNTRIES', ['US'])
+@patch('places.importer.LOAD_CITIES_FROM_COUNTRIES', ['US'])
+@patch('places.importer.BUREAU_STATES', ['AR'])
+class ImporterTestCase(TestCase):
+    """
+    Test bulk import of GeoNames countries, regions, and cities
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+
+    def test_import(self):
+        """
+        Only countries, regions, and cities from the countries in settings should be imported,
+        and Bureau states should get bureau_operations set
+        """
+        self.assertEqual(import_countries(write_geonames_file(self.directory.name, 'countries', COUNTRIES)), (3, 2))
+        self.assertEqual(set(Country.objects.values_list('code2', flat=True)), {'US', 'DE'})
+
+        self.assertEqual(import_regions(write_geonames_file(self.directory.name, 'regions', REGIONS)), (3, 2))
+        arkansas = Region.objects.get(geoname_code='AR')
+        self.assertTrue(arkansas.bureau_operations, 'Region in BUREAU_STATES should get bureau_operations set')
+        self.assertEqual(arkansas.display_name, 'Arkansas, United States')
+        self.assertFalse(Region.objects.get(geoname_code='VT').bureau_operations)
+
+        self.assertEqual(import_cities(write_geonames_file(self.directory.name, 'cities', CITIES)), (3, 1))
+        hamburg = City.objects.get()
+        self.assertEqual(hamburg.region, arkansas)
+        self.assertEqual(hamburg.display_name, 'Hamburg, Arkansas, United States')
+        self.assertIn('hamburgarkansasunitedstates', hamburg.search_names)
+
+    def test_reimport(self):
+        """
+        Importing again should update existing places, without unsetting bureau_operations set by hand
+        """
+        import_countries(write_geonames_file(self.directory.name, 'countries', COUNTRIES))
+        vermont = RegionFactory(name='Vermont (old)', geoname_id=5242283, geoname_code='VT',
+                                country=Country.objects.get(code2='US'), bureau_operations=True)
+
+        import_regions(write_geonames_file(self.directory.name, 'regions', REGIONS))
+        vermont.refresh_from_db()
+        self.assertEqual(vermont.name, 'Vermont')
+        self.assertTrue(vermont.bureau_operations, "Import shouldn't unset bureau_operations")
+        self.assertEqual(Region.objects.filter(geoname_code='VT').count(), 1)
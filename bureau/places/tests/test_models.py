@@ -5,8 +5,13 @@ from django.core.exceptions import ValidationError
 from django.test import override_settings, TestCase
 
 from personnel.tests.factories import EmployeeFactory
-from places.models import filter_city_import, filter_region_import, set_region_fields
-from places.tests.factories import CityFactory, CountryFactory, CountyFactory, PlaceFactory, RegionFactory
+from places.models import (
+    City, Country, filter_city_import, filter_region_import, get_bounding_box, haversine_distance, Place,
+    PlaceHierarchy, Region, set_region_fields
+)
+from places.tests.factories import (
+    CityFactory, CountryFactory, CountyFactory, PlaceFactory, PlaceGroupFactory, RegionFactory
+)
 
 
 class CountyTestCase(TestCase):
@@ -27,6 +32,77 @@ class CountyTestCase(TestCase):
         self.assertTrue(county.state.name in str(county))
 
 
+class CityManagerTestCase(TestCase):
+    """
+    Test proximity search of cities
+    """
+
+    def setUp(self):
+        mississippi = RegionFactory(name='Mississippi')
+        louisiana = RegionFactory(name='Louisiana', country=mississippi.country)
+        self.vicksburg = CityFactory(name='Vicksburg', latitude='32.35265', longitude='-90.87788',
+                                     region=mississippi, country=mississippi.country)
+        self.jackson = CityFactory(name='Jackson', latitude='32.29876', longitude='-90.18481',
+                                   region=mississippi, country=mississippi.country)
+        self.natchez = CityFactory(name='Natchez', latitude='31.56044', longitude='-91.40320',
+                                   region=mississippi, country=mississippi.country)
+        self.new_orleans = CityFactory(name='New Orleans', latitude='29.95465', longitude='-90.07507',
+                                       region=louisiana, country=mississippi.country)
+        CityFactory(name='Nowhere', country=mississippi.country)
+
+    def test_haversine_distance(self):
+        """
+        haversine_distance() should return distance in miles between two points
+        """
+        distance = haversine_distance(self.vicksburg.latitude, self.vicksburg.longitude,
+                                      self.jackson.latitude, self.jackson.longitude)
+        self.assertAlmostEqual(distance, 40.5, delta=0.5)
+
+    def test_get_bounding_box(self):
+        """
+        get_bounding_box() should contain every point within the distance
+        """
+        min_latitude, max_latitude, min_longitude, max_longitude = get_bounding_box(32.35265, -90.87788, 50)
+        self.assertTrue(min_latitude < float(self.jackson.latitude) < max_latitude)
+        self.assertTrue(min_longitude < float(self.jackson.longitude) < max_longitude)
+        self.assertEqual(get_bounding_box(89.9, 0, 50)[2:], (-180, 180),
+                         'Bounding box near a pole should include all longitudes')
+
+    def test_within_radius(self):
+        """
+        within_radius() should return distances of cities within radius of a point
+        """
+        distances = City.objects.within_radius(self.vicksburg.latitude, self.vicksburg.longitude, 50)
+        self.assertEqual(set(distances), {self.vicksburg.pk, self.jackson.pk})
+        self.assertEqual(distances[self.vicksburg.pk], 0)
+
+        distances = City.objects.within_radius(self.vicksburg.latitude, self.vicksburg.longitude, 100)
+        self.assertEqual(set(distances), {self.vicksburg.pk, self.jackson.pk, self.natchez.pk})
+
+    def test_nearest(self):
+        """
+        nearest() should return the nearest cities, nearest first
+        """
+        cities = City.objects.nearest(self.vicksburg.latitude, self.vicksburg.longitude, 3)
+        self.assertEqual(cities, [self.vicksburg, self.jackson, self.natchez])
+        self.assertAlmostEqual(cities[1].distance, 40.5, delta=0.5)
+
+        self.assertEqual(len(City.objects.nearest(self.vicksburg.latitude, self.vicksburg.longitude, 10)), 4,
+                         'nearest() should only return cities with coordinates')
+
+    def test_place_near(self):
+        """
+        Place.objects.near() should return places in cities within radius of a place's city
+        """
+        vicksburg = PlaceFactory(city=self.vicksburg)
+        jackson = PlaceFactory(city=self.jackson)
+        PlaceFactory(city=self.new_orleans)
+
+        self.assertEqual(set(Place.objects.near(vicksburg, 50)), {vicksburg, jackson})
+        self.assertFalse(Place.objects.near(PlaceFactory(region=self.vicksburg.region), 50).exists(),
+                         "Place.objects.near() shouldn't return anything for a place without coordinates")
+
+
 class ImportTestCase(TestCase):
     """
     Test import of City and Region by cities_light
@@ -184,6 +260,174 @@ class PlaceTestCase(TestCase):
         self.assertEqual(place.country, region.country,
                          "Place.save() should get Place's country from its region.country")
 
+    def test_display_names(self):
+        """
+        Place display names should be stored on save and updated when anything the place is in gets renamed
+        """
+        us = CountryFactory(name='United States')
+        georgia = RegionFactory(name='Georgia', country=us)
+        jonesboro = PlaceFactory(city=CityFactory(name='Jonesboro', region=georgia, country=us))
+        clayton = PlaceFactory(county=CountyFactory(name='Clayton County', state=georgia, country=us))
+
+        self.assertEqual(jonesboro.display_name, 'Jonesboro, Georgia, United States')
+        self.assertEqual(jonesboro.display_name_without_country, 'Jonesboro, Georgia')
+
+        place = Place.objects.get(pk=jonesboro.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(place), 'Jonesboro, Georgia, United States',
+                             'Rendering a place should not need any more queries')
+            self.assertEqual(place.name_without_country(), 'Jonesboro, Georgia')
+
+        georgia = Region.objects.get(pk=georgia.pk)
+        georgia.name = 'Georgia Territory'
+        georgia.save()
+        jonesboro.refresh_from_db()
+        clayton.refresh_from_db()
+        self.assertEqual(jonesboro.display_name, 'Jonesboro, Georgia Territory, United States',
+                         'Renaming a region should update the names of places in it')
+        self.assertEqual(clayton.display_name, 'Clayton County, Georgia Territory, United States',
+                         'Renaming a region should update the names of counties in it')
+
+        us = Country.objects.get(pk=us.pk)
+        us.name = 'United States of America'
+        us.save()
+        jonesboro.refresh_from_db()
+        self.assertEqual(jonesboro.display_name, 'Jonesboro, Georgia Territory, United States of America',
+                         'Renaming a country should update the names of places in it')
+        self.assertEqual(jonesboro.display_name_without_country, 'Jonesboro, Georgia Territory')
+        self.assertEqual(str(jonesboro.city), 'Jonesboro, Georgia Territory, United States of America',
+                         'Renaming a country should update the names of cities in it')
+
+
+class PlaceGroupTestCase(TestCase):
+    """
+    Test PlaceGroup model and the groups precomputed on Place
+    """
+
+    def setUp(self):
+        self.germany = PlaceFactory(country=CountryFactory(name='Germany'))
+        self.prussia = PlaceFactory(country=CountryFactory(name='Prussia'))
+        self.virginia = PlaceFactory(region=RegionFactory(name='Virginia'))
+        self.west_virginia = PlaceFactory(region=RegionFactory(name='West Virginia', country=self.virginia.country))
+
+        self.germany_group = PlaceGroupFactory(name='Germany', country=self.germany.country)
+        self.germany_group.member_countries.add(self.prussia.country)
+        self.virginia_group = PlaceGroupFactory(name='Virginia', region=self.virginia.region, death=False)
+        self.virginia_group.member_regions.add(self.west_virginia.region)
+
+    def test_update_places(self):
+        """
+        Changing a group or its members should update the groups of existing places
+        """
+        for place in [self.germany, self.prussia, self.virginia, self.west_virginia]:
+            place.refresh_from_db()
+        self.assertEqual(self.germany.country_group, self.germany_group)
+        self.assertEqual(self.prussia.country_group, self.germany_group)
+        self.assertEqual(self.virginia.region_group, self.virginia_group)
+        self.assertEqual(self.west_virginia.region_group, self.virginia_group)
+        self.assertIsNone(self.virginia.country_group)
+
+        self.germany_group.member_countries.remove(self.prussia.country)
+        self.prussia.refresh_from_db()
+        self.assertIsNone(self.prussia.country_group, 'Place should be removed from group with its country')
+
+    def test_save(self):
+        """
+        A new Place should get the groups of its country and region
+        """
+        cologne = PlaceFactory(city=CityFactory(name='Cologne', country=self.prussia.country))
+        self.assertEqual(cologne.country_group, self.germany_group)
+
+        wheeling = PlaceFactory(
+            city=CityFactory(name='Wheeling', region=self.west_virginia.region, country=self.virginia.country)
+        )
+        self.assertEqual(wheeling.region_group, self.virginia_group)
+
+    def test_get_group(self):
+        """
+        get_group() should only return a group for the place it's named after, in the contexts it applies to
+        """
+        for place in [self.germany, self.prussia, self.virginia, self.west_virginia]:
+            place.refresh_from_db()
+
+        self.assertEqual(self.germany.get_group('death'), self.germany_group)
+        self.assertIsNone(self.prussia.get_group('birth'), "Place shouldn't stand for a group it's only a member of")
+        self.assertEqual(self.virginia.get_group('birth'), self.virginia_group)
+        self.assertIsNone(self.virginia.get_group('death'), "Place shouldn't stand for a group that doesn't apply")
+
+        richmond = PlaceFactory(city=CityFactory(name='Richmond', region=self.virginia.region,
+                                                 country=self.virginia.country))
+        self.assertIsNone(richmond.get_group('birth'), "City shouldn't stand for the group of its region")
+
+
+class PlaceHierarchyTestCase(TestCase):
+    """
+    Test PlaceHierarchy closure table and PlaceManager.containing() and within()
+    """
+
+    def setUp(self):
+        us = CountryFactory(name='United States')
+        self.us = PlaceFactory(country=us)
+        self.alabama = PlaceFactory(region=RegionFactory(name='Alabama', country=us))
+        self.bacon_level = PlaceFactory(city=CityFactory(name='Bacon Level', region=self.alabama.region, country=us))
+        self.randolph_county = PlaceFactory(
+            county=CountyFactory(name='Randolph', state=self.alabama.region, country=us)
+        )
+        self.georgia = PlaceFactory(region=RegionFactory(name='Georgia', country=us))
+        self.ireland = PlaceFactory(country=CountryFactory(name='Ireland'))
+
+    def get_links(self):
+        return set(PlaceHierarchy.objects.values_list('ancestor', 'descendant'))
+
+    def test_containing(self):
+        """
+        containing() should return the place itself and every place that contains it
+        """
+        self.assertSetEqual(set(Place.objects.containing(self.bacon_level)), {self.us, self.alabama, self.bacon_level})
+        self.assertSetEqual(set(Place.objects.containing(self.alabama)), {self.us, self.alabama})
+        self.assertSetEqual(set(Place.objects.containing(self.ireland)), {self.ireland})
+
+    def test_within(self):
+        """
+        within() should return the place itself and every place in it
+        """
+        self.assertSetEqual(set(Place.objects.within(self.alabama)),
+                            {self.alabama, self.bacon_level, self.randolph_county})
+        self.assertSetEqual(set(Place.objects.within(self.randolph_county)), {self.randolph_county})
+        self.assertNotIn(self.ireland, Place.objects.within(self.us))
+
+    def test_save(self):
+        """
+        Saving a Place should link it to the places that contain it and the places in it
+        """
+        self.assertIn((self.us.pk, self.bacon_level.pk), self.get_links())
+        self.assertIn((self.alabama.pk, self.randolph_county.pk), self.get_links())
+        self.assertIn((self.georgia.pk, self.georgia.pk), self.get_links())
+        self.assertNotIn((self.georgia.pk, self.bacon_level.pk), self.get_links())
+
+        # Moving a place to another state should move its links along with it
+        self.bacon_level.city.region = self.georgia.region
+        self.bacon_level.city.save()
+        self.bacon_level.save()
+        self.assertIn((self.georgia.pk, self.bacon_level.pk), self.get_links())
+        self.assertNotIn((self.alabama.pk, self.bacon_level.pk), self.get_links())
+
+        # A place created after the places that contain it should become their descendant
+        city_in_county = PlaceFactory(county=self.randolph_county.county,
+                                      city=CityFactory(region=self.alabama.region, country=self.us.country))
+        self.assertIn((self.randolph_county.pk, city_in_county.pk), self.get_links())
+        self.assertIn((self.alabama.pk, city_in_county.pk), self.get_links())
+
+    def test_rebuild(self):
+        """
+        rebuild() should create the same links that are kept up to date when places are saved
+        """
+        expected_links = self.get_links()
+        PlaceHierarchy.objects.all().delete()
+
+        self.assertEqual(PlaceHierarchy.objects.rebuild(), len(expected_links))
+        self.assertSetEqual(self.get_links(), expected_links)
+
 
 class RegionTestCase(TestCase):
     """
@@ -19,7 +19,7 @@ class BureauStateDetailViewTemplateTestCase(TestCase):
 
         # If no employees/stats/assignment places, employee count should be 0 and there should be
         # "No statistics for this location" and "No assignments found"
-        context = {'object': self.state}
+        context = {'object': self.state, 'employee_count': 0}
         rendered = render_to_string(self.template, context)
         # pylint: disable=consider-using-f-string
         expected_page_header = page_header.format(state=self.state, employee_count=0, employees='employees')
@@ -33,7 +33,7 @@ class BureauStateDetailViewTemplateTestCase(TestCase):
         # One employee: employee count should be "1 employee"
         employee1 = EmployeeFactory(last_name='Butts', first_name='Simeon')
         employee1.bureau_states.add(self.state)
-        context = {'object': self.state}
+        context = {'object': self.state, 'employee_count': 1}
         rendered = render_to_string(self.template, context)
         expected_page_header = page_header.format(state=self.state, employee_count=1, employees='employee')
         self.assertInHTML(expected_page_header, rendered)
@@ -41,6 +41,7 @@ class BureauStateDetailViewTemplateTestCase(TestCase):
         # Two employees: employee count should be "2 employees"
         employee2 = EmployeeFactory(last_name='Bishop', first_name='William')
         employee2.bureau_states.add(self.state)
+        context = {'object': self.state, 'employee_count': 2}
         rendered = render_to_string(self.template, context)
         expected_page_header = page_header.format(state=self.state, employee_count=2, employees='employees')
         self.assertInHTML(expected_page_header, rendered)
@@ -2,11 +2,16 @@ import json
 
 from unittest.mock import Mock, patch
 
+import requests
+
 from django.conf import settings
+from django.core.cache import cache
 from django.test import override_settings, TestCase
 
 from places.tests.factories import CountryFactory, PlaceFactory, RegionFactory
-from places.utils import geonames_city_lookup, geonames_county_lookup, geonames_lookup, get_place_or_none
+from places.utils import (
+    geonames_city_lookup, geonames_county_lookup, geonames_lookup, geonames_lookups, get_place_or_none
+)
 
 
 class GeonamesLookupTestCase(TestCase):
@@ -14,6 +19,9 @@ class GeonamesLookupTestCase(TestCase):
     Tests for GeoNames lookups
     """
 
+    def setUp(self):
+        cache.clear()
+
     @patch('places.utils.geonames_lookup', autospec=True)
     def test_geonames_city_lookup(self, mock_geonames_lookup):
         """
@@ -34,9 +42,10 @@ class GeonamesLookupTestCase(TestCase):
         mock_geonames_lookup.assert_called_with(search_text, ['ADM2'])
 
     @override_settings(GEONAMES_USERNAME='test_username')
-    def test_geonames_lookup(self):
+    @patch('places.utils.local_geonames_lookup', autospec=True, return_value=None)
+    def test_geonames_lookup(self, mock_local_geonames_lookup):  # pylint: disable=unused-argument
         """
-        geonames_lookup() should call requests.get()
+        geonames_lookup() should call requests.get() if place isn't found in local GeoNames index
         """
         state = RegionFactory(name='Arkansas', country=CountryFactory(name='United States'))
         search_text = 'Hamburg, Arkansas'
@@ -67,6 +76,7 @@ class GeonamesLookupTestCase(TestCase):
             "totalResultsCount": 0,
         }
 
+        cache.clear()
         with patch('requests.get', autospec=True,
                    return_value=Mock(text=json.dumps(response_content), status_code=200)):
             result = geonames_lookup(search_text, feature_codes=settings.CITIES_LIGHT_INCLUDE_CITY_TYPES)
@@ -94,12 +104,70 @@ class GeonamesLookupTestCase(TestCase):
                           "fcodeName": "seat of a second-order administrative division",
                           "adminName1": "Unknown State", "lat": "33.22818", "fcode": "PPLA2"}]
         }
+        cache.clear()
         with patch('requests.get', autospec=True,
                    return_value=Mock(text=json.dumps(response_content), status_code=200)) as mock_requests_get:
             result = geonames_lookup(search_text, feature_codes=settings.CITIES_LIGHT_INCLUDE_CITY_TYPES)
             self.assertIsNone(result['country'])
             self.assertIsNone(result['state'])
 
+    @patch('places.utils.local_geonames_lookup', autospec=True)
+    def test_geonames_lookup_local(self, mock_local_geonames_lookup):
+        """
+        If place is found in local GeoNames index, geonames_lookup() shouldn't call requests.get()
+        """
+        state = RegionFactory(name='Arkansas', country=CountryFactory(name='United States'))
+        mock_local_geonames_lookup.return_value = {
+            'geonameId': 4113607, 'toponymName': 'Hamburg', 'adminName1': 'Arkansas', 'countryName': 'United States',
+            'lat': '33.22818', 'lng': '-91.79763', 'population': 2791, 'fcode': 'PPLA2',
+        }
+
+        with patch('requests.get', autospec=True) as mock_requests_get:
+            result = geonames_lookup('Hamburg, Arkansas', feature_codes=settings.CITIES_LIGHT_INCLUDE_CITY_TYPES)
+            self.assertEqual(mock_requests_get.call_count, 0,
+                             "GeoNames API shouldn't be called if place found in local GeoNames index")
+        self.assertEqual(result['name'], 'Hamburg')
+        self.assertEqual(result['state'], state)
+        self.assertEqual(result['geoname_id'], 4113607)
+
+    @patch('places.utils.local_geonames_lookup', autospec=True, return_value=None)
+    def test_geonames_lookups(self, mock_local_geonames_lookup):  # pylint: disable=unused-argument
+        """
+        geonames_lookups() should search once for each distinct search, and cache results, including failures,
+        but not request errors
+        """
+        state = RegionFactory(name='Arkansas', country=CountryFactory(name='United States'))
+        found = {"totalResultsCount": 1,
+                 "geonames": [{"geonameId": 4113607, "toponymName": "Hamburg", "adminName1": "Arkansas",
+                               "countryName": "United States", "lat": "33.22818", "lng": "-91.79763",
+                               "population": 2791, "fcode": "PPLA2"}]}
+        not_found = {"totalResultsCount": 0}
+
+        def get(url, timeout):  # pylint: disable=unused-argument
+            content = found if 'hamburg' in url.lower() else not_found
+            return Mock(text=json.dumps(content), status_code=200)
+
+        searches = ['Hamburg, Arkansas', 'hamburg,  arkansas', 'Nowhere, Arkansas']
+        with patch('requests.get', autospec=True, side_effect=get) as mock_requests_get:
+            results = geonames_lookups(searches)
+            self.assertEqual(mock_requests_get.call_count, 2,
+                             'GeoNames API should be called once for searches that are the same when normalized')
+            self.assertEqual(results['Hamburg, Arkansas']['state'], state)
+            self.assertEqual(results['hamburg,  arkansas']['geoname_id'], 4113607)
+            self.assertEqual(results['Nowhere, Arkansas'], {'alternate_names': not_found})
+
+            mock_requests_get.reset_mock()
+            results = geonames_lookups(searches)
+            self.assertEqual(mock_requests_get.call_count, 0,
+                             "GeoNames API shouldn't be called for cached results, found or not")
+            self.assertEqual(results['Hamburg, Arkansas']['state'], state)
+
+        with patch('requests.get', autospec=True, side_effect=requests.Timeout) as mock_requests_get:
+            result = geonames_lookup('Timeout, Arkansas')
+            self.assertIn('error', result['alternate_names'])
+            geonames_lookup('Timeout, Arkansas')
+            self.assertEqual(mock_requests_get.call_count, 2, "Failed GeoNames API requests shouldn't be cached")
+
 
 class GetPlaceOrNoneTestCase(TestCase):
     """
@@ -1,17 +1,19 @@
+import csv
+
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.test import RequestFactory, SimpleTestCase, TestCase
 from django.urls import reverse
 
 from assignments.tests.factories import AssignmentFactory
 from medical.tests.factories import AilmentFactory, AilmentTypeFactory
-from personnel.models import Employee
 from personnel.tests.factories import EmployeeFactory
 from places.forms import GeoNamesLookupForm
-from places.tests.factories import CityFactory, CountyFactory, PlaceFactory, RegionFactory
+from places.tests.factories import BureauStateFactory, CityFactory, CountyFactory, PlaceFactory, RegionFactory
 from places.views import (
     BureauStateDetailView, BureauStateListView, GeoNamesCityLookupView, GeoNamesCountyLookupView,
-    GeoNamesLookupBaseView, get_float_format, get_number_employees_born_in_bureau_state
+    GeoNamesLookupBaseView, get_float_format
 )
 
 
@@ -152,6 +154,54 @@ class BureauStateDetailViewTestCase(TestCase):
         self.assertEqual(mock_get_float_format.call_count, len(returned_stats_labels) - 2,
                          'get_stats() should call get_float_format() for all but 2 stats')
 
+    def test_stats_queries(self):
+        """
+        The stats and the employee count should be computed in the same number of queries however many employees,
+        ailment types and ailments there are
+        """
+        for _ in range(3):
+            employee = EmployeeFactory(vrc=True)
+            employee.bureau_states.add(self.state)
+            employee.ailments.add(AilmentFactory(type=AilmentTypeFactory()), AilmentFactory())
+
+        # Request savepoint and release, state, place, stats, ailments, ailment types and their ailments
+        with self.assertNumQueries(8):
+            response = self.client.get(self.state_url)
+
+        self.assertEqual(response.context['employee_count'], 3,
+                         "BureauStateDetailView context 'employee_count' should be the number of employees")
+        self.assertIn(('% VRC', '100.0'), response.context['stats'],
+                      'BureauStateDetailView should return stats of employees in state')
+
+
+class BureauStateStatsExportViewTestCase(TestCase):
+    """
+    Test BureauStateStatsExportView
+    """
+
+    def test_get(self):
+        """
+        It should return a CSV file with the stats of each Bureau state
+        """
+        alabama = BureauStateFactory(name='Alabama')
+        BureauStateFactory(name='Georgia')
+        RegionFactory(name='Michigan')
+        employee = EmployeeFactory(former_slave=True)
+        employee.bureau_states.add(alabama)
+
+        response = self.client.get(reverse('places:bureau_state_stats_export'))
+        self.assertEqual(response['Content-Type'], 'text/csv',
+                         'BureauStateStatsExportView should return a CSV file')
+
+        rows = list(csv.reader(response.content.decode().splitlines()))
+        self.assertEqual(rows[0][:4], ['State', 'Employees', 'Avg. age in 1865', 'Median age in 1865'],
+                         'BureauStateStatsExportView should have a header row of stats labels')
+        self.assertListEqual([row[0] for row in rows[1:]], ['Alabama', 'Georgia'],
+                             'BureauStateStatsExportView should have a row for each Bureau state')
+        self.assertEqual(rows[1][1], '1', 'BureauStateStatsExportView should have number of employees in state')
+        self.assertEqual(rows[1][rows[0].index('Former slaves')], '1',
+                         'BureauStateStatsExportView should have stats of employees in state')
+
 
 class BureauStateListViewTestCase(TestCase):
     """
@@ -160,16 +210,54 @@ class BureauStateListViewTestCase(TestCase):
 
     def test_queryset(self):
         """
-        BureauStateListView's queryset should contain all states with Bureau operations
+        BureauStateListView's queryset should contain the summaries of all states with Bureau operations
         """
-
+        cache.clear()
         tennessee = RegionFactory(name='Tennessee', bureau_operations=True)
         RegionFactory(name='Michigan', bureau_operations=False)
 
         request = RequestFactory().get('/')
         view = BureauStateListView(kwargs={}, object_list=[], request=request)
-        self.assertSetEqual(set(view.get_queryset()), {tennessee},
-                            'BureauStateListView should contain all states with Bureau operations')
+        self.assertListEqual([summary['pk'] for summary in view.get_queryset()], [tennessee.pk],
+                             'BureauStateListView should contain all states with Bureau operations')
+
+    def test_get_context_data(self):
+        """
+        state_summaries should contain summary metrics of each Bureau state, sorted by the 'sort' parameter,
+        and be cached until employees, assignments or regions change
+        """
+        cache.clear()
+        url = reverse('places:bureau_state_list')
+        alabama = BureauStateFactory(name='Alabama')
+        georgia = BureauStateFactory(name='Georgia')
+        for _ in range(2):
+            employee = EmployeeFactory(vrc=True)
+            employee.bureau_states.add(georgia)
+        assignment = AssignmentFactory(start_date='1866-03', end_date='1868')
+        assignment.bureau_states.add(alabama)
+
+        response = self.client.get(url)
+        summaries = response.context['state_summaries']
+        self.assertListEqual([summary['name'] for summary in summaries], ['Alabama', 'Georgia'],
+                             'BureauStateListView should sort states by name by default')
+        self.assertEqual((summaries[0]['assignment_count'], summaries[0]['first_year'], summaries[0]['last_year']),
+                         (1, 1866, 1868), "BureauStateListView should have states' assignments and active years")
+        self.assertEqual((summaries[1]['employee_count'], summaries[1]['percent_vrc']), (2, 100),
+                         "BureauStateListView should have states' employee count and % VRC")
+
+        response = self.client.get(url, {'sort': '-employee_count'})
+        self.assertListEqual([summary['name'] for summary in response.context['state_summaries']],
+                             ['Georgia', 'Alabama'], "BureauStateListView should sort states by 'sort' parameter")
+
+        # Cached, so only the request's savepoint and its release
+        with self.assertNumQueries(2):
+            self.client.get(url, {'sort': 'first_year'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.bureau_states.add(alabama)
+        response = self.client.get(url)
+        self.assertEqual(response.context['state_summaries'][0]['employee_count'], 1,
+                         'BureauStateListView should be updated when employees change')
 
 
 class GeoNamesLookupBaseViewTestCase(SimpleTestCase):
@@ -241,42 +329,3 @@ class GetFloatFormatTestCase(SimpleTestCase):
                          'get_float_format() should return number formatted with 2 decimal places')
         self.assertEqual(get_float_format(100, 2), '100',
                          'get_float_format() should return number formatted with no decimal places if divisible by 100')
-
-
-class GetNumberEmployeesBornInBureauStateTestCase(TestCase):
-    """
-    get_number_employees_born_in_bureau_state(employees, bureau_state) should return number of employees
-    born in bureau_state, or in District of Columbia if it's Bureau Headquarters
-    """
-
-    def setUp(self):
-        self.bureau_headquarters = RegionFactory(bureau_headquarters=True)
-        self.state = RegionFactory(name='Peach State')
-
-        # Employees born in DC
-        self.number_employees_born_in_dc = 2
-        district_of_columbia = PlaceFactory(region=RegionFactory(name='District of Columbia'))
-        for _ in range(self.number_employees_born_in_dc):
-            EmployeeFactory(place_of_birth=district_of_columbia)
-
-        # Employees born in state
-        self.number_employees_born_in_state = 3
-        state = PlaceFactory(region=self.state)
-        for _ in range(self.number_employees_born_in_state):
-            EmployeeFactory(place_of_birth=state)
-
-        # All employees
-        self.employees = Employee.objects.all()
-
-    def test_get_number_employees_born_in_bureau_state(self):
-        # get_number_employees_born_in_bureau_state() should return number of employees
-        # born in that state, if it's a state and not Bureau Headquarters
-        self.assertEqual(get_number_employees_born_in_bureau_state(self.employees, self.state),
-                         self.number_employees_born_in_state,
-                         'get_number_employees_born_in_bureau_state() should return number of employees born in state')
-
-        # get_number_employees_born_in_bureau_state() should return number of employees
-        # born in District of Columbia, if "state" is Bureau Headquarters
-        self.assertEqual(get_number_employees_born_in_bureau_state(self.employees, self.bureau_headquarters),
-                         self.number_employees_born_in_dc,
-                         'get_number_employees_born_in_bureau_state() should return number of employees born in DC')
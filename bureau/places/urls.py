@@ -3,6 +3,7 @@ from django.urls import path
 from bureau.places.views import (
     bureau_state_detail_view,
     bureau_state_list_view,
+    bureau_state_stats_export_view,
     geonames_city_lookup_view,
     geonames_county_lookup_view,
 )
@@ -11,6 +12,7 @@ app_name = "places"
 urlpatterns = [
     path("", view=bureau_state_list_view, name="bureau_state_list"),
     path("<int:pk>/", view=bureau_state_detail_view, name="bureau_state_detail"),
+    path("stats_export", view=bureau_state_stats_export_view, name="bureau_state_stats_export"),
     path("geonames_lookup/city", view=geonames_city_lookup_view, name="geonames_city_lookup"),
     path("geonames_lookup/county", view=geonames_county_lookup_view, name="geonames_county_lookup"),
 ]
@@ -1,12 +1,20 @@
+import hashlib
 import json
+
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlencode
 
 import requests
 
 from django.conf import settings
+from django.core.cache import cache
 
+from places.geonames import local_geonames_lookup, normalize_name
 from places.models import Country, Place, Region
-from places.settings import GEONAMES_USERNAME
+from places.settings import (
+    GEONAMES_CACHE_TIMEOUT, GEONAMES_MAX_CONCURRENT_REQUESTS, GEONAMES_NEGATIVE_CACHE_TIMEOUT, GEONAMES_REMOTE_FALLBACK,
+    GEONAMES_USERNAME
+)
 
 
 def geonames_county_lookup(geonames_search):
@@ -25,9 +33,90 @@ def geonames_city_lookup(geonames_search):
 
 def geonames_lookup(geonames_search, feature_codes=None):
     """
-    Do GeoNames search for search terms and feature codes
+    Do GeoNames search for search terms and feature codes (see geonames_lookups())
+    """
+    return geonames_lookups([geonames_search], feature_codes)[geonames_search]
+
+
+def geonames_lookups(geonames_searches, feature_codes=None):
+    """
+    Do GeoNames searches for a batch of search terms with the same feature codes, returning a dict of results by
+    search terms. Each search is done in the local GeoNames index if it's been built (see places.geonames), otherwise
+    or if nothing's found there with the GeoNames search API (a few requests at a time).
+    Results are cached, including searches that found nothing, for a shorter time
     http://www.geonames.org/export/geonames-search.html
     """
+    keys = {search: get_geonames_cache_key(search, feature_codes) for search in geonames_searches}
+    responses = cache.get_many(set(keys.values()))
+
+    # Only search once for searches that are the same when normalized
+    searches = {key: search for search, key in keys.items() if key not in responses}
+    if searches:
+        new_responses = search_geonames(searches, feature_codes)
+        cache_geonames_responses(new_responses)
+        responses.update(new_responses)
+
+    # Look up all regions and countries in the results at once
+    found = [response['geonames'][0] for response in responses.values() if response.get('geonames')]
+    states = {state.name: state for state in Region.objects.filter(
+        name__in={geonames.get('adminName1') for geonames in found})}
+    countries = {country.name: country for country in Country.objects.filter(
+        name__in={geonames.get('countryName') for geonames in found})}
+
+    results = {}
+    for search, key in keys.items():
+        response = responses[key]
+        if response.get('geonames'):
+            results[search] = get_geonames_result(response['geonames'][0], states, countries)
+        else:
+            results[search] = {'alternate_names': response}
+    return results
+
+
+def search_geonames(searches, feature_codes=None):
+    """
+    Do searches (a dict of search terms by key) in the local GeoNames index, and those not found there with
+    the GeoNames search API, returning a dict of GeoNames responses by key
+    """
+    responses = {}
+    remote_searches = {}
+    for key, search in searches.items():
+        geonames = local_geonames_lookup(search, feature_codes)
+        if geonames:
+            responses[key] = {'geonames': [geonames]}
+        elif GEONAMES_REMOTE_FALLBACK:
+            remote_searches[key] = search
+        else:
+            responses[key] = {'totalResultsCount': 0}
+
+    if remote_searches:
+        with ThreadPoolExecutor(max_workers=GEONAMES_MAX_CONCURRENT_REQUESTS) as executor:
+            remote_responses = executor.map(lambda search: remote_geonames_lookup(search, feature_codes),
+                                            remote_searches.values())
+            responses.update(zip(remote_searches, remote_responses))
+
+    return responses
+
+
+def cache_geonames_responses(responses):
+    cache.set_many({key: response for key, response in responses.items() if response.get('geonames')},
+                   GEONAMES_CACHE_TIMEOUT)
+    # Failed requests (and GeoNames errors, like going over the hourly limit) aren't cached, so they can be tried again
+    cache.set_many({key: response for key, response in responses.items()
+                    if not response.get('geonames') and 'error' not in response and 'status' not in response},
+                   GEONAMES_NEGATIVE_CACHE_TIMEOUT)
+
+
+def get_geonames_cache_key(geonames_search, feature_codes=None):
+    search = ','.join(normalize_name(term) for term in geonames_search.split(','))
+    feature_codes = ','.join(sorted(feature_codes or []))
+    return f'geonames:{hashlib.md5(f"{search}|{feature_codes}".encode()).hexdigest()}'
+
+
+def remote_geonames_lookup(geonames_search, feature_codes=None):
+    """
+    Do search with the GeoNames search API, returning the response, or the error if the request failed
+    """
     params = urlencode({'q': geonames_search, 'name_equals': geonames_search.split(',')[0], 'maxRows': 1,
                         'username': GEONAMES_USERNAME})
 
@@ -36,34 +125,27 @@ def geonames_lookup(geonames_search, feature_codes=None):
         joined_feature_codes = '&'.join([f'featureCode={fc}' for fc in feature_codes])
         params = f'{params}&{joined_feature_codes}'
 
-    response = requests.get(f'http://api.geonames.org/searchJSON?{params}', timeout=5)
-    response = json.loads(response.text)
-
-    geonames = response.get('geonames')
-    if not geonames:
-        return {'alternate_names': response}
+    try:
+        response = requests.get(f'http://api.geonames.org/searchJSON?{params}', timeout=5)
+        return json.loads(response.text)
+    except (requests.RequestException, ValueError) as error:
+        return {'error': str(error)}
 
-    geonames = geonames[0]
 
+def get_geonames_result(geonames, states, countries):
+    """
+    Turn a GeoNames search result into initial data for a City or County, with its state and country
+    from dicts of Regions and Countries by name
+    """
     geoname_id = geonames.get('geonameId')
     name = geonames.get('toponymName')
-    state = geonames.get('adminName1')
-    country = geonames.get('countryName')
+    state = states.get(geonames.get('adminName1'))
+    country = countries.get(geonames.get('countryName'))
     latitude = geonames.get('lat')
     longitude = geonames.get('lng')
     population = geonames.get('population')
     feature_code = geonames.get('fcode')
 
-    try:
-        state = Region.objects.get(name=state)
-    except Region.DoesNotExist:
-        state = None
-
-    try:
-        country = Country.objects.get(name=country)
-    except Country.DoesNotExist:
-        country = None
-
     result = {
         'display_name': f'{name}, {state}, {country}',
         'name': name,
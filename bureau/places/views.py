@@ -1,13 +1,15 @@
+import csv
+
 from django.db.models import Case, CharField, F, When
+from django.http import HttpResponse
 from django.urls import reverse_lazy
-from django.views.generic import DetailView, FormView, ListView
+from django.views.generic import DetailView, FormView, ListView, View
 
 from assignments.models import Assignment
 from medical.models import AilmentType
-from personnel.models import Employee
 from places.forms import GeoNamesLookupForm
 from places.models import Place, Region
-from stats.utils import get_ages_in_year, get_mean, get_median, get_percent
+from stats.utils import get_bureau_state_stats, get_bureau_state_summaries, get_percent
 
 
 class BureauStateListView(ListView):
@@ -16,7 +18,35 @@ class BureauStateListView(ListView):
     slug_field = "name"
     slug_url_kwarg = "name"
     template_name = "places/bureau_state_list.html"
-    queryset = Region.objects.bureau_state()
+    context_object_name = 'state_summaries'
+    # Columns of the table of states, which can be sorted by any of them
+    columns = [
+        ('name', 'State'),
+        ('employee_count', 'Employees'),
+        ('assignment_count', 'Assignments'),
+        ('percent_vrc', '% VRC'),
+        ('percent_usct', '% USCT'),
+        ('first_year', 'Active years'),
+    ]
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort', 'name')
+        return sort if sort.lstrip('-') in dict(self.columns) else 'name'
+
+    def get_queryset(self):
+        """
+        Return the cached summary metrics of each Bureau state, sorted by the 'sort' parameter,
+        so the states don't have to be queried again
+        """
+        return sort_summaries(get_bureau_state_summaries(), self.get_sort())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        context['sort'] = self.get_sort()
+        context['columns'] = self.columns
+
+        return context
 
 
 bureau_state_list_view = BureauStateListView.as_view()
@@ -56,80 +86,52 @@ class BureauStateDetailView(DetailView):
             )
         context['assignment_places'] = annotated_assignment_places_list.order_by(F('annotated_name').asc(
             nulls_first=True))
-        context['stats'] = self.get_stats()
+
+        # Computed once, for the stats and the number of employees in the header
+        state_stats = get_bureau_state_stats([self.object])[self.object.pk]
+        context['employee_count'] = state_stats['employees']
+        context['stats'] = self.get_stats(state_stats)
 
         return context
 
-    def get_stats(self):
+    def get_stats(self, state_stats=None):
         """
         Get employee statistics for that state
         """
-        employees = self.object.employees_employed.all()
-        total_employees = employees.count()
-
-        birthplace_known_count = Employee.objects.birthplace_known(bureau_states=self.object).count()
-
-        # Employees with date of birth filled
-        employees_with_dob = employees.exclude(date_of_birth='')
-        # Age in 1865
-        ages = get_ages_in_year(employees_with_dob, 1865)
-
-        stats = [
-            ('Avg. age in 1865', get_float_format(get_mean(ages), places=1)),
-            ('Median age in 1865', get_float_format(get_median(ages), places=0)),
-            ('% VRC', get_float_format(self.object.percent_vrc_employees())),
-            ('% USCT', get_float_format(
-                get_percent(part=Employee.objects.usct(bureau_states=self.object).count(), total=total_employees))
-             ),
-            ('% Foreign-born', get_float_format(
-                get_percent(part=Employee.objects.foreign_born(bureau_states=self.object).count(),
-                            total=birthplace_known_count))
-             ),
-            ('% Born there', get_float_format(
-                get_percent(part=get_number_employees_born_in_bureau_state(employees, self.object),
-                            total=birthplace_known_count))
-             ),
-            ('% Female', get_float_format(
-                get_percent(part=employees.filter(gender=Employee.Gender.FEMALE).count(), total=total_employees))
-             ),
-            ('% Identified as "colored"', get_float_format(
-                get_percent(part=employees.filter(colored=True).count(), total=total_employees))
-             ),
-            ('% Died during assignment', get_float_format(
-                get_percent(part=employees.filter(died_during_assignment=True).count(), total=total_employees))
-             ),
-            ('Former slaves', employees.filter(former_slave=True).count()),
-            ('% Former slaveholder', get_float_format(
-                get_percent(part=employees.filter(slaveholder=True).count(), total=total_employees))
-             ),
-            ('% Union veterans', get_float_format(
-                get_percent(part=employees.filter(union_veteran=True).count(), total=total_employees))
-             ),
-            ('% Confederate veterans', get_float_format(
-                get_percent(part=employees.filter(confederate_veteran=True).count(), total=total_employees))
-             ),
-            ('Left-hand penmanship contest entrants', employees.filter(penmanship_contest=True).count()),
-        ]
-
-        # Breakdown per AilmentType
-        for ailment_type in AilmentType.objects.all():
-            ailment_type_count = employees.filter(ailments__type=ailment_type).count()
-            stats.append((f'% with {ailment_type}',
-                          get_float_format(get_percent(part=ailment_type_count, total=total_employees))))
-
-            # Breakdown per Ailment, if more than one for the type
-            if ailment_type.ailments.count() > 1:
-                for ailment in ailment_type.ailments.all():
-                    ailment_count = employees.filter(ailments=ailment).count()
-                    stats.append((f'% with {ailment}',
-                                  get_float_format(get_percent(part=ailment_count, total=total_employees))))
-
-        return stats
+        if state_stats is None:
+            state_stats = get_bureau_state_stats([self.object])[self.object.pk]
+
+        return get_labelled_bureau_state_stats(state_stats, AilmentType.objects.prefetch_related('ailments'))
 
 
 bureau_state_detail_view = BureauStateDetailView.as_view()
 
 
+class BureauStateStatsExportView(View):
+    """
+    Export the employee statistics of all Bureau states as a CSV file, one row per state
+    """
+
+    def get(self, request, *args, **kwargs):
+        states = list(Region.objects.bureau_state().order_by('name'))
+        all_stats = get_bureau_state_stats(states)
+        ailment_types = list(AilmentType.objects.prefetch_related('ailments'))
+
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="bureau_state_stats.csv"'
+        writer = csv.writer(response)
+        for index, state in enumerate(states):
+            stats = get_labelled_bureau_state_stats(all_stats[state.pk], ailment_types)
+            if not index:
+                writer.writerow(['State', 'Employees'] + [label for label, _ in stats])
+            writer.writerow([state.name, all_stats[state.pk]['employees']] + [value for _, value in stats])
+
+        return response
+
+
+bureau_state_stats_export_view = BureauStateStatsExportView.as_view()
+
+
 class GeoNamesLookupBaseView(FormView):
 
     form_class = GeoNamesLookupForm
@@ -160,20 +162,53 @@ class GeoNamesCountyLookupView(GeoNamesLookupBaseView):
 geonames_county_lookup_view = GeoNamesCountyLookupView.as_view(extra_context={'lookup_type': 'county'})
 
 
-def get_number_employees_born_in_bureau_state(employees, bureau_state):
+def sort_summaries(summaries, sort):
     """
-    Return the number of state's employees born in that state,
-    using District of Columbia as the birthplace for Bureau Headquarters
+    Return summaries sorted by a field, descending if it starts with '-', with those missing a value last
     """
-    state = bureau_state
+    field = sort.lstrip('-')
+    missing = [summary for summary in summaries if summary[field] is None]
+    present = sorted((summary for summary in summaries if summary[field] is not None),
+                     key=lambda summary: summary[field], reverse=sort.startswith('-'))
+    return present + missing
 
-    if bureau_state.bureau_headquarters:
-        try:
-            state = Region.objects.get(name__icontains='District of Columbia')
-        except Region.DoesNotExist:
-            pass
 
-    return employees.filter(place_of_birth__region__id=state.id).count()
+def get_labelled_bureau_state_stats(state_stats, ailment_types):
+    """
+    Return a list of (label, formatted value) for a state's statistics from get_bureau_state_stats(),
+    with a breakdown per AilmentType, and per Ailment if more than one for the type
+    """
+    total_employees = state_stats['employees']
+
+    def get_percent_format(part, total=total_employees):
+        return get_float_format(get_percent(part=part, total=total))
+
+    stats = [
+        ('Avg. age in 1865', get_float_format(state_stats['mean_age'], places=1)),
+        ('Median age in 1865', get_float_format(state_stats['median_age'], places=0)),
+        ('% VRC', get_percent_format(state_stats['vrc'])),
+        ('% USCT', get_percent_format(state_stats['usct'])),
+        ('% Foreign-born', get_percent_format(state_stats['foreign_born'], total=state_stats['birthplace_known'])),
+        ('% Born there', get_percent_format(state_stats['born_there'], total=state_stats['birthplace_known'])),
+        ('% Female', get_percent_format(state_stats['female'])),
+        ('% Identified as "colored"', get_percent_format(state_stats['colored'])),
+        ('% Died during assignment', get_percent_format(state_stats['died_during_assignment'])),
+        ('Former slaves', state_stats['former_slave']),
+        ('% Former slaveholder', get_percent_format(state_stats['slaveholder'])),
+        ('% Union veterans', get_percent_format(state_stats['union_veteran'])),
+        ('% Confederate veterans', get_percent_format(state_stats['confederate_veteran'])),
+        ('Left-hand penmanship contest entrants', state_stats['penmanship_contest']),
+    ]
+
+    for ailment_type in ailment_types:
+        stats.append((f'% with {ailment_type}', get_percent_format(state_stats['ailment_types'][ailment_type.pk])))
+
+        ailments = ailment_type.ailments.all()
+        if len(ailments) > 1:
+            for ailment in ailments:
+                stats.append((f'% with {ailment}', get_percent_format(state_stats['ailments'][ailment.pk])))
+
+    return stats
 
 
 def get_float_format(number, places=2):
@@ -1,10 +1,19 @@
 from unittest.mock import patch
 
+from partial_date import PartialDate
+
+from django.core.cache import cache
 from django.test import SimpleTestCase, TestCase
 
+from medical.tests.factories import AilmentFactory, AilmentTypeFactory
+from military.tests.factories import RegimentFactory
 from personnel.models import Employee
 from personnel.tests.factories import EmployeeFactory
-from stats.utils import get_ages_at_death, get_ages_in_year, get_mean, get_median, get_percent
+from places.tests.factories import BureauStateFactory, CountryFactory, PlaceFactory, RegionFactory
+from stats.utils import (
+    get_ages_at_death, get_ages_in_year, get_bureau_state_stats, get_bureau_state_summaries, get_mean, get_median,
+    get_percent, get_regiment_stats
+)
 
 
 class GetAgesAtDeathTestCase(TestCase):
@@ -74,3 +83,132 @@ class GetPercentTestCase(SimpleTestCase):
     def test_get_percent(self):
         self.assertEqual(get_percent(part=50, total=100), 50, 'get_percent(part=50, total=100) should return 50')
         self.assertEqual(get_percent(part=50, total=0), 0, 'get_percent(part=50, total=0) should return 0')
+
+
+class GetBureauStateStatsTestCase(TestCase):
+    """
+    get_bureau_state_stats(states) should return employee statistics for each state, in a fixed number of queries
+    """
+
+    def test_get_bureau_state_stats(self):  # pylint: disable=too-many-locals
+        united_states = CountryFactory(name='United States', code2='US')
+        state = BureauStateFactory(name='Palmetto State', country=united_states)
+        bureau_headquarters = BureauStateFactory(name='Bureau Headquarters', bureau_headquarters=True,
+                                                 country=united_states)
+        empty_state = BureauStateFactory(name='Empty State', country=united_states)
+        district_of_columbia = RegionFactory(name='District of Columbia', country=united_states)
+
+        headache = AilmentTypeFactory(name='Headache')
+        migraine = AilmentFactory(name='Migraine', type=headache)
+        tension_headache = AilmentFactory(name='Tension Headache', type=headache)
+
+        born_in_state = EmployeeFactory(date_of_birth='1830', vrc=True, place_of_birth=PlaceFactory(region=state))
+        born_in_state.regiments.add(RegimentFactory(usct=True), RegimentFactory(usct=True))
+        born_in_state.ailments.add(migraine, tension_headache)
+        foreign_born = EmployeeFactory(date_of_birth='1840-05', gender=Employee.Gender.FEMALE,
+                                       place_of_birth=PlaceFactory(country=CountryFactory(name='Ireland', code2='IE')))
+        foreign_born.ailments.add(migraine)
+        unknown = EmployeeFactory(former_slave=True)
+        for employee in [born_in_state, foreign_born, unknown]:
+            employee.bureau_states.add(state)
+
+        born_in_dc = EmployeeFactory(date_of_birth='1845-01-01', place_of_birth=PlaceFactory(
+            region=district_of_columbia))
+        born_in_dc.bureau_states.add(state, bureau_headquarters)
+
+        with self.assertNumQueries(3):
+            stats = get_bureau_state_stats([state, bureau_headquarters, empty_state])
+
+        expected = {
+            'employees': 4, 'birthplace_known': 3, 'foreign_born': 1, 'born_there': 1, 'female': 1, 'usct': 1,
+            'vrc': 1, 'former_slave': 1, 'slaveholder': 0, 'median_age': 25,
+        }
+        for key, value in expected.items():
+            self.assertEqual(stats[state.pk][key], value, f"get_bureau_state_stats() should return state's {key}")
+
+        self.assertAlmostEqual(stats[state.pk]['mean_age'], (35 + 25 + 20) / 3,
+                               msg="get_bureau_state_stats() should return state's mean_age")
+
+        self.assertEqual(stats[state.pk]['ailment_types'][headache.pk], 2,
+                         'get_bureau_state_stats() should count employees with an ailment type once')
+        self.assertEqual(stats[state.pk]['ailments'][migraine.pk], 2,
+                         'get_bureau_state_stats() should count employees with each ailment')
+        self.assertEqual(stats[state.pk]['ailments'][tension_headache.pk], 1,
+                         'get_bureau_state_stats() should count employees with each ailment')
+
+        self.assertEqual(stats[bureau_headquarters.pk]['employees'], 1,
+                         'get_bureau_state_stats() should count employees of each state')
+        self.assertEqual(stats[bureau_headquarters.pk]['born_there'], 1,
+                         'Employees born in District of Columbia should be born there for Bureau Headquarters')
+
+        self.assertEqual(stats[empty_state.pk]['employees'], 0,
+                         'get_bureau_state_stats() should return stats for states without employees')
+        self.assertEqual(stats[empty_state.pk]['mean_age'], 0,
+                         'get_bureau_state_stats() should return 0 for ages of states without employees')
+
+
+class GetBureauStateSummariesTestCase(TestCase):
+    """
+    get_bureau_state_summaries() should return summary metrics of each Bureau state, cached until data changes
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_bureau_state_summaries(self):
+        state = BureauStateFactory(name='Volunteer State')
+        RegionFactory(name='Not a Bureau State')
+        regiment = RegimentFactory(usct=False)
+        for _ in range(4):
+            employee = EmployeeFactory()
+            employee.bureau_states.add(state)
+        employee.regiments.add(regiment)
+
+        summaries = get_bureau_state_summaries()
+        self.assertListEqual([summary['name'] for summary in summaries], ['Volunteer State'],
+                             'get_bureau_state_summaries() should only return Bureau states')
+        self.assertEqual((summaries[0]['employee_count'], summaries[0]['percent_usct']), (4, 0),
+                         'get_bureau_state_summaries() should return number and % USCT of employees')
+        self.assertEqual((summaries[0]['assignment_count'], summaries[0]['first_year']), (0, None),
+                         'get_bureau_state_summaries() should return no assignments or years if there are none')
+
+        with self.assertNumQueries(0):
+            get_bureau_state_summaries()
+
+        # Changing a regiment changes the stats of its employees
+        regiment.usct = True
+        with self.captureOnCommitCallbacks(execute=True):
+            regiment.save()
+        self.assertEqual(get_bureau_state_summaries()[0]['percent_usct'], 25,
+                         'get_bureau_state_summaries() should be updated when regiments change')
+
+
+class GetRegimentStatsTestCase(TestCase):
+    """
+    get_regiment_stats() should return statistics of a regiment's members
+    """
+
+    def test_get_regiment_stats(self):
+        regiment = RegimentFactory()
+        alabama = BureauStateFactory(name='Alabama')
+        georgia = BureauStateFactory(name='Georgia')
+        ailment = AilmentFactory(type=AilmentTypeFactory())
+
+        for date_of_birth, states in [('1840', [alabama]), ('1830-05', [alabama, georgia]), (None, [])]:
+            employee = EmployeeFactory(date_of_birth=PartialDate(date_of_birth) if date_of_birth else None)
+            employee.regiments.add(regiment)
+            employee.bureau_states.add(*states)
+        employee.ailments.add(ailment)
+        EmployeeFactory(date_of_birth=PartialDate('1800')).bureau_states.add(georgia)
+
+        with self.assertNumQueries(2):
+            stats = get_regiment_stats(regiment)
+            bureau_states = [(state.name, state.employees) for state in stats['bureau_states']]
+
+        self.assertEqual((stats['employees'], stats['with_ailments']), (3, 1),
+                         'get_regiment_stats() should count members, and those with ailments')
+        self.assertAlmostEqual(stats['percent_with_ailments'], 100 / 3)
+        self.assertEqual((stats['mean_age'], stats['median_age']), (30, 30),
+                         'get_regiment_stats() should return mean and median age of members with a birth date')
+        self.assertListEqual(bureau_states, [('Alabama', 2), ('Georgia', 1)],
+                             'get_regiment_stats() should return the Bureau states members served in')
@@ -5,7 +5,7 @@ from medical.tests.factories import AilmentFactory, AilmentTypeFactory
 from military.tests.factories import RegimentFactory
 from personnel.models import Employee
 from personnel.tests.factories import EmployeeFactory
-from places.tests.factories import BureauStateFactory, CountryFactory, PlaceFactory, RegionFactory
+from places.tests.factories import BureauStateFactory, CountryFactory, PlaceFactory, PlaceGroupFactory, RegionFactory
 from stats.views import (
     get_foreign_born_stats, get_places_with_pks_for_context, get_state_comparison_stats, get_top_birthplaces,
     get_top_deathplaces
@@ -85,7 +85,7 @@ class GeneralViewTestCase(TestCase):
 
 class GetPlacesWithPksForContextTestCase(TestCase):
     """
-    get_places_with_pks_for_context() should take list of place names (country or region) and counts,
+    get_places_with_pks_for_context() should take list of place ids (region or country) and counts,
     get the corresponding Place, and return list of names, pks, and counts
     """
 
@@ -94,7 +94,7 @@ class GetPlacesWithPksForContextTestCase(TestCase):
         new_york = PlaceFactory(region=RegionFactory(name='New York', country=CountryFactory(name='United States')))
         spain = PlaceFactory(country=CountryFactory(name='Spain'))
 
-        places_input = [('New York', 'United States', 43), (None, 'Spain', 5)]
+        places_input = [(new_york.region.pk, new_york.country.pk, 43), (None, spain.country.pk, 5)]
         expected_output = [('New York', new_york.pk, 43), ('Spain', spain.pk, 5)]
 
         # Compare the lists as sets because order isn't important
@@ -695,6 +695,16 @@ class GetStateComparisonStatsTestCase(TestCase):
                          "There should be no breakdown for an ailment if it's the only one of its type")
 
 
+def create_place_groups(germany, other_german_places, virginia, other_virginia_places):
+    """
+    Group places with Germany for birth and death, and with Virginia for birth only
+    """
+    germany_group = PlaceGroupFactory(name='Germany', country=germany.country)
+    germany_group.member_countries.add(*[place.country for place in other_german_places])
+    virginia_group = PlaceGroupFactory(name='Virginia', region=virginia.region, death=False)
+    virginia_group.member_regions.add(*[place.region for place in other_virginia_places])
+
+
 class GetTopBirthplacesTestCase(TestCase):
     """
     get_top_birthplaces() should return top places where employees were born,
@@ -709,6 +719,7 @@ class GetTopBirthplacesTestCase(TestCase):
         new_york = PlaceFactory(region=RegionFactory(name='New York', country=us))
         virginia = PlaceFactory(region=RegionFactory(name='Virginia', country=us))
         west_virginia = PlaceFactory(region=RegionFactory(name='West Virginia', country=us))
+        create_place_groups(germany, [bavaria, prussia], virginia, [west_virginia])
 
         # 4 employees born in New York, 1 in Germany, 1 in Bavaria, 1 in Prussia, 1 in Virginia, 1 in West Virginia
         for _ in range(4):
@@ -736,6 +747,7 @@ class GetTopDeathplacesTestCase(TestCase):
         new_york = PlaceFactory(region=RegionFactory(name='New York', country=us))
         virginia = PlaceFactory(region=RegionFactory(name='Virginia', country=us))
         west_virginia = PlaceFactory(region=RegionFactory(name='West Virginia', country=us))
+        create_place_groups(germany, [bavaria, prussia], virginia, [west_virginia])
 
         # 4 employees born in New York, 1 in Germany, 1 in Bavaria, 1 in Prussia, 2 in Virginia, 1 in West Virginia
         for _ in range(4):
@@ -1,5 +1,21 @@
 import statistics
 
+from collections import Counter
+from datetime import timezone
+
+from django.core.cache import cache
+from django.db.models import (
+    Aggregate, Avg, Count, DateTimeField, Exists, FloatField, Max, Min, OuterRef, Q, Subquery, Value
+)
+from django.db.models.functions import Cast, Coalesce, ExtractYear
+
+from assignments.models import Assignment
+from personnel.models import Employee
+from places.models import Region
+from utilities.data_version import get_data_version
+
+STATS_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
 
 def get_ages_at_death(employees):
     """
@@ -37,3 +53,163 @@ def get_percent(part, total):
     If total is 0, return 0
     """
     return (part / total) * 100 if part and total else 0
+
+
+class Median(Aggregate):  # pylint: disable=abstract-method
+    """
+    Median of a numeric expression, with PostgreSQL's PERCENTILE_CONT (which interpolates, like statistics.median())
+    """
+    function = 'PERCENTILE_CONT'
+    name = 'Median'
+    template = '%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+
+def get_partial_date_year(expression):
+    """
+    Return the year of a PartialDateField in a query. It saves dates as naive datetimes, which PostgreSQL takes as UTC
+    """
+    return ExtractYear(Cast(expression, DateTimeField()), tzinfo=timezone.utc)
+
+
+def get_count_subquery(queryset, group_by, field):
+    """
+    Return a subquery counting distinct values of field in queryset (which should be filtered on OuterRef(group_by)),
+    or 0 if there are none
+    """
+    return Coalesce(Subquery(
+        queryset.order_by().values(group_by).annotate(count=Count(field, distinct=True)).values('count')
+    ), 0)
+
+
+# Counts of employees in get_bureau_state_stats() with a field set
+BUREAU_STATE_COUNT_FIELDS = ['vrc', 'colored', 'died_during_assignment', 'former_slave', 'slaveholder',
+                             'union_veteran', 'confederate_veteran', 'penmanship_contest']
+
+
+def get_birth_region_ids(states):
+    """
+    Return a dict of the region employees of each state are counted as born there if born in:
+    the state itself, or District of Columbia for Bureau Headquarters
+    """
+    district_of_columbia = None
+    if any(state.bureau_headquarters for state in states):
+        district_of_columbia = Region.objects.filter(name__icontains='District of Columbia').first()
+
+    return {
+        state.pk: district_of_columbia.pk if state.bureau_headquarters and district_of_columbia else state.pk
+        for state in states
+    }
+
+
+def get_bureau_state_stats(states, year=1865):
+    """
+    Return a dict of employee statistics for each of states by pk, computed for all states together in one
+    conditional-aggregate query, plus one for ailments: counts of employees (in total, with birthplace known,
+    foreign-born, born in the state, female, in USCT regiments, with each field in BUREAU_STATE_COUNT_FIELDS set,
+    with each AilmentType and Ailment by pk) and mean and median age in year
+    """
+    states = list(states)
+    stats = {state.pk: {
+        'employees': 0, 'birthplace_known': 0, 'foreign_born': 0, 'born_there': 0, 'female': 0, 'usct': 0,
+        **{field: 0 for field in BUREAU_STATE_COUNT_FIELDS},
+        'mean_age': 0, 'median_age': 0, 'ailment_types': Counter(), 'ailments': Counter(),
+    } for state in states}
+    if not states:
+        return stats
+
+    born_there = Q()
+    for state_id, region_id in get_birth_region_ids(states).items():
+        born_there |= Q(bureau_states=state_id, place_of_birth__region=region_id)
+
+    age = Value(year) - get_partial_date_year('date_of_birth')
+
+    rows = Employee.objects.filter(bureau_states__in=states).values('bureau_states').annotate(
+        employees=Count('pk'),
+        birthplace_known=Count('pk', filter=Q(place_of_birth__isnull=False)),
+        foreign_born=Count('pk', filter=Q(place_of_birth__isnull=False) & ~Q(place_of_birth__country__code2='US')),
+        born_there=Count('pk', filter=born_there),
+        female=Count('pk', filter=Q(gender=Employee.Gender.FEMALE)),
+        usct=Count('pk', filter=Q(usct=True)),
+        **{field: Count('pk', filter=Q(**{field: True})) for field in BUREAU_STATE_COUNT_FIELDS},
+        mean_age=Avg(age, filter=Q(date_of_birth__isnull=False)),
+        median_age=Median(age, filter=Q(date_of_birth__isnull=False)),
+    ).order_by()
+
+    for row in rows:
+        state_stats = stats[row.pop('bureau_states')]
+        state_stats.update({key: value or 0 for key, value in row.items()})
+
+    # Count each employee once per ailment type, even with more than one ailment of the type
+    employee_ailments = Employee.objects.filter(bureau_states__in=states, ailments__isnull=False).values_list(
+        'bureau_states', 'ailments__type', 'ailments', 'pk').order_by().distinct()
+    ailment_type_employees = set()
+    for state_id, ailment_type_id, ailment_id, employee_id in employee_ailments:
+        stats[state_id]['ailments'][ailment_id] += 1
+        ailment_type_employees.add((state_id, ailment_type_id, employee_id))
+    for state_id, ailment_type_id, _ in ailment_type_employees:
+        stats[state_id]['ailment_types'][ailment_type_id] += 1
+
+    return stats
+
+
+def get_regiment_stats(regiment, year=1865):
+    """
+    Return statistics of a regiment's members: number of employees, number and % with ailments, mean and median age
+    in year (in one aggregate query), and the Bureau states they served in with the number of members in each
+    (in one grouped query)
+    """
+    age = Value(year) - get_partial_date_year('date_of_birth')
+    stats = Employee.objects.filter(regiments=regiment).aggregate(
+        employees=Count('pk'),
+        with_ailments=Count('pk', filter=Q(Exists(Employee.ailments.through.objects.filter(employee=OuterRef('pk'))))),
+        mean_age=Avg(age, filter=Q(date_of_birth__isnull=False)),
+        median_age=Median(age, filter=Q(date_of_birth__isnull=False)),
+    )
+    stats['percent_with_ailments'] = get_percent(part=stats['with_ailments'], total=stats['employees'])
+    stats['bureau_states'] = Region.objects.filter(employee_employed__regiments=regiment).annotate(
+        employees=Count('employee_employed', distinct=True)).order_by('name')
+
+    return stats
+
+
+def build_bureau_state_summaries():
+    """
+    Return a list of summary metrics for each Bureau state: numbers of employees and assignments, % VRC and USCT
+    employees, and the first and last years of its assignments. Counted with subqueries in one query
+    """
+    employee_states = Employee.bureau_states.through.objects.filter(region=OuterRef('pk'))
+    assignment_states = Assignment.bureau_states.through.objects.filter(region=OuterRef('pk')).order_by().values(
+        'region')
+
+    states = Region.objects.bureau_state().annotate(
+        employee_count=get_count_subquery(employee_states, 'region', 'employee'),
+        vrc_count=get_count_subquery(employee_states.filter(employee__vrc=True), 'region', 'employee'),
+        usct_count=get_count_subquery(employee_states.filter(employee__usct=True), 'region', 'employee'),
+        assignment_count=get_count_subquery(assignment_states, 'region', 'assignment'),
+        first_year=Subquery(assignment_states.annotate(year=Min(get_partial_date_year(
+            Coalesce('assignment__start_date', 'assignment__end_date')))).values('year')),
+        last_year=Subquery(assignment_states.annotate(year=Max(get_partial_date_year(
+            Coalesce('assignment__end_date', 'assignment__start_date')))).values('year')),
+    ).order_by('name').values('pk', 'name', 'employee_count', 'vrc_count', 'usct_count', 'assignment_count',
+                              'first_year', 'last_year')
+
+    return [{
+        **state,
+        'percent_vrc': get_percent(part=state['vrc_count'], total=state['employee_count']),
+        'percent_usct': get_percent(part=state['usct_count'], total=state['employee_count']),
+    } for state in states]
+
+
+def get_bureau_state_summaries():
+    """
+    Return summary metrics for each Bureau state (see build_bureau_state_summaries()),
+    cached until employees, assignments or regions change
+    """
+    versions = ':'.join(get_data_version(name) for name in ('employees', 'assignments', 'regions'))
+    key = f'bureau_state_summaries:{versions}'
+    summaries = cache.get(key)
+    if summaries is None:
+        summaries = build_bureau_state_summaries()
+        cache.set(key, summaries, STATS_CACHE_TIMEOUT)
+    return summaries
@@ -1,11 +1,10 @@
-from django.db.models import Case, CharField, Count, F, FloatField, Q, Value, When
+from django.db.models import Case, Count, F, FloatField, Q, When
 from django.db.models.functions import Cast
 from django.views.generic.base import TemplateView
 
 from medical.models import Ailment, AilmentType
 from personnel.models import Employee
-from places.models import Place, Region
-from places.settings import GERMANY_COUNTRY_NAME, GERMANY_COUNTRY_NAMES, VIRGINIA_REGION_NAME, VIRGINIA_REGION_NAMES
+from places.models import Country, Place, Region
 
 from stats.utils import get_ages_at_death, get_ages_in_year, get_mean, get_median, get_percent
 
@@ -42,7 +41,7 @@ class DetailedView(TemplateView):
         # Age in 1865
         ages_vrc = get_ages_in_year(employees_with_dob.filter(vrc=True), 1865)
         ages_non_vrc = get_ages_in_year(employees_with_dob.filter(vrc=False), 1865)
-        ages_usct = get_ages_in_year(employees_with_dob.intersection(Employee.objects.usct()), 1865)
+        ages_usct = get_ages_in_year(employees_with_dob.filter(usct=True), 1865)
         ages_everyone = ages_vrc + ages_non_vrc
 
         average_age_in_1865 = {
@@ -62,7 +61,7 @@ class DetailedView(TemplateView):
         # Age at time of death
         ages_vrc_at_death = get_ages_at_death(employees_with_dob_and_dod.filter(vrc=True))
         ages_non_vrc_at_death = get_ages_at_death(employees_with_dob_and_dod.filter(vrc=False))
-        ages_usct_at_death = get_ages_at_death(employees_with_dob_and_dod.intersection(Employee.objects.usct()))
+        ages_usct_at_death = get_ages_at_death(employees_with_dob_and_dod.filter(usct=True))
         ages_everyone_at_death = ages_vrc_at_death + ages_non_vrc_at_death
 
         average_age_at_death = {
@@ -126,13 +125,11 @@ def get_foreign_born_stats():
     """
     foreign_born_vrc = Employee.objects.foreign_born(vrc=True).count()
     foreign_born_non_vrc = Employee.objects.foreign_born(vrc=False).count()
-    foreign_born_usct = Employee.objects.foreign_born().intersection(Employee.objects.usct()).count()
+    foreign_born_usct = Employee.objects.foreign_born(usct=True).count()
     return {
         'vrc': get_percent(foreign_born_vrc, Employee.objects.birthplace_known(vrc=True).count()),
         'non_vrc': get_percent(foreign_born_non_vrc, Employee.objects.birthplace_known(vrc=False).count()),
-        'usct': get_percent(
-            foreign_born_usct, Employee.objects.birthplace_known().intersection(Employee.objects.usct()).count()
-        ),
+        'usct': get_percent(foreign_born_usct, Employee.objects.birthplace_known(usct=True).count()),
         'everyone': get_percent((foreign_born_vrc + foreign_born_non_vrc), Employee.objects.birthplace_known().count())
     }
 
@@ -144,20 +141,7 @@ def get_top_birthplaces(number=25):
     places in the sources
     Group Virginia and West Virginia together, because it was all Virginia when they were born
     """
-
-    top_birthplaces = Place.objects.annotate(
-        annotated_country=Case(
-            When(country__name__in=GERMANY_COUNTRY_NAMES, then=Value(GERMANY_COUNTRY_NAME)),
-            default=F('country__name'), output_field=CharField(),
-        ),
-        annotated_region=Case(
-            When(region__name__in=VIRGINIA_REGION_NAMES, then=Value(VIRGINIA_REGION_NAME)),
-            default=F('region__name'), output_field=CharField(),
-        ),
-    ).values_list('annotated_region', 'annotated_country').annotate(
-        num_employees=Count('employees_born_in')).order_by('-num_employees')[:number]
-
-    return get_places_with_pks_for_context(top_birthplaces)
+    return get_top_places('employees_born_in', context='birth', number=number)
 
 
 def get_top_deathplaces(number=25):
@@ -166,33 +150,54 @@ def get_top_deathplaces(number=25):
     Group Germany, Prussia, Bavaria, and Saxony, etc. together, because of inconsistencies in reporting of German
     places in the sources
     """
+    return get_top_places('employees_died_in', context='death', number=number)
 
-    top_deathplaces = Place.objects.annotate(
+
+def get_top_places(employees_related_name, context, number=25):
+    """
+    Return top regions or countries by number of employees in employees_related_name,
+    grouping places by PlaceGroups that apply in context ('birth', 'residence', or 'death')
+    """
+
+    top_places = Place.objects.annotate(
+        annotated_region=Case(
+            When(**{f'region_group__{context}': True}, then=F('region_group__region')), default=F('region'),
+        ),
         annotated_country=Case(
-            When(country__name__in=GERMANY_COUNTRY_NAMES, then=Value(GERMANY_COUNTRY_NAME)),
-            default=F('country__name'), output_field=CharField(),
+            When(**{f'country_group__{context}': True}, then=F('country_group__country')), default=F('country'),
         ),
-    ).values_list('region__name', 'annotated_country').annotate(
-        num_employees=Count('employees_died_in')).order_by('-num_employees')[:number]
+    ).values_list('annotated_region', 'annotated_country').annotate(
+        num_employees=Count(employees_related_name)).order_by('-num_employees')[:number]
 
-    return get_places_with_pks_for_context(top_deathplaces)
+    return get_places_with_pks_for_context(top_places)
 
 
-def get_places_with_pks_for_context(place_names_and_counts):
+def get_places_with_pks_for_context(place_ids_and_counts):
     """
-    Take list of place names (country or region) and counts in the format (region, country, count),
+    Take list of place ids (region or country) and counts in the format (region, country, count),
     get the corresponding Place, and return list of names, pks, and counts
     """
-    context_places = []
+    place_ids_and_counts = list(place_ids_and_counts)
+    region_ids = {region for (region, _, _) in place_ids_and_counts if region}
+    country_ids = {country for (region, country, _) in place_ids_and_counts if not region}
+
+    # Get the names and places of all the regions and countries at once
+    names = {('region', pk): name for pk, name in Region.objects.filter(pk__in=region_ids).values_list('pk', 'name')}
+    names.update({('country', pk): name
+                  for pk, name in Country.objects.filter(pk__in=country_ids).values_list('pk', 'name')})
+    places = Q(region__in=region_ids) | Q(country__in=country_ids, region__isnull=True)
+    if None in country_ids:
+        places |= Q(country__isnull=True, region__isnull=True)
+
+    place_pks = {}
+    for place in Place.objects.filter(places, county__isnull=True, city__isnull=True).values('pk', 'region', 'country'):
+        key = ('region', place['region']) if place['region'] else ('country', place['country'])
+        place_pks.setdefault(key, place['pk'])
 
-    for (region, country, count) in place_names_and_counts:
-        if region:
-            place_pk = Place.objects.filter(region__name=region, county__name__isnull=True,
-                                            city__name__isnull=True).first().pk
-        else:
-            place_pk = Place.objects.filter(country__name=country, region__name__isnull=True,
-                                            county__name__isnull=True, city__name__isnull=True).first().pk
-        context_places.append((region if region else country, place_pk, count))
+    context_places = []
+    for (region, country, count) in place_ids_and_counts:
+        key = ('region', region) if region else ('country', country)
+        context_places.append((names.get(key), place_pks.get(key), count))
 
     return context_places
 
@@ -233,8 +238,8 @@ def get_state_comparison_stats(number=5):
 
     # Top % USCT employees
     top_usct_percent = total_employees.annotate(
-        value=Cast(Count('employee_employed', filter=Q(employee_employed__in=Employee.objects.usct())),
-                   FloatField()) / F('total') * 100).exclude(value=0).order_by('-value')[:number]
+        value=Cast(Count('employee_employed', filter=Q(employee_employed__usct=True)), FloatField()) / F(
+            'total') * 100).exclude(value=0).order_by('-value')[:number]
     stats.append(('% USCT employees', top_usct_percent))
 
     if Employee.objects.birthplace_known().exists():
@@ -0,0 +1,32 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_data_version_key(name):
+    return f'data_version:{name}'
+
+
+def get_data_version(name):
+    """
+    Return the current version of a kind of data (ex. 'assignments'), for keying caches of things computed from it.
+    A new version is made up if there isn't one in the cache, so nothing cached for an earlier version can be reused
+    """
+    key = get_data_version_key(name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex[:12]
+        # Another process may have set it in the meantime
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_data_version(*names):
+    """
+    Give kinds of data a new version, because they've changed. The version is changed when the current transaction
+    commits (at once if there isn't one), so nothing computed from the data before the change is cached under it
+    """
+    transaction.on_commit(lambda: cache.set_many(
+        {get_data_version_key(name): uuid.uuid4().hex[:12] for name in names}, timeout=None))
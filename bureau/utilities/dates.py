@@ -0,0 +1,71 @@
+import datetime
+
+from partial_date import PartialDate
+
+from django.db.backends.postgresql.psycopg_any import DateRange
+
+
+def get_partial_date_range(partial_date):
+    """
+    Return (first day, day after the last day) of the period a partial date stands for, according to its precision:
+    the whole year if only the year is known, the whole month if only the year and month are known
+    """
+    if isinstance(partial_date, str):
+        partial_date = PartialDate(partial_date)
+    date = partial_date.date
+    if partial_date.precision == PartialDate.YEAR:
+        return date.replace(month=1, day=1), datetime.date(date.year + 1, 1, 1)
+    if partial_date.precision == PartialDate.MONTH:
+        next_month = date.replace(day=28) + datetime.timedelta(days=4)
+        return date.replace(day=1), next_month.replace(day=1)
+    return date, date + datetime.timedelta(days=1)
+
+
+def get_date_range(start_date, end_date):
+    """
+    Return a DateRange (upper bound exclusive) from the beginning of a partial start date's period to the end of a
+    partial end date's period. If only one is known, it's the period of that one, and if neither is, None
+    """
+    if not (start_date or end_date):
+        return None
+
+    start_range = get_partial_date_range(start_date or end_date)
+    end_range = get_partial_date_range(end_date or start_date)
+    # Tolerate dates entered the wrong way round
+    return DateRange(min(start_range[0], end_range[0]), max(start_range[1], end_range[1]))
+
+
+def get_year_range(year):
+    return DateRange(datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1))
+
+
+def get_date_range_years(date_range):
+    """
+    Return the years a DateRange (upper bound exclusive) is at least partly during
+    """
+    return range(date_range.lower.year, (date_range.upper - datetime.timedelta(days=1)).year + 1)
+
+
+def get_partial_date_key(partial_date):
+    """
+    Return a sortable integer key for a partial date: yyyymmdd, with 00 for an unknown month or day, then the precision.
+    So a year sorts before the months and days in it, and a month before the days in it, ex. 1865 -> 186500000,
+    Aug. 1865 -> 186508001, Aug. 3, 1865 -> 186508032
+    """
+    if not partial_date:
+        return None
+    if isinstance(partial_date, str):
+        partial_date = PartialDate(partial_date)
+
+    date = partial_date.date
+    month = date.month if partial_date.precision >= PartialDate.MONTH else 0
+    day = date.day if partial_date.precision == PartialDate.DAY else 0
+    return ((date.year * 100 + month) * 100 + day) * 10 + partial_date.precision
+
+
+def get_year_key(year):
+    """
+    Return the lowest partial date key (see get_partial_date_key()) in year.
+    Keys of partial dates in year are from get_year_key(year) up to but not including get_year_key(year + 1)
+    """
+    return year * 100000
@@ -0,0 +1,44 @@
+from django.db import models
+
+from utilities.dates import get_partial_date_key
+
+
+class PartialDateKeyField(models.PositiveIntegerField):
+    """
+    Indexed, sortable integer key of a model's PartialDateField (see get_partial_date_key()), set from it when the
+    model is saved, so partial dates can be ordered and filtered by range exactly with a compact index
+    """
+
+    defaults = {'null': True, 'blank': True, 'editable': False, 'db_index': True}
+
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        super().__init__(*args, **{**self.defaults, **kwargs})
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        for key, default in self.defaults.items():
+            kwargs.pop(key, None)
+            if getattr(self, key) != default:
+                kwargs[key] = getattr(self, key)
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = get_partial_date_key(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def get_partial_date_key_update_fields(model, update_fields):
+    """
+    Return update_fields for saving a model instance, with the keys of any partial dates in it added
+    """
+    if update_fields is None:
+        return None
+
+    update_fields = set(update_fields)
+    return update_fields | {
+        field.name for field in model._meta.concrete_fields
+        if isinstance(field, PartialDateKeyField) and field.source in update_fields
+    }
@@ -1,5 +1,4 @@
 from django import template
-from django.core.paginator import Paginator
 
 register = template.Library()
 
@@ -12,10 +11,20 @@ def get_proper_elided_page_range(paginator, number, on_each_side=3, on_ends=2):
 
     https://docs.djangoproject.com/en/3.2/ref/paginator/#django.core.paginator.Paginator.get_elided_page_range
     """
-    p = Paginator(paginator.object_list, paginator.per_page)
-    return p.get_elided_page_range(number=number,
-                                   on_each_side=on_each_side,
-                                   on_ends=on_ends)
+    return paginator.get_elided_page_range(number=number,
+                                           on_each_side=on_each_side,
+                                           on_ends=on_ends)
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, number, page_parameter='page'):
+    """
+    Return the query string for page number of a list, keeping the rest of the request's parameters,
+    for pages with more than one paginated list
+    """
+    parameters = context['request'].GET.copy()
+    parameters[page_parameter] = number
+    return f'?{parameters.urlencode()}'
 
 
 @register.filter
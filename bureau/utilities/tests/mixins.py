@@ -0,0 +1,27 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class ChangelistQueriesMixin:
+    """
+    Assertions for TestCases about the number of queries admin changelist pages need
+    """
+
+    def get_query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertChangelistQueries(self, url, budget, add_rows):  # pylint: disable=invalid-name
+        """
+        Assert that the changelist page at url needs at most budget queries, and no more with more rows on it,
+        calling add_rows() to add some rows before each of two loads of the page
+        """
+        add_rows()
+        first_count = self.get_query_count(url)
+        add_rows()
+        second_count = self.get_query_count(url)
+
+        self.assertEqual(first_count, second_count, f"Queries for {url} shouldn't depend on the number of rows")
+        self.assertLessEqual(second_count, budget, f'{url} should need at most {budget} queries')
@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from utilities.data_version import bump_data_version, get_data_version
+
+
+class DataVersionTestCase(TestCase):
+    """
+    Test data versions for keying caches
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_data_version(self):
+        version = get_data_version('assignments')
+        self.assertEqual(get_data_version('assignments'), version, 'Data version should stay the same until bumped')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version('assignments')
+        self.assertNotEqual(get_data_version('assignments'), version, 'Bumped data version should be new')
+
+        employees_version = get_data_version('employees')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version('assignments')
+        self.assertEqual(get_data_version('employees'), employees_version,
+                         "Bumping one data version shouldn't change another")
+
+        cache.clear()
+        self.assertNotEqual(get_data_version('employees'), employees_version,
+                            "Data version shouldn't be reused if it's been evicted from the cache")
+
+    def test_bump_on_commit(self):
+        """
+        Data version should only be bumped when the transaction the data changed in commits, so nothing computed from
+        the data before it's committed is cached under the new version
+        """
+        version = get_data_version('assignments')
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_data_version('assignments')
+            self.assertEqual(get_data_version('assignments'), version,
+                             "Data version shouldn't be bumped before the transaction commits")
+        self.assertEqual(len(callbacks), 1)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_data_version('assignments'), version,
+                            'Data version should be bumped when the transaction commits')
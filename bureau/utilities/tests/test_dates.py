@@ -0,0 +1,74 @@
+import datetime
+
+from partial_date import PartialDate
+
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.test import SimpleTestCase
+
+from utilities.dates import (
+    get_date_range, get_partial_date_key, get_partial_date_range, get_year_key, get_year_range
+)
+
+
+class GetPartialDateRangeTestCase(SimpleTestCase):
+    """
+    get_partial_date_range(partial_date) should return the first day and the day after the last day of the period
+    the partial date stands for
+    """
+
+    def test_get_partial_date_range(self):
+        self.assertEqual(get_partial_date_range(PartialDate('1866')),
+                         (datetime.date(1866, 1, 1), datetime.date(1867, 1, 1)),
+                         'get_partial_date_range() should return the whole year if only the year is known')
+        self.assertEqual(get_partial_date_range(PartialDate('1866-12')),
+                         (datetime.date(1866, 12, 1), datetime.date(1867, 1, 1)),
+                         'get_partial_date_range() should return the whole month if only year and month are known')
+        self.assertEqual(get_partial_date_range('1868-02'),
+                         (datetime.date(1868, 2, 1), datetime.date(1868, 3, 1)),
+                         'get_partial_date_range() should take partial date strings')
+        self.assertEqual(get_partial_date_range(PartialDate('1866-03-31')),
+                         (datetime.date(1866, 3, 31), datetime.date(1866, 4, 1)),
+                         'get_partial_date_range() should return the day if the whole date is known')
+
+
+class GetDateRangeTestCase(SimpleTestCase):
+    """
+    get_date_range(start_date, end_date) should return a DateRange from the beginning of start_date's period
+    to the end of end_date's period
+    """
+
+    def test_get_date_range(self):
+        self.assertEqual(get_date_range(PartialDate('1865-08'), PartialDate('1867')),
+                         DateRange(datetime.date(1865, 8, 1), datetime.date(1868, 1, 1)),
+                         'get_date_range() should go from the start of start_date to the end of end_date')
+        self.assertEqual(get_date_range(PartialDate('1865-08'), None),
+                         DateRange(datetime.date(1865, 8, 1), datetime.date(1865, 9, 1)),
+                         "get_date_range() should be start_date's period if there's no end_date")
+        self.assertEqual(get_date_range(None, PartialDate('1866')), get_year_range(1866),
+                         "get_date_range() should be end_date's period if there's no start_date")
+        self.assertEqual(get_date_range(PartialDate('1867'), PartialDate('1866-05')),
+                         DateRange(datetime.date(1866, 5, 1), datetime.date(1868, 1, 1)),
+                         'get_date_range() should cover both dates if they are the wrong way round')
+        self.assertIsNone(get_date_range(None, None), 'get_date_range() should be None without dates')
+
+
+class GetPartialDateKeyTestCase(SimpleTestCase):
+    """
+    get_partial_date_key(partial_date) should return a sortable integer key for a partial date
+    """
+
+    def test_get_partial_date_key(self):
+        self.assertEqual(get_partial_date_key(PartialDate('1865')), 186500000)
+        self.assertEqual(get_partial_date_key('1865-08'), 186508001)
+        self.assertEqual(get_partial_date_key(PartialDate('1865-08-03')), 186508032)
+        self.assertIsNone(get_partial_date_key(None), 'get_partial_date_key() should be None without a date')
+
+        dates = ['1866-01-01', '1865-12', '1866', '1865-12-31', '1866-01', '1865']
+        self.assertListEqual(sorted(dates, key=get_partial_date_key),
+                             ['1865', '1865-12', '1865-12-31', '1866', '1866-01', '1866-01-01'],
+                             'Partial dates should sort by date, with each before the more precise dates in it')
+
+    def test_get_year_key(self):
+        for date in ['1865', '1865-01-01', '1865-12', '1865-12-31']:
+            self.assertTrue(get_year_key(1865) <= get_partial_date_key(date) < get_year_key(1866),
+                            'Keys of partial dates in a year should be from its year key to the next year key')
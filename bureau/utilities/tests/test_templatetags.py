@@ -1,9 +1,9 @@
 from partial_date import PartialDate
 
 from django.core.paginator import Paginator
-from django.test import SimpleTestCase
+from django.test import RequestFactory, SimpleTestCase
 
-from utilities.templatetags.utils_tags import get_proper_elided_page_range, partial_date
+from utilities.templatetags.utils_tags import get_proper_elided_page_range, page_url, partial_date
 
 
 class GetProperElidedPageRangeTestCase(SimpleTestCase):
@@ -29,6 +29,19 @@ class GetProperElidedPageRangeTestCase(SimpleTestCase):
         self.assertEqual(elided_page_range.count(str(Paginator.ELLIPSIS)), 2)
 
 
+class PageUrlTestCase(SimpleTestCase):
+    """
+    page_url() should return the query string for a page number, keeping the request's other parameters
+    """
+
+    def test_page_url(self):
+        context = {'request': RequestFactory().get('/', {'born_page': 2, 'died_page': 3})}
+        self.assertEqual(page_url(context, 4, 'died_page'), '?born_page=2&died_page=4',
+                         'page_url() should replace the page parameter and keep the others')
+        self.assertEqual(page_url(context, 5), '?born_page=2&died_page=3&page=5',
+                         "page_url() should use the 'page' parameter by default")
+
+
 class PartialDateTestCase(SimpleTestCase):
     """
     partial_date() should return a partial date formatted according to the parts that are known